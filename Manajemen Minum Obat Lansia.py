@@ -9,8 +9,31 @@ import winsound
 import sys
 import io
 import math
+import bisect
+import heapq
+import random
+import argparse
+import zlib
+import array
+import itertools
+import hashlib
+import hmac
+import mmap
+import operator
+import csv
+import html
+import multiprocessing
+import socket
+import socketserver
+import uuid
+import copy
+import shutil
+import re
+import queue
+import gc
+import tracemalloc
 from pathlib import Path
-from collections import defaultdict
+from collections import defaultdict, deque
 
 # Warna elegant theme (soft professional palette)
 COLORS = {
@@ -28,6 +51,34 @@ COLORS = {
     'border': '#e2e8f0'
 }
 
+# Tahap eskalasi jika pengingat tidak dikonfirmasi (menit sejak pengingat muncul)
+ESCALATION_STAGES = [
+    {'after_minutes': 5, 'action': 'sound', 'sound': 'reminder', 'volume': 1.0},
+    {'after_minutes': 15, 'action': 'notify'},
+    {'after_minutes': 30, 'action': 'missed'},
+]
+
+# Jam makan untuk obat yang diminum setelah makan (dipakai optimasi jadwal)
+MEAL_TIMES = {'sarapan': "07:00", 'makan_siang': "12:00", 'makan_malam': "18:00"}
+
+# Batasan default per obat untuk optimasi jadwal; bisa ditimpa lewat Medicine.schedule_constraints
+SCHEDULE_CONSTRAINT_DEFAULTS = {
+    'window_minutes': 60,         # jam minum boleh bergeser sejauh ini dari jadwal semula
+    'min_spacing_minutes': None,  # jarak minimum antar dosis obat yang sama (None = 75% jarak terkecil semula)
+    'after_meal_minutes': 30,     # obat setelah makan diminum 0-30 menit setelah jam makan
+    'fixed': False                # True = jadwal obat ini tidak boleh diubah
+}
+
+# Kunci file antar proses: msvcrt di Windows, fcntl di POSIX
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 # Suppress pygame welcome message
 class SuppressPygameOutput:
     def __enter__(self):
@@ -49,18 +100,457 @@ with SuppressPygameOutput():
         PYGAME_AVAILABLE = False
         print("Pygame tidak tersedia, menggunakan fallback sound")
 
+class SoundAssetCache:
+    """Cache suara hasil decode (PCM mentah format mixer), dialamatkan dengan hash isi file"""
+    FORMAT_VERSION = 1
+    TARGET_RMS = 0.2       # sekitar -14 dBFS agar pengingat terdengar konsisten
+    PEAK_CEILING = 0.95    # batas puncak agar normalisasi tidak menimbulkan clipping
+    MIN_GAIN = 0.25
+    MAX_GAIN = 8.0
+    
+    def __init__(self, cache_dir, frequency=22050, channels=2):
+        self.cache_dir = Path(cache_dir)
+        self.frequency = frequency
+        self.channels = channels
+        self.index_file = self.cache_dir / "index.json"
+        self.lock = threading.Lock()
+        self.names = {}   # nama suara -> hash
+        self.assets = {}  # hash -> {'source', 'frames', 'gain', 'bytes'}
+        self.load_index()
+    
+    @property
+    def format_key(self):
+        return f"v{self.FORMAT_VERSION}-{self.frequency}-s16-{self.channels}"
+    
+    def load_index(self):
+        if not self.index_file.exists():
+            return
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # Cache dari format mixer lain tidak dipakai: PCM lama dihapus dan di-transcode ulang dari file
+            # sumber (suara khusus di sound_files/, potongan pesan di sound_files/prompts/)
+            if data.get('format') != self.format_key:
+                for digest in data.get('assets', {}):
+                    try:
+                        self.asset_path(digest).unlink()
+                    except OSError:
+                        pass
+                return
+            self.names = data.get('names', {})
+            self.assets = data.get('assets', {})
+        except Exception as e:
+            print(f"Error loading sound cache: {e}")
+    
+    def save_index(self):
+        with self.lock:
+            data = {'format': self.format_key, 'names': dict(self.names), 'assets': dict(self.assets)}
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            temp_file = str(self.index_file) + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(temp_file, self.index_file)
+        except Exception as e:
+            print(f"Error saving sound cache: {e}")
+    
+    @staticmethod
+    def content_hash(file_path):
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+    
+    def asset_path(self, digest):
+        return self.cache_dir / f"{digest}.pcm"
+    
+    def has_asset(self, digest):
+        return digest in self.assets and self.asset_path(digest).exists()
+    
+    def lookup(self, sound_name):
+        digest = self.names.get(sound_name)
+        if digest and self.has_asset(digest):
+            return digest
+        return None
+    
+    def open_buffer(self, digest):
+        """Buka PCM sebagai memory map (tanpa decode); pemanggil wajib menutupnya"""
+        with open(self.asset_path(digest), 'rb') as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    
+    @classmethod
+    def normalize(cls, pcm):
+        """Samakan kekerasan suara: gain menuju TARGET_RMS, dibatasi puncak. Mengembalikan (pcm, gain)"""
+        try:
+            import numpy as np
+            samples = np.frombuffer(pcm, dtype=np.int16)
+            if not len(samples):
+                return pcm, 1.0
+            peak = int(np.abs(samples.astype(np.int32)).max())
+            rms = float(np.sqrt(np.mean(samples[::8].astype(np.float64) ** 2)))
+        except ImportError:
+            np = None
+            samples = array.array('h')
+            samples.frombytes(pcm[:len(pcm) - len(pcm) % 2])
+            if not len(samples):
+                return pcm, 1.0
+            peak = max(max(samples), -min(samples))
+            probe = samples[::8]
+            rms = math.sqrt(sum(map(operator.mul, probe, probe)) / len(probe))
+        
+        if peak == 0 or rms == 0:
+            return pcm, 1.0
+        full_scale = 32767.0
+        gain = min(cls.TARGET_RMS * full_scale / rms, cls.PEAK_CEILING * full_scale / peak)
+        gain = max(cls.MIN_GAIN, min(cls.MAX_GAIN, gain))
+        if abs(gain - 1.0) < 0.05:
+            return pcm, 1.0
+        
+        if np is not None:
+            scaled = np.clip(samples.astype(np.float32) * gain, -32768, 32767).astype(np.int16)
+            return scaled.tobytes(), gain
+        scaled = array.array('h', [min(32767, max(-32768, int(x * gain))) for x in samples])
+        return scaled.tobytes(), gain
+    
+    def store(self, sound_name, digest, pcm, source, gain):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.asset_path(digest)
+        temp_file = str(path) + ".tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(pcm)
+        os.replace(temp_file, path)
+        with self.lock:
+            self.assets[digest] = {
+                'source': Path(source).name,
+                'frames': len(pcm) // (2 * self.channels),
+                'gain': round(gain, 3),
+                'bytes': len(pcm)
+            }
+            self.names[sound_name] = digest
+        self.prune()
+    
+    def link(self, sound_name, digest):
+        with self.lock:
+            self.names[sound_name] = digest
+        self.prune()
+    
+    def unlink(self, sound_names):
+        """Lepaskan nama suara; aset PCM yang tidak dipakai lagi ikut dihapus"""
+        with self.lock:
+            removed = [name for name in sound_names if self.names.pop(name, None) is not None]
+        if removed:
+            self.prune()
+        return len(removed)
+    
+    def prune(self):
+        """Hapus aset PCM yang tidak lagi dipakai nama mana pun"""
+        with self.lock:
+            used = set(self.names.values())
+            orphans = [digest for digest in self.assets if digest not in used]
+            for digest in orphans:
+                del self.assets[digest]
+        for digest in orphans:
+            try:
+                self.asset_path(digest).unlink()
+            except OSError:
+                pass
+        self.save_index()
+
+class AudioMixer:
+    """Lapisan channel di atas pygame.mixer: channel khusus pengingat, ducking, dan tanpa pemicu ulang.
+    
+    Dapat diuji tanpa perangkat suara dengan SDL_AUDIODRIVER=dummy."""
+    REMINDER = 'reminder'
+    EFFECT = 'effect'
+    
+    def __init__(self, mixer, num_channels=16, reserved_channels=4, duck_volume=0.3):
+        self.mixer = mixer
+        self.duck_volume = duck_volume
+        mixer.set_num_channels(num_channels)
+        reserved = mixer.set_reserved(reserved_channels)
+        # pygame 1.x tidak mengembalikan jumlah channel yang dicadangkan
+        self.reserved_channels = reserved_channels if reserved is None else reserved
+        self.num_channels = mixer.get_num_channels()
+        self.playing = {}  # indeks channel -> {'key', 'category', 'volume', 'started'}
+        self.lock = threading.Lock()
+        self.started_count = 0
+    
+    def _channel(self, index):
+        return self.mixer.Channel(index)
+    
+    def _prune(self):
+        for index in [index for index in self.playing if not self._channel(index).get_busy()]:
+            del self.playing[index]
+    
+    def reminder_active(self):
+        return any(entry['category'] == self.REMINDER for entry in self.playing.values())
+    
+    def _effective_volume(self, entry, ducking):
+        volume = entry['volume']
+        if ducking and entry['category'] == self.EFFECT:
+            volume *= self.duck_volume
+        return max(0.0, min(1.0, volume))
+    
+    def _apply_ducking(self):
+        ducking = self.reminder_active()
+        for index, entry in self.playing.items():
+            if entry['category'] == self.EFFECT:
+                self._channel(index).set_volume(self._effective_volume(entry, ducking))
+    
+    def refresh(self):
+        """Buang channel yang sudah selesai dan pulihkan volume efek bila pengingat berhenti"""
+        with self.lock:
+            self._prune()
+            self._apply_ducking()
+    
+    def _free_index(self, indices):
+        for index in indices:
+            if index not in self.playing and not self._channel(index).get_busy():
+                return index
+        return None
+    
+    def _reminder_index(self):
+        index = self._free_index(range(self.reserved_channels))
+        if index is None:
+            index = self._free_index(range(self.reserved_channels, self.num_channels))
+        if index is None:
+            # Semua channel penuh: ganti pengingat yang paling lama berbunyi
+            reminders = [(entry['started'], i) for i, entry in self.playing.items()
+                         if entry['category'] == self.REMINDER]
+            if reminders:
+                index = min(reminders)[1]
+        return index
+    
+    def find_key(self, key):
+        for index, entry in self.playing.items():
+            if entry['key'] == key:
+                return index
+        return None
+    
+    def is_playing(self, key):
+        with self.lock:
+            self._prune()
+            return self.find_key(key) is not None
+    
+    def play(self, sound, category=EFFECT, key=None, volume=1.0):
+        """Putar suara; mengembalikan Channel atau None jika efek terpaksa dilewati"""
+        with self.lock:
+            self._prune()
+            if key is not None:
+                index = self.find_key(key)
+                if index is not None:
+                    # Sudah berbunyi: jangan dipicu ulang, cukup perbarui volumenya
+                    entry = self.playing[index]
+                    entry['volume'] = volume
+                    self._channel(index).set_volume(self._effective_volume(entry, self.reminder_active()))
+                    return self._channel(index)
+            
+            if category == self.REMINDER:
+                index = self._reminder_index()
+            else:
+                index = self._free_index(range(self.reserved_channels, self.num_channels))
+            if index is None:
+                return None
+            
+            self.started_count += 1
+            entry = {'key': key, 'category': category, 'volume': volume, 'started': self.started_count}
+            channel = self._channel(index)
+            channel.play(sound)
+            self.playing[index] = entry
+            channel.set_volume(self._effective_volume(entry, self.reminder_active()))
+            if category == self.REMINDER:
+                self._apply_ducking()
+            return channel
+    
+    def stop(self, key):
+        with self.lock:
+            index = self.find_key(key)
+            if index is None:
+                return False
+            self._channel(index).stop()
+            del self.playing[index]
+            self._apply_ducking()
+            return True
+    
+    def stop_all(self):
+        with self.lock:
+            for index in list(self.playing):
+                self._channel(index).stop()
+            self.playing.clear()
+
+class VoicePromptEngine:
+    """Menyusun pesan suara dari potongan rekaman: salam, nama lansia, nama obat, dan 'setelah makan'.
+    
+    Potongan dicari di sound_files/prompts/<bahasa>/ dengan nama salam, nama_<lansia>, obat_<obat>,
+    setelah_makan (.wav/.ogg/.mp3). Salam memakai rekaman bawaan jika belum ada rekaman khusus."""
+    SOUND_NAME = "pesan_suara"
+    PREFIX = "pesan:"  # nama aset pesan tersusun di cache: pesan:<lansia>|<obat>|<bahasa>
+    LANGUAGES = ('id', 'en', 'ar')
+    FALLBACK_GREETINGS = {'id': "SUARA CUCU.mp3", 'en': "reminder-english.mp3", 'ar': "reminder-arab.mp3"}
+    CLIP_FORMATS = ('.wav', '.ogg', '.mp3')
+    GAP_MS = 150  # jeda hening antar potongan
+    
+    def __init__(self, sound_manager, clips_dir=None, fallback_dir="."):
+        self.sound_manager = sound_manager
+        self.clips_dir = Path(clips_dir or os.path.join(sound_manager.sound_files_path, "prompts"))
+        self.fallback_dir = Path(fallback_dir)
+        self.lock = threading.RLock()
+        self.file_digests = {}  # path -> ((mtime_ns, ukuran), hash isi)
+        self.prompts = {}  # (lansia, obat, bahasa) -> (tanda tangan potongan, Sound)
+    
+    @property
+    def asset_cache(self):
+        return self.sound_manager.asset_cache
+    
+    @staticmethod
+    def slug(text):
+        return "".join(ch if ch.isalnum() else "_" for ch in str(text).strip().lower()).strip("_")
+    
+    def find_clip(self, language, segment):
+        folder = self.clips_dir / language
+        for extension in self.CLIP_FORMATS:
+            path = folder / f"{segment}{extension}"
+            if path.exists():
+                return path
+        if segment == "salam" and language in self.FALLBACK_GREETINGS:
+            path = self.fallback_dir / self.FALLBACK_GREETINGS[language]
+            if path.exists():
+                return path
+        return None
+    
+    def segment_paths(self, person, medicine, language):
+        segments = ["salam", f"nama_{self.slug(person.name)}", f"obat_{self.slug(medicine.name)}"]
+        if medicine.with_food:
+            segments.append("setelah_makan")
+        paths = [self.find_clip(language, segment) for segment in segments]
+        return [path for path in paths if path is not None]
+    
+    def clip_digest(self, path):
+        """Hash isi potongan; dihitung ulang hanya jika waktu ubah atau ukuran file berubah"""
+        stat = path.stat()
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self.file_digests.get(str(path))
+        if cached and cached[0] == signature:
+            return cached[1]
+        digest = self.asset_cache.content_hash(path)
+        self.file_digests[str(path)] = (signature, digest)
+        return digest
+    
+    def clip_pcm(self, path, digest):
+        name = f"klip:{path.parent.name}/{path.name}"
+        if self.asset_cache.has_asset(digest):
+            if self.asset_cache.names.get(name) != digest:
+                self.asset_cache.link(name, digest)
+        else:
+            pcm, gain = self.sound_manager.transcode(str(path))
+            self.asset_cache.store(name, digest, pcm, path, gain)
+        with open(self.asset_cache.asset_path(digest), 'rb') as f:
+            return f.read()
+    
+    def silence(self):
+        frames = int(self.asset_cache.frequency * self.GAP_MS / 1000)
+        return bytes(frames * 2 * self.asset_cache.channels)
+    
+    def get(self, person, medicine, language=None):
+        """Sound pesan lengkap untuk lansia dan obat ini; disusun ulang hanya jika potongannya berubah"""
+        language = language or getattr(person, 'language', None) or self.LANGUAGES[0]
+        key = (person.name, medicine.name, language)
+        with self.lock:
+            paths = self.segment_paths(person, medicine, language)
+            if not paths:
+                return None
+            digests = [self.clip_digest(path) for path in paths]
+            signature = hashlib.sha256("|".join(digests + [str(self.GAP_MS)]).encode()).hexdigest()
+            cached = self.prompts.get(key)
+            if cached and cached[0] == signature:
+                return cached[1]
+            
+            name = f"{self.PREFIX}{person.name}|{medicine.name}|{language}"
+            if self.asset_cache.names.get(name) != signature or not self.asset_cache.has_asset(signature):
+                pcm = self.silence().join(self.clip_pcm(path, digest) for path, digest in zip(paths, digests))
+                self.asset_cache.store(name, signature, pcm, "prompt", 1.0)
+            sound = self.sound_manager.sound_from_cache(signature)
+            self.prompts[key] = (signature, sound)
+            return sound
+    
+    def invalidate(self, person_name=None, medicine_name=None):
+        """Buang pesan tersusun di memori dan di cache (nama dan file PCM-nya)"""
+        with self.lock:
+            for key in list(self.prompts):
+                if (person_name is None or key[0] == person_name) and \
+                   (medicine_name is None or key[1] == medicine_name):
+                    del self.prompts[key]
+            
+            def matches(name):
+                person_and_medicine = name[len(self.PREFIX):].rsplit("|", 1)[0]
+                return (person_name is None or person_and_medicine.startswith(f"{person_name}|")) and \
+                    (medicine_name is None or person_and_medicine.endswith(f"|{medicine_name}"))
+            
+            return self.asset_cache.unlink([name for name in list(self.asset_cache.names)
+                                            if name.startswith(self.PREFIX) and matches(name)])
+    
+    def collect_garbage(self, people):
+        """Hapus pesan tersusun di cache untuk lansia/obat yang sudah tidak ada atau tidak memakai pesan suara
+        (misalnya diubah saat aplikasi ditutup atau dari stasiun lain)"""
+        wanted = {f"{person.name}|{medicine.name}" for person in people for medicine in person.medicines
+                  if medicine.custom_sound == self.SOUND_NAME}
+        with self.lock:
+            return self.asset_cache.unlink([name for name in list(self.asset_cache.names)
+                                            if name.startswith(self.PREFIX) and
+                                            name[len(self.PREFIX):].rsplit("|", 1)[0] not in wanted])
+    
+    def warm(self, people):
+        """Susun pesan untuk semua obat yang memakai pesan suara di thread latar belakang"""
+        targets = [(person, medicine) for person in people for medicine in person.medicines
+                   if medicine.custom_sound == self.SOUND_NAME]
+        if not targets:
+            return
+        
+        def worker():
+            for person, medicine in targets:
+                try:
+                    self.get(person, medicine)
+                except Exception as e:
+                    print(f"Error building voice prompt {person.name}/{medicine.name}: {e}")
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def on_manager_event(self, event):
+        if event.kind in (ManagerEvent.PERSON_REMOVED, ManagerEvent.PERSON_UPDATED):
+            self.invalidate(event.person.name)
+            if event.kind == ManagerEvent.PERSON_UPDATED:
+                self.warm([event.person])
+        elif event.kind in (ManagerEvent.MEDICINE_ADDED, ManagerEvent.MEDICINE_UPDATED,
+                            ManagerEvent.MEDICINE_REMOVED):
+            medicine_name = getattr(event.medicine, 'name', event.medicine)
+            self.invalidate(event.person.name if event.person else None, medicine_name)
+            if event.kind != ManagerEvent.MEDICINE_REMOVED and event.person:
+                self.warm([event.person])
+
 class SoundManager:
     def __init__(self):
         self.sound_enabled = True
         self.pygame_available = PYGAME_AVAILABLE
         self.custom_sounds = {}
         self.sound_files_path = "sound_files"
+        self.asset_cache = SoundAssetCache(os.path.join(self.sound_files_path, "cache"))
+        self.import_lock = threading.Lock()
+        self.importing = set()
+        self.mixer = None
+        self.prompt_engine = None
         self.initialize_sound_system()
     
     def initialize_sound_system(self):
         if self.pygame_available:
             try:
                 pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
+                # Format mixer sebenarnya bisa berbeda dari yang diminta
+                frequency, _, channels = pygame.mixer.get_init()
+                if (frequency, channels) != (self.asset_cache.frequency, self.asset_cache.channels):
+                    self.asset_cache = SoundAssetCache(self.asset_cache.cache_dir, frequency, channels)
+                self.mixer = AudioMixer(pygame.mixer)
+                self.prompt_engine = VoicePromptEngine(self)
                 self.create_default_sounds()
                 self.load_custom_sounds()
             except:
@@ -105,54 +595,149 @@ class SoundManager:
             return
             
         os.makedirs(self.sound_files_path, exist_ok=True)
-        supported_formats = ['.wav', '.mp3', '.ogg']
         
+        # Suara yang sudah di-cache dibangun langsung dari PCM tanpa decode ulang
+        for sound_name in list(self.asset_cache.names):
+            digest = self.asset_cache.lookup(sound_name)
+            if digest:
+                try:
+                    self.custom_sounds[sound_name] = self.sound_from_cache(digest)
+                except Exception as e:
+                    print(f"Error loading cached sound {sound_name}: {e}")
+        
+        # File lama (sebelum ada cache) di-transcode sekali di latar belakang
+        supported_formats = ['.wav', '.mp3', '.ogg']
         for file_format in supported_formats:
             for sound_file in Path(self.sound_files_path).glob(f"*{file_format}"):
-                try:
-                    sound_name = sound_file.stem
-                    sound = pygame.mixer.Sound(str(sound_file))
-                    self.custom_sounds[sound_name] = sound
-                except:
-                    pass
+                if sound_file.stem not in self.custom_sounds:
+                    self.import_sound_async(str(sound_file), sound_file.stem)
+    
+    def sound_from_cache(self, digest):
+        buffer = self.asset_cache.open_buffer(digest)
+        try:
+            return pygame.mixer.Sound(buffer=buffer)
+        finally:
+            buffer.close()
+    
+    def transcode(self, file_path):
+        """Decode file ke PCM format mixer (16-bit) lalu normalisasi kekerasannya"""
+        sound = pygame.mixer.Sound(file_path)
+        return SoundAssetCache.normalize(sound.get_raw())
+    
+    def keep_source(self, file_path, sound_name):
+        """Salin file asli ke sound_files/<nama>.<ekstensi> agar bisa di-transcode ulang bila format mixer
+        berubah; salinan lama dengan ekstensi lain dihapus. Mengembalikan path salinan."""
+        source = Path(file_path)
+        folder = Path(self.sound_files_path)
+        destination = folder / f"{sound_name}{source.suffix.lower()}"
+        folder.mkdir(parents=True, exist_ok=True)
+        if not destination.exists() or not os.path.samefile(source, destination):
+            temp_file = str(destination) + ".tmp"
+            shutil.copy2(source, temp_file)
+            os.replace(temp_file, destination)
+        for extension in ('.wav', '.mp3', '.ogg'):
+            old = folder / f"{sound_name}{extension}"
+            if old != destination and old.exists():
+                old.unlink()
+        return str(destination)
     
-    def add_custom_sound(self, file_path, sound_name):
+    def import_sound(self, file_path, sound_name):
+        file_path = self.keep_source(file_path, sound_name)
+        digest = self.asset_cache.content_hash(file_path)
+        if self.asset_cache.has_asset(digest):
+            # Isi file sama dengan suara lain: pakai ulang PCM yang sudah ada
+            self.asset_cache.link(sound_name, digest)
+        else:
+            pcm, gain = self.transcode(file_path)
+            self.asset_cache.store(sound_name, digest, pcm, file_path, gain)
+        self.custom_sounds[sound_name] = self.sound_from_cache(digest)
+    
+    def import_sound_async(self, file_path, sound_name, callback=None):
+        """Transcode di thread latar belakang; callback(sound_name, success) dipanggil dari thread tersebut"""
+        with self.import_lock:
+            if sound_name in self.importing:
+                return False
+            self.importing.add(sound_name)
+        
+        def worker():
+            success = False
+            try:
+                self.import_sound(file_path, sound_name)
+                success = True
+            except Exception as e:
+                print(f"Error importing sound {sound_name}: {e}")
+            finally:
+                with self.import_lock:
+                    self.importing.discard(sound_name)
+            if callback:
+                callback(sound_name, success)
+        
+        threading.Thread(target=worker, daemon=True).start()
+        return True
+    
+    def add_custom_sound(self, file_path, sound_name, callback=None):
         if not self.pygame_available:
             return False
-            
-        try:
-            sound = pygame.mixer.Sound(file_path)
-            self.custom_sounds[sound_name] = sound
-            
-            sound_files_path = Path(self.sound_files_path)
-            sound_files_path.mkdir(exist_ok=True)
-            
-            import shutil
-            dest_path = sound_files_path / f"{sound_name}{Path(file_path).suffix}"
-            shutil.copy2(file_path, dest_path)
-            return True
-        except:
+        if not os.path.isfile(file_path):
             return False
+        return self.import_sound_async(file_path, sound_name, callback)
     
     def get_available_sounds(self):
         sounds = list(self.custom_sounds.keys())
         if not sounds:
             sounds = ["reminder", "success"]
+        if self.prompt_engine is not None:
+            sounds.append(VoicePromptEngine.SOUND_NAME)
         return sounds
     
-    def play_sound(self, sound_name="reminder"):
+    @staticmethod
+    def reminder_key(person):
+        """Kunci suara pengingat per lansia, agar satu pengingat tidak dipicu berulang kali"""
+        return f"reminder:{person.name if person else ''}"
+    
+    @staticmethod
+    def resident_volume(person):
+        volume = getattr(person, 'sound_volume', 1.0)
+        return max(0.0, min(1.0, 1.0 if volume is None else volume))
+    
+    def resolve_sound(self, sound_name, person=None, medicine=None):
+        """Sound untuk nama suara; pesan suara disusun dari potongan rekaman (fallback ke 'reminder')"""
+        if sound_name == VoicePromptEngine.SOUND_NAME:
+            sound = None
+            if self.prompt_engine is not None and person is not None and medicine is not None:
+                try:
+                    sound = self.prompt_engine.get(person, medicine)
+                except Exception as e:
+                    print(f"Error voice prompt: {e}")
+            return sound or self.custom_sounds.get("reminder")
+        return self.custom_sounds.get(sound_name)
+    
+    def play_sound(self, sound_name="reminder", volume=None, person=None, category=None, key=None, medicine=None):
         if not self.sound_enabled:
             return False
+        if category is None:
+            category = AudioMixer.EFFECT if sound_name == "success" else AudioMixer.REMINDER
+        level = (1.0 if volume is None else volume) * self.resident_volume(person)
             
         try:
-            if self.pygame_available and sound_name in self.custom_sounds:
-                self.custom_sounds[sound_name].play()
-                return True
+            sound = self.resolve_sound(sound_name, person, medicine) if self.pygame_available else None
+            if sound is not None:
+                if self.mixer is None:
+                    channel = sound.play()
+                    if channel is not None:
+                        channel.set_volume(level)
+                    return True
+                return self.mixer.play(sound, category, key, level) is not None
             else:
                 return self.play_system_sound(sound_name)
         except:
             return self.play_system_sound(sound_name)
     
+    def stop_sound(self, key):
+        if self.mixer is not None:
+            return self.mixer.stop(key)
+        return False
+    
     def play_system_sound(self, sound_type="reminder"):
         try:
             if sound_type == "success":
@@ -167,9 +752,365 @@ class SoundManager:
     def toggle_sound(self, enabled):
         self.sound_enabled = enabled
 
+class RecurrenceRule:
+    """Aturan pengulangan jadwal obat: hari tertentu, interval, rentang tanggal, tapering"""
+    WEEKDAY_NAMES = ['Sen', 'Sel', 'Rab', 'Kam', 'Jum', 'Sab', 'Min']
+    EPOCH = datetime.date(2000, 1, 3)  # Senin, jangkar default untuk interval
+    
+    def __init__(self, times, start_date=None, end_date=None, weekdays=None,
+                 interval_days=1, interval_hours=None, phases=None):
+        self.times = sorted(set(self._to_minutes(t) for t in times))
+        self.start_date = start_date
+        self.end_date = end_date
+        self.weekdays = frozenset(weekdays) if weekdays else None
+        self.interval_days = max(1, int(interval_days or 1))
+        self.interval_hours = int(interval_hours) if interval_hours else None
+        
+        # Tapering: tiap tahap punya jumlah hari dan jam minum sendiri
+        self.phases = []
+        self.phase_offsets = []
+        if phases:
+            if self.start_date is None:
+                raise ValueError("Tapering membutuhkan tanggal mulai")
+            offset = 0
+            for phase in phases:
+                self.phase_offsets.append(offset)
+                self.phases.append({
+                    'days': int(phase['days']),
+                    'times': sorted(set(self._to_minutes(t) for t in phase.get('times', []))),
+                    'dosage': phase.get('dosage')
+                })
+                offset += int(phase['days'])
+            course_end = self.start_date + datetime.timedelta(days=offset - 1)
+            if self.end_date is None or course_end < self.end_date:
+                self.end_date = course_end
+        
+        if self.weekdays is not None and not self.weekdays & self._reachable_weekdays():
+            names = ", ".join(self.WEEKDAY_NAMES[day] for day in sorted(self.weekdays))
+            raise ValueError(f"Interval ini tidak pernah jatuh pada hari {names}")
+    
+    @staticmethod
+    def _to_minutes(time_str):
+        parsed = datetime.datetime.strptime(time_str.strip(), "%H:%M")
+        return parsed.hour * 60 + parsed.minute
+    
+    @staticmethod
+    def _to_time_str(minutes):
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+    
+    @classmethod
+    def from_medicine(cls, schedule, recurrence=None):
+        """Membuat aturan dari jadwal lama ("HH:MM") ditambah data pengulangan opsional"""
+        recurrence = recurrence or {}
+        
+        def parse_date(value):
+            return datetime.date.fromisoformat(value) if value else None
+        
+        return cls(
+            schedule,
+            start_date=parse_date(recurrence.get('start_date')),
+            end_date=parse_date(recurrence.get('end_date')),
+            weekdays=recurrence.get('weekdays'),
+            interval_days=recurrence.get('interval_days', 1),
+            interval_hours=recurrence.get('interval_hours'),
+            phases=recurrence.get('phases')
+        )
+    
+    @classmethod
+    def parse_text(cls, text, today=None):
+        """Mengubah teks seperti 'hari=Sen,Rab,Jum; mulai=2026-10-20; selama=10'
+        menjadi dict pengulangan. Kunci: hari, mulai, sampai, selama, setiap, tiap_jam, tahap.
+        Semua kunci dibaca dulu sehingga urutannya tidak berpengaruh (selama dihitung dari mulai).
+        Tanpa mulai, selama/tahap/setiap/tiap_jam dimulai dari `today` (tanggal jam aplikasi)."""
+        fields = {}
+        for part in text.split(';'):
+            if not part.strip():
+                continue
+            if '=' not in part:
+                raise ValueError(f"Bagian pengulangan tidak valid: {part.strip()}")
+            key, value = (s.strip() for s in part.split('=', 1))
+            key = key.lower()
+            if key not in ('hari', 'mulai', 'sampai', 'selama', 'setiap', 'tiap_jam', 'tahap'):
+                raise ValueError(f"Kunci pengulangan tidak dikenal: {key}")
+            fields[key] = value
+        if 'selama' in fields and 'sampai' in fields:
+            raise ValueError("Pakai salah satu: selama atau sampai")
+        
+        recurrence = {}
+        if 'hari' in fields:
+            names = [cls.WEEKDAY_NAMES.index(v.strip().capitalize()[:3]) for v in fields['hari'].split(',')]
+            recurrence['weekdays'] = sorted(set(names))
+        if 'mulai' in fields:
+            recurrence['start_date'] = datetime.date.fromisoformat(fields['mulai']).isoformat()
+        elif any(key in fields for key in ('selama', 'tahap', 'setiap', 'tiap_jam')):
+            # Interval dihitung dari hari ini, sehingga jam pertama yang diisi perawat langsung berlaku
+            recurrence['start_date'] = (today or datetime.date.today()).isoformat()
+        if 'sampai' in fields:
+            recurrence['end_date'] = datetime.date.fromisoformat(fields['sampai']).isoformat()
+        if 'selama' in fields:
+            end = datetime.date.fromisoformat(recurrence['start_date']) + \
+                datetime.timedelta(days=int(fields['selama']) - 1)
+            recurrence['end_date'] = end.isoformat()
+        if 'setiap' in fields:
+            recurrence['interval_days'] = int(fields['setiap'])
+        if 'tiap_jam' in fields:
+            recurrence['interval_hours'] = int(fields['tiap_jam'])
+        if 'tahap' in fields:
+            # contoh: tahap=3@08:00/14:00/20:00, 3@08:00/20:00, 4@08:00
+            phases = []
+            for step in fields['tahap'].split(','):
+                days, times = step.strip().split('@')
+                phases.append({'days': int(days), 'times': [t.strip() for t in times.split('/') if t.strip()]})
+            recurrence['phases'] = phases
+        return recurrence or None
+    
+    def _anchor_date(self):
+        return self.start_date or self.EPOCH
+    
+    def _reachable_weekdays(self):
+        """Hari dalam minggu yang bisa dicapai langkah interval dari jangkar (misal setiap=7 hanya satu hari)"""
+        anchor = self._anchor_date()
+        if self.interval_hours:
+            first_minute = self.times[0] if self.times else 0
+            start = anchor.weekday() * 24 + first_minute // 60
+            step = math.gcd(self.interval_hours, 7 * 24)
+            return {(start + k * step) % (7 * 24) // 24 for k in range(7 * 24 // step)}
+        step = math.gcd(self.interval_days, 7)
+        return {(anchor.weekday() + k * step) % 7 for k in range(7 // step)}
+    
+    def _phase_index(self, day):
+        offset = (day - self.start_date).days
+        return bisect.bisect_right(self.phase_offsets, offset) - 1
+    
+    def _times_for_day(self, day):
+        if self.phases:
+            return self.phases[self._phase_index(day)]['times']
+        return self.times
+    
+    def _next_active_day(self, day):
+        """Hari aktif pertama >= day (memenuhi interval dan hari dalam minggu), maksimal 7 langkah"""
+        if self.start_date and day < self.start_date:
+            day = self.start_date
+        
+        offset = (day - self._anchor_date()).days % self.interval_days
+        if offset:
+            day += datetime.timedelta(days=self.interval_days - offset)
+        
+        if self.weekdays is not None:
+            step = datetime.timedelta(days=self.interval_days)
+            for _ in range(7):
+                if day.weekday() in self.weekdays:
+                    break
+                day += step
+            else:
+                return None
+        
+        if self.end_date and day > self.end_date:
+            return None
+        return day
+    
+    def _next_hourly(self, after):
+        start = self._anchor_date()
+        first_minute = self.times[0] if self.times else 0
+        anchor = datetime.datetime.combine(start, datetime.time(first_minute // 60, first_minute % 60))
+        step = datetime.timedelta(hours=self.interval_hours)
+        
+        if after < anchor:
+            candidate = anchor
+        else:
+            k = int((after - anchor) // step) + 1
+            candidate = anchor + k * step
+        
+        if self.weekdays is not None:
+            for _ in range(7 * 24 // self.interval_hours + 2):
+                if candidate.weekday() in self.weekdays:
+                    break
+                candidate += step
+            else:
+                return None
+        
+        if self.end_date and candidate.date() > self.end_date:
+            return None
+        return candidate
+    
+    def next_occurrence(self, after):
+        """Jadwal minum berikutnya setelah `after` (datetime), atau None jika sudah selesai"""
+        if self.interval_hours:
+            return self._next_hourly(after)
+        
+        day = after.date()
+        minute = after.hour * 60 + after.minute
+        # Batas iterasi: hanya maju antar hari aktif / tahap tanpa jam minum
+        for _ in range(len(self.phases) + 3):
+            active_day = self._next_active_day(day)
+            if active_day is None:
+                return None
+            if active_day != day:
+                minute = -1
+            day = active_day
+            
+            times = self._times_for_day(day)
+            index = bisect.bisect_right(times, minute)
+            if index < len(times):
+                slot = times[index]
+                return datetime.datetime.combine(day, datetime.time(slot // 60, slot % 60))
+            
+            if self.phases and not times:
+                # Tahap tanpa jadwal (jeda): lompat ke awal tahap berikutnya
+                phase_index = self._phase_index(day)
+                if phase_index + 1 >= len(self.phases):
+                    return None
+                day = self.start_date + datetime.timedelta(days=self.phase_offsets[phase_index + 1])
+            else:
+                day += datetime.timedelta(days=1)
+            minute = -1
+        return None
+    
+    def occurs_at(self, moment):
+        """Apakah ada jadwal minum tepat pada menit `moment`"""
+        slot = moment.replace(second=0, microsecond=0)
+        return self.next_occurrence(slot - datetime.timedelta(minutes=1)) == slot
+    
+    def occurrences_between(self, start, end):
+        """Semua jadwal dalam rentang (start, end]"""
+        current = self.next_occurrence(start)
+        while current is not None and current <= end:
+            yield current
+            current = self.next_occurrence(current)
+    
+    def slots_on(self, day):
+        """Daftar jam minum ("HH:MM") pada tanggal tertentu"""
+        day_start = datetime.datetime.combine(day, datetime.time(0, 0)) - datetime.timedelta(minutes=1)
+        day_end = datetime.datetime.combine(day, datetime.time(23, 59))
+        return [slot.strftime("%H:%M") for slot in self.occurrences_between(day_start, day_end)]
+    
+    def dosage_on(self, day, default=None):
+        """Dosis tahap tapering pada tanggal tertentu (jika ada)"""
+        if self.phases and self.start_date <= day <= self.end_date:
+            return self.phases[self._phase_index(day)].get('dosage') or default
+        return default
+    
+    def describe(self):
+        parts = []
+        if self.interval_hours:
+            parts.append(f"tiap {self.interval_hours} jam")
+        elif self.interval_days > 1:
+            parts.append(f"tiap {self.interval_days} hari")
+        if self.weekdays is not None:
+            parts.append(",".join(self.WEEKDAY_NAMES[d] for d in sorted(self.weekdays)))
+        if self.phases:
+            parts.append(f"{len(self.phases)} tahap")
+        if self.start_date:
+            parts.append(f"mulai {self.start_date.isoformat()}")
+        if self.end_date:
+            parts.append(f"s/d {self.end_date.isoformat()}")
+        return "; ".join(parts)
+
+class HierarchicalTimerWheel:
+    """Timer wheel bertingkat: jadwal dan batal O(1), maju per tick dengan cascade antar level"""
+    
+    def __init__(self, origin, tick_seconds=1, slot_bits=6, levels=4):
+        self.origin = origin
+        self.tick_seconds = tick_seconds
+        self.slot_bits = slot_bits
+        self.slot_count = 1 << slot_bits
+        self.slot_mask = self.slot_count - 1
+        self.levels = levels
+        self.wheels = [[{} for _ in range(self.slot_count)] for _ in range(levels)]
+        self.locations = {}  # key -> (level, slot)
+        self.due = {}  # timer yang sudah lewat saat dijadwalkan
+        self.current_tick = 0
+    
+    def __len__(self):
+        return len(self.locations) + len(self.due)
+    
+    def _tick_of(self, moment):
+        return int((moment - self.origin).total_seconds() // self.tick_seconds)
+    
+    def _insert(self, key, expire_tick, payload):
+        delta = expire_tick - self.current_tick
+        if delta <= 0:
+            self.due[key] = (expire_tick, payload)
+            return
+        level = 0
+        while level < self.levels - 1 and delta >= 1 << (self.slot_bits * (level + 1)):
+            level += 1
+        slot = (expire_tick >> (self.slot_bits * level)) & self.slot_mask
+        self.wheels[level][slot][key] = (expire_tick, payload)
+        self.locations[key] = (level, slot)
+    
+    def schedule(self, key, deadline, payload=None):
+        self.cancel(key)
+        self._insert(key, self._tick_of(deadline), payload)
+    
+    def cancel(self, key):
+        location = self.locations.pop(key, None)
+        if location is not None:
+            level, slot = location
+            return self.wheels[level][slot].pop(key, None) is not None
+        return self.due.pop(key, None) is not None
+    
+    def __contains__(self, key):
+        return key in self.locations or key in self.due
+    
+    def advance(self, now):
+        """Majukan wheel sampai `now`, kembalikan daftar (key, payload) yang kedaluwarsa"""
+        target = self._tick_of(now)
+        expired = list((key, payload) for key, (_, payload) in self.due.items())
+        self.due.clear()
+        
+        if not self.locations:
+            self.current_tick = max(self.current_tick, target)
+            return expired
+        
+        if target - self.current_tick >= 1 << (self.slot_bits * self.levels):
+            # Lompatan sangat jauh (misal setelah suspend): pindai sekali saja
+            entries = []
+            for level in self.wheels:
+                for slot in level:
+                    entries.extend((key, value) for key, value in slot.items())
+                    slot.clear()
+            self.locations.clear()
+            self.current_tick = target
+            for key, (expire_tick, payload) in sorted(entries, key=lambda e: e[1][0]):
+                if expire_tick <= target:
+                    expired.append((key, payload))
+                else:
+                    self._insert(key, expire_tick, payload)
+            return expired
+        
+        while self.current_tick < target and self.locations:
+            self.current_tick += 1
+            tick = self.current_tick
+            for level in range(1, self.levels):
+                if tick & ((1 << (self.slot_bits * level)) - 1):
+                    break
+                slot = (tick >> (self.slot_bits * level)) & self.slot_mask
+                entries = self.wheels[level][slot]
+                self.wheels[level][slot] = {}
+                for key, (expire_tick, payload) in entries.items():
+                    del self.locations[key]
+                    self._insert(key, expire_tick, payload)
+            
+            entries = self.wheels[0][tick & self.slot_mask]
+            self.wheels[0][tick & self.slot_mask] = {}
+            for key, (expire_tick, payload) in entries.items():
+                del self.locations[key]
+                if expire_tick <= tick:
+                    expired.append((key, payload))
+                else:
+                    self._insert(key, expire_tick, payload)
+            if self.due:
+                expired.extend((key, payload) for key, (_, payload) in self.due.items())
+                self.due.clear()
+        
+        self.current_tick = max(self.current_tick, target)
+        return expired
+
 class Medicine:
     def __init__(self, name, dosage, schedule, description="", with_food=False, 
-                 sound_enabled=True, custom_sound="reminder"):
+                 sound_enabled=True, custom_sound="reminder", recurrence=None, schedule_constraints=None,
+                 stock=None, dose_amount=1):
         self.name = name
         self.dosage = dosage
         self.schedule = schedule
@@ -177,7 +1118,56 @@ class Medicine:
         self.with_food = with_food
         self.sound_enabled = sound_enabled
         self.custom_sound = custom_sound
+        self.recurrence = recurrence  # None = setiap hari pada jam di schedule
+        self.schedule_constraints = schedule_constraints  # batasan optimasi jadwal, lihat SCHEDULE_CONSTRAINT_DEFAULTS
+        self.stock = stock  # sisa obat (tablet/unit); None = stok tidak dicatat
+        self.dose_amount = dose_amount  # unit yang terpakai per sekali minum
+        self.stock_updated = None  # waktu (ISO) stok terakhir berubah, jangkar perkiraan habis
         self.history = []
+        self._rule = None
+        self._rule_key = None
+    
+    def get_rule(self):
+        """Aturan pengulangan (di-cache menurut isi jadwal dan pengulangan, sehingga perubahan langsung
+        pada dict pengulangan juga membangun ulang aturan)"""
+        key = (tuple(self.schedule),
+               json.dumps(self.recurrence, sort_keys=True, default=str) if self.recurrence else None)
+        if self._rule is None or self._rule_key != key:
+            self._rule = RecurrenceRule.from_medicine(self.schedule, self.recurrence)
+            self._rule_key = key
+        return self._rule
+    
+    def set_schedule(self, schedule, recurrence=None):
+        self.schedule = schedule
+        self.recurrence = recurrence
+        self._rule = None
+    
+    def next_occurrence(self, after):
+        return self.get_rule().next_occurrence(after)
+    
+    def is_due(self, moment):
+        return self.get_rule().occurs_at(moment)
+    
+    def daily_dose_rate(self, now, horizon_days=14):
+        """Rata-rata jumlah minum per hari menurut jadwal selama horizon_days ke depan"""
+        end = now + datetime.timedelta(days=horizon_days)
+        return sum(1 for _ in self.get_rule().occurrences_between(now, end)) / horizon_days
+    
+    def forecast_runout(self, now):
+        """Perkiraan waktu stok habis; None jika stok tidak dicatat atau obat tidak dijadwalkan"""
+        if self.stock is None:
+            return None
+        rate = self.daily_dose_rate(now) * (self.dose_amount or 1)
+        if rate <= 0:
+            return None
+        anchor = datetime.datetime.fromisoformat(self.stock_updated) if self.stock_updated else now
+        return anchor + datetime.timedelta(days=max(0, self.stock) / rate)
+    
+    def consume_stock(self, now):
+        if self.stock is None:
+            return
+        self.stock = max(0, self.stock - (self.dose_amount or 1))
+        self.stock_updated = now.isoformat()
     
     def to_dict(self):
         return {
@@ -188,6 +1178,11 @@ class Medicine:
             'with_food': self.with_food,
             'sound_enabled': self.sound_enabled,
             'custom_sound': self.custom_sound,
+            'recurrence': self.recurrence,
+            'schedule_constraints': self.schedule_constraints,
+            'stock': self.stock,
+            'dose_amount': self.dose_amount,
+            'stock_updated': self.stock_updated,
             'history': self.history
         }
     
@@ -200,16 +1195,24 @@ class Medicine:
             data.get('description', ''),
             data.get('with_food', False),
             data.get('sound_enabled', True),
-            data.get('custom_sound', 'reminder')
+            data.get('custom_sound', 'reminder'),
+            data.get('recurrence'),
+            data.get('schedule_constraints'),
+            data.get('stock'),
+            data.get('dose_amount', 1)
         )
+        medicine.stock_updated = data.get('stock_updated')
         medicine.history = data.get('history', [])
         return medicine
 
 class ElderlyPerson:
-    def __init__(self, name, age, condition=""):
+    def __init__(self, name, age, condition="", sound_volume=1.0, language="id", ward=""):
         self.name = name
         self.age = age
         self.condition = condition
+        self.sound_volume = sound_volume  # profil volume suara pengingat (0.0 - 1.0)
+        self.language = language  # bahasa pesan suara: id, en, ar
+        self.ward = ward  # bangsal; dipakai untuk membagi pengingat ke beberapa proses
         self.medicines = []
         self.medicine_suggestions = defaultdict(list)
     
@@ -252,228 +1255,4690 @@ class ElderlyPerson:
             'name': self.name,
             'age': self.age,
             'condition': self.condition,
+            'sound_volume': self.sound_volume,
+            'language': self.language,
+            'ward': self.ward,
             'medicines': [med.to_dict() for med in self.medicines],
             'medicine_suggestions': dict(self.medicine_suggestions)
         }
     
     @classmethod
     def from_dict(cls, data):
-        person = cls(data['name'], data['age'], data.get('condition', ''))
+        person = cls(data['name'], data['age'], data.get('condition', ''), data.get('sound_volume', 1.0),
+                     data.get('language', 'id'), data.get('ward', ''))
         person.medicines = [Medicine.from_dict(med) for med in data.get('medicines', [])]
         person.medicine_suggestions = defaultdict(list, data.get('medicine_suggestions', {}))
         return person
 
-class ElderlyManager:
-    def __init__(self):
-        self.data_file = "elderly_data.json"
-        self.elderly_people = []  # Daftar semua lansia
-        self.current_person = None  # Lansia yang sedang aktif
-        self.elderly_suggestions = defaultdict(list)  # Saran untuk lansia
-        self.sound_manager = SoundManager()
-        self.load_data()
+class ScheduleProposal:
+    """Usulan jadwal hasil optimasi beserta perbedaannya dengan jadwal sekarang"""
     
-    def load_data(self):
-        if os.path.exists(self.data_file):
-            try:
-                with open(self.data_file, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    
-                    # Load multiple elderly people
-                    if isinstance(data, list):
-                        self.elderly_people = [ElderlyPerson.from_dict(person_data) for person_data in data]
-                        if self.elderly_people:
-                            self.current_person = self.elderly_people[0]
-                    else:
-                        # Backward compatibility with old single-person format
-                        person = ElderlyPerson.from_dict(data)
-                        self.elderly_people = [person]
-                        self.current_person = person
-                    
-                    # Load elderly suggestions
-                    for person in self.elderly_people:
-                        if person.name:
-                            self.elderly_suggestions[person.name].append({
-                                'age': person.age,
-                                'condition': person.condition,
-                                'count': 1
-                            })
-            except:
-                self.elderly_people = [ElderlyPerson("", 0)]
-                self.current_person = self.elderly_people[0]
-        else:
-            self.elderly_people = [ElderlyPerson("", 0)]
-            self.current_person = self.elderly_people[0]
+    def __init__(self, person, current, proposed, fixed=()):
+        self.person = person
+        self.current = current    # nama obat -> ["HH:MM"]
+        self.proposed = proposed  # nama obat -> ["HH:MM"]
+        self.fixed = set(fixed)
     
-    def save_data(self):
-        try:
-            # Simpan semua data lansia
-            data_to_save = [person.to_dict() for person in self.elderly_people]
-            with open(self.data_file, 'w', encoding='utf-8') as f:
-                json.dump(data_to_save, f, indent=4, ensure_ascii=False)
-        except Exception as e:
-            print(f"Error saving data: {e}")
+    @staticmethod
+    def count_events(schedules):
+        return len({slot for times in schedules.values() for slot in times})
     
-    def get_elderly_names(self):
-        """Mendapatkan semua nama lansia unik yang pernah dimasukkan"""
-        names = list(set(person.name for person in self.elderly_people if person.name))
-        return sorted(names)
+    @property
+    def events_before(self):
+        return self.count_events(self.current)
     
-    def get_elderly_suggestions(self, name):
-        """Mendapatkan saran untuk lansia tertentu"""
-        return self.elderly_suggestions.get(name, [])
+    @property
+    def events_after(self):
+        return self.count_events(self.proposed)
     
-    def set_current_person(self, name, age=None, condition=None):
-        """Mengatur lansia yang sedang aktif"""
-        # Cari apakah lansia sudah ada
-        for person in self.elderly_people:
-            if person.name == name:
-                if age is not None:
-                    person.age = age
-                if condition is not None:
-                    person.condition = condition
-                self.current_person = person
-                self.save_data()
-                return person
+    def changes(self):
+        return [(name, self.current[name], self.proposed[name])
+                for name in self.current if self.current[name] != self.proposed[name]]
+    
+    def format_diff(self):
+        lines = [f"Pengingat per hari: {self.events_before} -> {self.events_after}"]
+        for name, old, new in self.changes():
+            lines.append(f"  {name}: {', '.join(old)} -> {', '.join(new)}")
+        return "\n".join(lines)
+
+class ScheduleOptimizer:
+    """Menggabungkan jam minum obat per lansia agar jumlah pengingat per hari sesedikit mungkin.
+    
+    Setiap dosis punya jendela waktu yang diizinkan; pencarian branch-and-bound menempatkan dosis
+    pada jam yang sudah dipakai obat lain bila memungkinkan, dengan pergeseran total sekecil mungkin."""
+    GRID_MINUTES = 5
+    NODE_LIMIT = 50000
+    
+    def __init__(self, meal_times=None, defaults=None):
+        self.meal_minutes = sorted(self.to_minutes(t) for t in (meal_times or MEAL_TIMES).values())
+        self.defaults = dict(SCHEDULE_CONSTRAINT_DEFAULTS, **(defaults or {}))
+    
+    @staticmethod
+    def to_minutes(slot):
+        hours, minutes = slot.split(":")
+        return int(hours) * 60 + int(minutes)
+    
+    @staticmethod
+    def to_slot(minutes):
+        return f"{minutes // 60:02d}:{minutes % 60:02d}"
+    
+    def constraints_for(self, medicine):
+        return dict(self.defaults, **(medicine.schedule_constraints or {}))
+    
+    def is_fixed(self, medicine):
+        recurrence = medicine.recurrence or {}
+        # Jadwal bertahap atau tiap N jam tidak memakai daftar jam schedule
+        return bool(self.constraints_for(medicine)['fixed'] or recurrence.get('phases') or
+                    recurrence.get('interval_hours') or not medicine.schedule)
+    
+    def candidates(self, original, medicine, constraints):
+        window = constraints['window_minutes']
+        low, high = max(0, original - window), min(24 * 60 - 1, original + window)
+        start = -(-low // self.GRID_MINUTES) * self.GRID_MINUTES
+        times = set(range(start, high + 1, self.GRID_MINUTES))
+        times.add(original)
+        if medicine.with_food:
+            after_meal = {t for t in times for meal in self.meal_minutes
+                          if meal <= t <= meal + constraints['after_meal_minutes']}
+            if after_meal:
+                times = after_meal
+        return sorted(times)
+    
+    def propose(self, person):
+        current = {}
+        fixed = set()
+        medicines = {}
+        for medicine in person.medicines:
+            if medicine.name in medicines:
+                # Nama obat ganda dengan jadwal berbeda tidak bisa diubah lewat update_medicine
+                if medicines[medicine.name].schedule != medicine.schedule:
+                    fixed.add(medicine.name)
+                continue
+            medicines[medicine.name] = medicine
+            current[medicine.name] = sorted(medicine.schedule)
+            if self.is_fixed(medicine):
+                fixed.add(medicine.name)
         
-        # Jika tidak ada, buat baru
-        if age is None:
-            age = 0
-        if condition is None:
-            condition = ""
+        base_events = {self.to_minutes(slot) for name in fixed for slot in current[name]}
+        doses = []
+        for name, medicine in medicines.items():
+            if name in fixed:
+                continue
+            constraints = self.constraints_for(medicine)
+            originals = [self.to_minutes(slot) for slot in current[name]]
+            spacing = constraints['min_spacing_minutes']
+            if spacing is None:
+                gaps = [b - a for a, b in zip(originals, originals[1:])]
+                spacing = int(min(gaps) * 0.75) if gaps else 0
+            for original in originals:
+                candidates = self.candidates(original, medicine, constraints)
+                doses.append({'medicine': name, 'original': original, 'spacing': spacing,
+                              'candidates': candidates, 'candidate_set': set(candidates)})
+        # Urutkan berdasarkan batas akhir jendela (pola greedy interval stabbing)
+        doses.sort(key=lambda dose: (dose['candidates'][-1], len(dose['candidates'])))
         
-        new_person = ElderlyPerson(name, age, condition)
-        self.elderly_people.append(new_person)
-        self.current_person = new_person
+        assignment = self.search(doses, base_events)
+        proposed = {name: list(times) for name, times in current.items()}
+        if assignment is not None:
+            for name in medicines:
+                if name not in fixed:
+                    proposed[name] = []
+            for dose, minutes in zip(doses, assignment):
+                proposed[dose['medicine']].append(self.to_slot(minutes))
+            for name in proposed:
+                proposed[name] = sorted(set(proposed[name]))
+        return ScheduleProposal(person, current, proposed, fixed)
+    
+    def search(self, doses, base_events):
+        """Branch-and-bound: minimalkan jumlah jam pengingat, lalu total pergeseran"""
+        best = {'events': None, 'shift': None, 'assignment': None}
+        nodes = [0]
+        assignment = []
+        taken = defaultdict(list)  # nama obat -> menit yang sudah dipakai
         
-        # Tambahkan ke saran
-        if name:
-            self.elderly_suggestions[name].append({
-                'age': age,
-                'condition': condition,
-                'count': 1
-            })
+        def allowed(dose, minutes):
+            return all(abs(minutes - other) >= max(dose['spacing'], 1) for other in taken[dose['medicine']])
         
-        self.save_data()
-        return new_person
+        def visit(index, events, shift):
+            nodes[0] += 1
+            if best['events'] is not None:
+                if len(events) > best['events'] or (len(events) == best['events'] and shift >= best['shift']):
+                    return
+                if nodes[0] > self.NODE_LIMIT:
+                    return
+            if index == len(doses):
+                best.update(events=len(events), shift=shift, assignment=list(assignment))
+                return
+            
+            dose = doses[index]
+            original = dose['original']
+            candidates = dose['candidates']
+            existing = sorted((minutes for minutes in events
+                               if minutes in dose['candidate_set'] and allowed(dose, minutes)),
+                              key=lambda minutes: abs(minutes - original))
+            # Jam baru: sedekat mungkin dengan jadwal semula, atau selambat mungkin agar bisa dipakai dosis berikutnya
+            fresh = [minutes for minutes in candidates if minutes not in events and allowed(dose, minutes)]
+            options = [(minutes, False) for minutes in existing]
+            if fresh:
+                nearest = min(fresh, key=lambda minutes: abs(minutes - original))
+                options.append((fresh[-1], True))
+                if nearest != fresh[-1]:
+                    options.append((nearest, True))
+            
+            for minutes, is_new in options:
+                assignment.append(minutes)
+                taken[dose['medicine']].append(minutes)
+                if is_new:
+                    events.add(minutes)
+                visit(index + 1, events, shift + abs(minutes - original))
+                if is_new:
+                    events.discard(minutes)
+                taken[dose['medicine']].pop()
+                assignment.pop()
+        
+        visit(0, set(base_events), 0)
+        return best['assignment']
+
+class ManagerEvent:
+    """Event perubahan data ElderlyManager"""
+    PERSON_ADDED = 'person_added'
+    PERSON_REMOVED = 'person_removed'
+    PERSON_UPDATED = 'person_updated'
+    PERSON_SELECTED = 'person_selected'
+    MEDICINE_ADDED = 'medicine_added'
+    MEDICINE_REMOVED = 'medicine_removed'
+    MEDICINE_UPDATED = 'medicine_updated'
+    INTAKE_RECORDED = 'intake_recorded'
+    KINDS = (PERSON_ADDED, PERSON_REMOVED, PERSON_UPDATED, PERSON_SELECTED,
+             MEDICINE_ADDED, MEDICINE_REMOVED, MEDICINE_UPDATED, INTAKE_RECORDED)
     
-    def get_person_info(self, name):
-        """Mendapatkan informasi lansia berdasarkan nama"""
-        for person in self.elderly_people:
-            if person.name == name:
-                return {
-                    'name': person.name,
-                    'age': person.age,
-                    'condition': person.condition
-                }
-        return None
+    # Asal perubahan: dari aplikasi ini, dari stasiun lain (sinkronisasi), atau dari file yang diubah proses lain
+    LOCAL = 'local'
+    SYNC = 'sync'
+    DISK = 'disk'
     
-    def add_medicine(self, medicine):
-        if self.current_person:
-            self.current_person.add_medicine(medicine)
-            self.save_data()
+    __slots__ = ('kind', 'person', 'medicine', 'data', 'origin')
     
-    def remove_medicine(self, medicine_name):
-        if self.current_person:
-            self.current_person.remove_medicine(medicine_name)
-            self.save_data()
+    def __init__(self, kind, person=None, medicine=None, data=None, origin=LOCAL):
+        if kind not in self.KINDS:
+            raise ValueError(f"Jenis event tidak dikenal: {kind}")
+        self.kind = kind
+        self.person = person  # ElderlyPerson
+        self.medicine = medicine  # Medicine atau nama obat (untuk yang sudah dihapus)
+        self.data = data or {}
+        self.origin = origin
     
-    def record_medicine_taken(self, medicine_name, time_taken):
-        if self.current_person:
-            for medicine in self.current_person.medicines:
-                if medicine.name == medicine_name:
-                    medicine.history.append({
-                        'time': time_taken,
-                        'timestamp': datetime.datetime.now().isoformat()
+    def __repr__(self):
+        person_name = self.person.name if self.person else None
+        return f"ManagerEvent({self.kind!r}, person={person_name!r})"
+
+class EventBus:
+    """Observer sederhana: handler dipanggil di thread yang mem-publish event"""
+    
+    def __init__(self):
+        self.subscribers = defaultdict(list)  # jenis event (None = semua) -> handler
+        self.lock = threading.Lock()
+    
+    def subscribe(self, kind, handler):
+        with self.lock:
+            self.subscribers[kind].append(handler)
+    
+    def unsubscribe(self, kind, handler):
+        with self.lock:
+            if handler in self.subscribers.get(kind, []):
+                self.subscribers[kind].remove(handler)
+    
+    def publish(self, event):
+        with self.lock:
+            handlers = list(self.subscribers.get(event.kind, [])) + list(self.subscribers.get(None, []))
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                print(f"Error event handler {event.kind}: {e}")
+
+class SnapshotCodec:
+    """Format snapshot biner berversi: header skema, tabel string, timestamp delta, zlib opsional.
+    Tujuannya ukuran file; memuat lebih lambat dari JSON karena timestamp disusun ulang menjadi teks ISO."""
+    MAGIC = b"MMOL"
+    VERSION = 1
+    FLAG_ZLIB = 0x01
+    EPOCH = datetime.datetime(1970, 1, 1)
+    
+    PERSON_FIELDS = ('name', 'age', 'condition', 'medicines', 'medicine_suggestions')
+    MEDICINE_FIELDS = ('name', 'dosage', 'schedule', 'description', 'with_food', 'sound_enabled',
+                       'custom_sound', 'recurrence', 'history')
+    RECORD_FIELDS = ('time', 'timestamp', 'status', 'scheduled')
+    
+    # Flag per catatan riwayat
+    REC_STATUS = 0x01
+    REC_SCHEDULED = 0x02
+    REC_EXTRA = 0x04
+    REC_RAW_TIMESTAMP = 0x08
+    REC_NO_TIME = 0x10
+    
+    @staticmethod
+    def is_snapshot(path):
+        try:
+            with open(path, 'rb') as f:
+                return f.read(4) == SnapshotCodec.MAGIC
+        except OSError:
+            return False
+    
+    # --- varint ---
+    @staticmethod
+    def _write_uvarint(out, value):
+        while value >= 0x80:
+            out.append((value & 0x7F) | 0x80)
+            value >>= 7
+        out.append(value)
+    
+    @classmethod
+    def _write_svarint(cls, out, value):
+        cls._write_uvarint(out, (value << 1) ^ (value >> 63) if value < 0 else value << 1)
+    
+    @staticmethod
+    def _read_uvarint(buf, pos):
+        result = 0
+        shift = 0
+        while True:
+            byte = buf[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result, pos
+            shift += 7
+    
+    @classmethod
+    def _read_svarint(cls, buf, pos):
+        value, pos = cls._read_uvarint(buf, pos)
+        return (value >> 1) ^ -(value & 1), pos
+    
+    @classmethod
+    def _micros(cls, moment):
+        delta = moment - cls.EPOCH
+        return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+    
+    @classmethod
+    def _from_micros(cls, micros):
+        return cls.EPOCH + datetime.timedelta(microseconds=micros)
+    
+    # --- encode ---
+    @classmethod
+    def encode(cls, people_data, compress=True, meta=None):
+        """people_data: daftar dict hasil ElderlyPerson.to_dict()"""
+        strings = {}
+        string_list = []
+        
+        def intern(value):
+            """Indeks string + 1 (0 = None)"""
+            if value is None:
+                return 0
+            index = strings.get(value)
+            if index is None:
+                index = strings[value] = len(string_list)
+                string_list.append(value)
+            return index + 1
+        
+        def intern_json(value):
+            if not value:
+                return 0
+            return intern(json.dumps(value, ensure_ascii=False, sort_keys=True))
+        
+        body = bytearray()
+        write_u = cls._write_uvarint
+        write_s = cls._write_svarint
+        write_u(body, len(people_data))
+        record_count = 0
+        for person in people_data:
+            write_u(body, intern(person.get('name', '')))
+            write_s(body, int(person.get('age') or 0))
+            write_u(body, intern(person.get('condition', '')))
+            write_u(body, intern_json(person.get('medicine_suggestions')))
+            write_u(body, intern_json({k: v for k, v in person.items() if k not in cls.PERSON_FIELDS}))
+            
+            medicines = person.get('medicines', [])
+            write_u(body, len(medicines))
+            for medicine in medicines:
+                write_u(body, intern(medicine['name']))
+                write_u(body, intern(medicine['dosage']))
+                write_u(body, intern(medicine.get('description', '')))
+                body.append((1 if medicine.get('with_food') else 0) | (2 if medicine.get('sound_enabled', True) else 0))
+                write_u(body, intern(medicine.get('custom_sound', 'reminder')))
+                schedule = medicine.get('schedule', [])
+                write_u(body, len(schedule))
+                for slot in schedule:
+                    write_u(body, intern(slot))
+                write_u(body, intern_json(medicine.get('recurrence')))
+                write_u(body, intern_json({k: v for k, v in medicine.items() if k not in cls.MEDICINE_FIELDS}))
+                
+                # Riwayat disimpan kolom: indeks jam (uint32) dan delta timestamp (int64),
+                # lalu bagian jarang untuk status/scheduled/field lain
+                history = medicine.get('history', [])
+                write_u(body, len(history))
+                time_column = array.array('I')
+                delta_column = array.array('q')
+                sparse = []
+                previous = 0
+                for index, record in enumerate(history):
+                    timestamp = record.get('timestamp', '')
+                    micros = None
+                    try:
+                        parsed = datetime.datetime.fromisoformat(timestamp)
+                        if parsed.tzinfo is None and parsed.isoformat() == timestamp:
+                            micros = cls._micros(parsed)
+                    except (TypeError, ValueError):
+                        pass
+                    time_column.append(intern(record['time']) - 1 if 'time' in record else 0)
+                    if micros is None:
+                        delta_column.append(0)
+                    else:
+                        delta_column.append(micros - previous)
+                        previous = micros
+                    
+                    flags = 0
+                    extra = {k: v for k, v in record.items() if k not in cls.RECORD_FIELDS}
+                    if micros is None:
+                        flags |= cls.REC_RAW_TIMESTAMP
+                    if 'time' not in record:
+                        flags |= cls.REC_NO_TIME
+                    if record.get('status') is not None:
+                        flags |= cls.REC_STATUS
+                    scheduled_micros = None
+                    if record.get('scheduled') is not None:
+                        try:
+                            scheduled = datetime.datetime.fromisoformat(record['scheduled'])
+                            if scheduled.isoformat() == record['scheduled'] and micros is not None:
+                                scheduled_micros = cls._micros(scheduled)
+                        except (TypeError, ValueError):
+                            pass
+                        if scheduled_micros is None:
+                            extra['scheduled'] = record['scheduled']
+                        else:
+                            flags |= cls.REC_SCHEDULED
+                    if extra:
+                        flags |= cls.REC_EXTRA
+                    if flags:
+                        sparse.append((index, flags, record, micros, scheduled_micros, extra))
+                
+                if sys.byteorder != 'little':
+                    time_column.byteswap()
+                    delta_column.byteswap()
+                body.extend(time_column.tobytes())
+                body.extend(delta_column.tobytes())
+                
+                write_u(body, len(sparse))
+                for index, flags, record, micros, scheduled_micros, extra in sparse:
+                    write_u(body, index)
+                    body.append(flags)
+                    if flags & cls.REC_RAW_TIMESTAMP:
+                        write_u(body, intern(record.get('timestamp')))
+                    if flags & cls.REC_STATUS:
+                        write_u(body, intern(record['status']))
+                    if flags & cls.REC_SCHEDULED:
+                        write_s(body, scheduled_micros - micros)
+                    if flags & cls.REC_EXTRA:
+                        write_u(body, intern_json(extra))
+                record_count += len(history)
+        
+        table = bytearray()
+        write_u(table, len(string_list))
+        for value in string_list:
+            encoded = value.encode('utf-8')
+            write_u(table, len(encoded))
+            table.extend(encoded)
+        
+        header_meta = dict(meta or {})
+        header_meta.update({'schema': cls.VERSION, 'people': len(people_data), 'records': record_count})
+        meta_bytes = json.dumps(header_meta, separators=(',', ':')).encode('utf-8')
+        
+        payload = bytes(table + body)
+        flags = 0
+        if compress:
+            payload = zlib.compress(payload, 6)
+            flags |= cls.FLAG_ZLIB
+        
+        out = bytearray(cls.MAGIC)
+        out.append(cls.VERSION)
+        out.append(flags)
+        write_u(out, len(meta_bytes))
+        out.extend(meta_bytes)
+        out.extend(payload)
+        return bytes(out)
+    
+    # --- decode ---
+    @classmethod
+    def read_meta(cls, data):
+        if data[:4] != cls.MAGIC:
+            raise ValueError("Bukan file snapshot")
+        version = data[4]
+        if version > cls.VERSION:
+            raise ValueError(f"Versi snapshot {version} belum didukung")
+        meta_length, pos = cls._read_uvarint(data, 6)
+        meta = json.loads(data[pos:pos + meta_length].decode('utf-8'))
+        return meta, data[5], pos + meta_length
+    
+    @classmethod
+    def decode(cls, data):
+        """Mengembalikan (daftar dict lansia, meta header)"""
+        meta, people = cls.iter_decode(data)
+        return list(people), meta
+    
+    @classmethod
+    def iter_decode(cls, data):
+        """Mengembalikan (meta header, generator dict lansia); lansia didekode satu per satu"""
+        meta, flags, pos = cls.read_meta(data)
+        return meta, cls._decode_people(data[pos:], flags)
+    
+    @classmethod
+    def _decode_people(cls, payload, flags):
+        if flags & cls.FLAG_ZLIB:
+            payload = zlib.decompress(payload)
+        read_u = cls._read_uvarint
+        read_s = cls._read_svarint
+        
+        count, pos = read_u(payload, 0)
+        string_list = [None]
+        for _ in range(count):
+            length, pos = read_u(payload, pos)
+            string_list.append(payload[pos:pos + length].decode('utf-8'))
+            pos += length
+        
+        def load_json(index):
+            return json.loads(string_list[index]) if index else None
+        
+        # Kolom jam riwayat menyimpan indeks tabel string tanpa offset None
+        time_strings = string_list[1:]
+        
+        person_count, pos = read_u(payload, pos)
+        for _ in range(person_count):
+            name, pos = read_u(payload, pos)
+            age, pos = read_s(payload, pos)
+            condition, pos = read_u(payload, pos)
+            suggestions, pos = read_u(payload, pos)
+            person_extra, pos = read_u(payload, pos)
+            person = {
+                'name': string_list[name],
+                'age': age,
+                'condition': string_list[condition],
+                'medicines': [],
+                'medicine_suggestions': load_json(suggestions) or {}
+            }
+            person.update(load_json(person_extra) or {})
+            
+            medicine_count, pos = read_u(payload, pos)
+            for _ in range(medicine_count):
+                med_name, pos = read_u(payload, pos)
+                dosage, pos = read_u(payload, pos)
+                description, pos = read_u(payload, pos)
+                med_flags = payload[pos]
+                pos += 1
+                custom_sound, pos = read_u(payload, pos)
+                slot_count, pos = read_u(payload, pos)
+                schedule = []
+                for _ in range(slot_count):
+                    slot, pos = read_u(payload, pos)
+                    schedule.append(string_list[slot])
+                recurrence, pos = read_u(payload, pos)
+                med_extra, pos = read_u(payload, pos)
+                medicine = {
+                    'name': string_list[med_name],
+                    'dosage': string_list[dosage],
+                    'schedule': schedule,
+                    'description': string_list[description],
+                    'with_food': bool(med_flags & 1),
+                    'sound_enabled': bool(med_flags & 2),
+                    'custom_sound': string_list[custom_sound],
+                    'recurrence': load_json(recurrence),
+                    'history': []
+                }
+                medicine.update(load_json(med_extra) or {})
+                
+                record_count, pos = read_u(payload, pos)
+                if record_count:
+                    time_column = array.array('I')
+                    time_column.frombytes(payload[pos:pos + 4 * record_count])
+                    pos += 4 * record_count
+                    delta_column = array.array('q')
+                    delta_column.frombytes(payload[pos:pos + 8 * record_count])
+                    pos += 8 * record_count
+                    if sys.byteorder != 'little':
+                        time_column.byteswap()
+                        delta_column.byteswap()
+                    
+                    micros_column = list(itertools.accumulate(delta_column))
+                    timestamps = list(map(datetime.datetime.isoformat, map(cls.EPOCH.__add__, map(
+                        datetime.timedelta, itertools.repeat(0), itertools.repeat(0), micros_column))))
+                    history = medicine['history'] = [
+                        {'time': time_strings[t], 'timestamp': timestamp}
+                        for t, timestamp in zip(time_column, timestamps)
+                    ]
+                    
+                    sparse_count, pos = read_u(payload, pos)
+                    for _ in range(sparse_count):
+                        index, pos = read_u(payload, pos)
+                        rec_flags = payload[pos]
+                        pos += 1
+                        record = history[index]
+                        if rec_flags & cls.REC_NO_TIME:
+                            del record['time']
+                        if rec_flags & cls.REC_RAW_TIMESTAMP:
+                            raw, pos = read_u(payload, pos)
+                            record['timestamp'] = string_list[raw]
+                        if rec_flags & cls.REC_STATUS:
+                            status, pos = read_u(payload, pos)
+                            record['status'] = string_list[status]
+                        if rec_flags & cls.REC_SCHEDULED:
+                            offset, pos = read_s(payload, pos)
+                            record['scheduled'] = cls._from_micros(micros_column[index] + offset).isoformat()
+                        if rec_flags & cls.REC_EXTRA:
+                            extra, pos = read_u(payload, pos)
+                            record.update(load_json(extra))
+                else:
+                    _, pos = read_u(payload, pos)  # bagian jarang kosong
+                person['medicines'].append(medicine)
+            yield person
+    
+    @classmethod
+    def write_file(cls, path, people_data, compress=True, meta=None):
+        data = cls.encode(people_data, compress, meta)
+        temp_file = str(path) + ".tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file, path)
+        return len(data)
+    
+    @classmethod
+    def read_file(cls, path):
+        with open(path, 'rb') as f:
+            return cls.decode(f.read())
+
+class StockForecastIndex:
+    """Indeks terurut perkiraan habis stok seluruh fasilitas untuk kueri 'habis dalam N hari'"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = []  # [(timestamp habis, nama lansia, nama obat)] terurut
+        self.runouts = {}  # (nama lansia, nama obat) -> timestamp habis
+    
+    def _discard(self, key):
+        runout = self.runouts.pop(key, None)
+        if runout is not None:
+            index = bisect.bisect_left(self.entries, (runout,) + key)
+            if index < len(self.entries) and self.entries[index] == (runout,) + key:
+                del self.entries[index]
+    
+    def update(self, person, medicine, now):
+        key = (person.name, medicine.name)
+        runout = medicine.forecast_runout(now)
+        with self.lock:
+            self._discard(key)
+            if runout is not None:
+                self.runouts[key] = runout.timestamp()
+                bisect.insort(self.entries, (self.runouts[key],) + key)
+    
+    def remove(self, person_name, medicine_name=None):
+        with self.lock:
+            if medicine_name is not None:
+                self._discard((person_name, medicine_name))
+            else:
+                for key in [key for key in self.runouts if key[0] == person_name]:
+                    self._discard(key)
+    
+    def rebuild(self, people, now):
+        entries = []
+        runouts = {}
+        for person in people:
+            for medicine in person.medicines:
+                key = (person.name, medicine.name)
+                if key in runouts:
+                    continue  # obat bernama sama: pakai entri pertama seperti find_medicine
+                runout = medicine.forecast_runout(now)
+                if runout is not None:
+                    runouts[key] = runout.timestamp()
+                    entries.append((runouts[key],) + key)
+        entries.sort()
+        with self.lock:
+            self.entries = entries
+            self.runouts = runouts
+    
+    def runs_out_within(self, days, now):
+        """[(waktu habis, nama lansia, nama obat)] yang stoknya habis sebelum now + days, paling dekat dulu"""
+        limit = (now + datetime.timedelta(days=days)).timestamp()
+        with self.lock:
+            end = bisect.bisect_right(self.entries, (limit, chr(0x10FFFF)))
+            found = self.entries[:end]
+        return [(datetime.datetime.fromtimestamp(runout), person_name, medicine_name)
+                for runout, person_name, medicine_name in found]
+    
+    def bind(self, manager):
+        """Perbarui indeks dari event ElderlyManager"""
+        def on_event(event):
+            if event.kind == ManagerEvent.PERSON_REMOVED:
+                self.remove(event.person.name)
+            elif event.kind == ManagerEvent.MEDICINE_REMOVED:
+                self.remove(event.person.name, getattr(event.medicine, 'name', event.medicine))
+                _, medicine = manager.find_medicine(event.person.name, getattr(event.medicine, 'name', event.medicine))
+                if medicine is not None:
+                    self.update(event.person, medicine, manager.clock.now())
+            elif event.kind in (ManagerEvent.MEDICINE_ADDED, ManagerEvent.MEDICINE_UPDATED,
+                                ManagerEvent.INTAKE_RECORDED):
+                _, medicine = manager.find_medicine(event.person.name, event.medicine.name)
+                if medicine is not None:
+                    self.update(event.person, medicine, manager.clock.now())
+        
+        manager.events.subscribe(None, on_event)
+        return on_event
+
+class UpcomingDoseIndex:
+    """Indeks terurut waktu semua jadwal minum (lansia, obat, slot) di seluruh fasilitas, untuk dashboard
+    'dosis mendatang'. Diperbarui per obat lewat event; jendela waktu digeser maju dengan heap kursor per
+    obat sehingga tidak perlu memindai ulang semua lansia."""
+    OVERDUE_HOURS = 12  # slot lewat yang belum dicatat tetap ditampilkan (terlambat) selama ini
+    HORIZON_HOURS = 24  # jadwal ke depan yang disimpan di indeks
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = []  # [(timestamp slot, nama lansia, nama obat)] terurut, hanya slot yang belum dicatat
+        self.slots = {}  # (nama lansia, nama obat) -> [timestamp slot] terurut
+        self.medicines = {}  # (nama lansia, nama obat) -> Medicine
+        self.cursors = []  # heap [(timestamp slot berikutnya di luar jendela, key, versi, Medicine)]
+        self.versions = {}  # key -> versi; kursor dengan versi lama diabaikan
+        self.window_start = None
+        self.window_end = None
+    
+    def _discard(self, key):
+        for slot in self.slots.pop(key, []):
+            index = bisect.bisect_left(self.entries, (slot,) + key)
+            if index < len(self.entries) and self.entries[index] == (slot,) + key:
+                del self.entries[index]
+        self.medicines.pop(key, None)
+        self.versions[key] = self.versions.get(key, 0) + 1
+    
+    def _load(self, person, medicine):
+        """Slot belum dicatat dalam jendela untuk satu obat; kursor diletakkan di slot pertama setelah jendela"""
+        key = (person.name, medicine.name)
+        self.medicines[key] = medicine
+        version = self.versions.get(key, 0) + 1
+        self.versions[key] = version
+        try:
+            rule = medicine.get_rule()
+            slots = [slot.timestamp() for slot in rule.occurrences_between(self.window_start, self.window_end)]
+        except Exception as e:
+            print(f"Error jadwal {person.name}/{medicine.name}: {e}")
+            return []
+        
+        # Riwayat terbaru saja (riwayat disimpan berurutan waktu)
+        oldest = (self.window_start - datetime.timedelta(days=1)).isoformat()
+        recent = []
+        for record in reversed(medicine.history):
+            if record.get('timestamp', '') < oldest:
+                break
+            recent.append(record)
+        for record in reversed(recent):
+            self._resolve_in(slots, record)
+        
+        self.slots[key] = slots
+        following = rule.next_occurrence(self.window_end)
+        if following is not None:
+            heapq.heappush(self.cursors, (following.timestamp(), key, version, medicine))
+        return [(slot,) + key for slot in slots]
+    
+    @staticmethod
+    def _resolve_in(slots, record):
+        """Hapus slot yang diselesaikan catatan riwayat: slot yang sama persis, atau untuk catatan manual
+        tanpa 'scheduled', slot terakhir sebelum waktu pencatatan"""
+        try:
+            date, time_str = history_slot_key(record)
+            exact = datetime.datetime.fromisoformat(f"{date}T{time_str}").timestamp()
+            recorded_at = datetime.datetime.fromisoformat(record['timestamp']).timestamp()
+        except (KeyError, TypeError, ValueError):
+            return None
+        index = bisect.bisect_left(slots, exact)
+        if index < len(slots) and slots[index] == exact:
+            return slots.pop(index)
+        if record.get('scheduled') or record.get('status', 'taken') != 'taken':
+            return None
+        index = bisect.bisect_right(slots, recorded_at) - 1
+        if index >= 0:
+            return slots.pop(index)
+        return None
+    
+    def rebuild(self, people, now):
+        with self.lock:
+            self.entries = []
+            self.slots = {}
+            self.medicines = {}
+            self.cursors = []
+            self.window_start = now - datetime.timedelta(hours=self.OVERDUE_HOURS)
+            self.window_end = now + datetime.timedelta(hours=self.HORIZON_HOURS)
+            for person in people:
+                for medicine in person.medicines:
+                    if (person.name, medicine.name) not in self.medicines:  # obat bernama sama: entri pertama
+                        self.entries.extend(self._load(person, medicine))
+            self.entries.sort()
+    
+    def update(self, person, medicine):
+        if self.window_start is None:
+            return
+        with self.lock:
+            self._discard((person.name, medicine.name))
+            for entry in self._load(person, medicine):
+                bisect.insort(self.entries, entry)
+    
+    def remove(self, person_name, medicine_name=None):
+        with self.lock:
+            if medicine_name is not None:
+                self._discard((person_name, medicine_name))
+            else:
+                for key in [key for key in self.slots if key[0] == person_name]:
+                    self._discard(key)
+    
+    def resolve(self, person_name, medicine_name, record):
+        key = (person_name, medicine_name)
+        with self.lock:
+            slots = self.slots.get(key)
+            if slots is None:
+                return
+            slot = self._resolve_in(slots, record)
+            if slot is not None:
+                index = bisect.bisect_left(self.entries, (slot,) + key)
+                if index < len(self.entries) and self.entries[index] == (slot,) + key:
+                    del self.entries[index]
+    
+    def advance(self, now):
+        """Geser jendela: buang slot yang terlalu lama, tambah slot baru dari kursor yang masuk jendela"""
+        if self.window_start is None:
+            return
+        with self.lock:
+            self.window_end = max(self.window_end, now + datetime.timedelta(hours=self.HORIZON_HOURS))
+            end = self.window_end.timestamp()
+            while self.cursors and self.cursors[0][0] <= end:
+                slot, key, version, medicine = heapq.heappop(self.cursors)
+                if self.versions.get(key) != version:
+                    continue
+                bisect.insort(self.entries, (slot,) + key)
+                self.slots[key].append(slot)
+                following = medicine.get_rule().next_occurrence(datetime.datetime.fromtimestamp(slot))
+                if following is not None:
+                    heapq.heappush(self.cursors, (following.timestamp(), key, version, medicine))
+            
+            self.window_start = max(self.window_start, now - datetime.timedelta(hours=self.OVERDUE_HOURS))
+            cutoff = bisect.bisect_left(self.entries, (self.window_start.timestamp(),))
+            for slot, person_name, medicine_name in self.entries[:cutoff]:
+                slots = self.slots.get((person_name, medicine_name))
+                if slots and slots[0] == slot:
+                    slots.pop(0)
+            del self.entries[:cutoff]
+    
+    def due_between(self, start, end):
+        """[(slot datetime, nama lansia, Medicine)] belum dicatat dalam [start, end], urut waktu"""
+        with self.lock:
+            first = bisect.bisect_left(self.entries, (start.timestamp(),))
+            last = bisect.bisect_right(self.entries, (end.timestamp(), chr(0x10FFFF)))
+            found = self.entries[first:last]
+            return [(datetime.datetime.fromtimestamp(slot), person_name, self.medicines[(person_name, medicine_name)])
+                    for slot, person_name, medicine_name in found]
+    
+    def bind(self, manager):
+        """Perbarui indeks dari event ElderlyManager"""
+        def on_event(event):
+            if event.person is None:
+                return
+            medicine_name = getattr(event.medicine, 'name', event.medicine)
+            if event.kind == ManagerEvent.PERSON_REMOVED:
+                self.remove(event.person.name)
+            elif event.kind == ManagerEvent.PERSON_ADDED:
+                for medicine in event.person.medicines:
+                    self.update(event.person, manager.find_medicine(event.person.name, medicine.name)[1])
+            elif event.kind in (ManagerEvent.MEDICINE_ADDED, ManagerEvent.MEDICINE_UPDATED,
+                                ManagerEvent.MEDICINE_REMOVED):
+                self.remove(event.person.name, medicine_name)
+                _, medicine = manager.find_medicine(event.person.name, medicine_name)
+                if medicine is not None:
+                    self.update(event.person, medicine)
+            elif event.kind == ManagerEvent.INTAKE_RECORDED:
+                self.resolve(event.person.name, medicine_name, event.data)
+        
+        manager.events.subscribe(None, on_event)
+        return on_event
+
+class InteractionChecker:
+    """Pemeriksa interaksi obat dan jarak minum dari file aturan lokal (interaksi_obat.json).
+    Aturan diindeks sekali per pasangan nama obat yang dinormalisasi (grup seperti "nsaid" sudah dijabarkan),
+    sehingga satu obat baru diperiksa terhadap k obat lansia cukup dengan k kali lookup dict.
+    Hasil per lansia di-cache dan dibuang saat obat lansia itu berubah."""
+    SEVERITY_ORDER = {'ringan': 0, 'sedang': 1, 'berat': 2}
+    UNIT_WORDS = {'mg', 'mcg', 'g', 'ml', 'iu', 'tab', 'tablet', 'kaplet', 'kapsul', 'caps', 'sirup', 'tetes'}
+    CHECK_DAYS = 7  # jadwal yang dibandingkan untuk aturan jarak minum
+    
+    def __init__(self, rules_file="interaksi_obat.json"):
+        self.rules_file = rules_file
+        self.lock = threading.RLock()
+        self.signature = None
+        self.aliases = {}
+        self.index = {}  # nama obat -> {nama obat lain -> aturan}
+        self.names = {}  # nama seperti diketik -> nama kanonik (memo)
+        self.cache = {}  # nama lansia -> (tanggal, temuan)
+        self.reload_if_changed()
+    
+    @classmethod
+    def normalize(cls, name):
+        """Huruf kecil tanpa keterangan dalam kurung, angka, dan satuan dosis (Amlodipine 5mg -> amlodipine)"""
+        text = re.sub(r"\(.*?\)", " ", (name or "").lower())
+        return " ".join(word for word in re.split(r"[\W\d_]+", text) if word and word not in cls.UNIT_WORDS)
+    
+    def canonical(self, name):
+        """Nama kanonik untuk indeks (alias diterapkan; "amlodipine besylate" jatuh ke "amlodipine")"""
+        found = self.names.get(name)
+        if found is None:
+            normalized = self.normalize(name)
+            found = self.aliases.get(normalized, normalized)
+            if found not in self.index and " " in found:
+                first = found.split(" ", 1)[0]
+                first = self.aliases.get(first, first)
+                if first in self.index:
+                    found = first
+            self.names[name] = found
+        return found
+    
+    def reload_if_changed(self):
+        if not self.rules_file:
+            return
+        signature = file_signature(self.rules_file)
+        if signature == self.signature:
+            return
+        aliases, index = {}, {}
+        if signature is not None:
+            try:
+                with open(self.rules_file, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+                aliases, index = self.build_index(data)
+            except Exception as e:
+                print(f"Error membaca aturan interaksi obat: {e}")
+        with self.lock:
+            self.signature = signature
+            self.aliases = aliases
+            self.index = index
+            self.names = {}
+            self.cache = {}
+    
+    @classmethod
+    def build_index(cls, data):
+        aliases = {cls.normalize(alias): cls.normalize(target) for alias, target in data.get('aliases', {}).items()}
+        
+        def resolve(name):
+            normalized = cls.normalize(name)
+            return aliases.get(normalized, normalized)
+        
+        groups = {cls.normalize(group): [resolve(member) for member in members]
+                  for group, members in data.get('groups', {}).items()}
+        index = defaultdict(dict)
+        for rule in data.get('rules', []):
+            first, second = [groups.get(cls.normalize(drug), [resolve(drug)]) for drug in rule['drugs']]
+            entry = {
+                'severity': rule.get('severity', 'sedang'),
+                'min_gap_hours': rule.get('min_gap_hours'),
+                'note': rule.get('note', ""),
+                'drugs': list(rule['drugs'])
+            }
+            for a in first:
+                for b in second:
+                    if a == b:
+                        continue
+                    for x, y in ((a, b), (b, a)):
+                        current = index[x].get(y)
+                        if current is None or cls.SEVERITY_ORDER.get(entry['severity'], 1) > \
+                                cls.SEVERITY_ORDER.get(current['severity'], 1):
+                            index[x][y] = entry
+        return aliases, dict(index)
+    
+    @staticmethod
+    def closest_doses(first, second, start, end):
+        """Pasangan jadwal (a, b) terdekat antara dua obat dalam [start, end], atau None"""
+        times_a = list(first.get_rule().occurrences_between(start, end))
+        times_b = list(second.get_rule().occurrences_between(start, end))
+        best = None
+        i = j = 0
+        while i < len(times_a) and j < len(times_b):
+            gap = abs(times_a[i] - times_b[j])
+            if best is None or gap < best[0]:
+                best = (gap, times_a[i], times_b[j])
+            if times_a[i] < times_b[j]:
+                i += 1
+            else:
+                j += 1
+        return best and best[1:]
+    
+    def _compare(self, medicine, other, now):
+        """Temuan antara dua obat (None jika aman)"""
+        name, other_name = self.canonical(medicine.name), self.canonical(other.name)
+        if name and name == other_name:
+            return {'kind': 'duplikat', 'severity': 'sedang', 'medicine': medicine.name, 'other': other.name,
+                    'note': "Obat yang sama tercatat lebih dari sekali"}
+        rule = self.index.get(name, {}).get(other_name)
+        if rule is None:
+            return None
+        finding = {'kind': 'interaksi', 'severity': rule['severity'], 'medicine': medicine.name,
+                   'other': other.name, 'note': rule['note']}
+        if rule['min_gap_hours'] is not None:
+            closest = self.closest_doses(medicine, other, now, now + datetime.timedelta(days=self.CHECK_DAYS))
+            if closest is None:
+                return None
+            gap_minutes = abs(closest[0] - closest[1]).total_seconds() / 60
+            if gap_minutes >= rule['min_gap_hours'] * 60:
+                return None
+            finding.update(kind='jarak', min_gap_hours=rule['min_gap_hours'], gap_minutes=gap_minutes,
+                           slots=closest)
+        return finding
+    
+    def check_new(self, person, medicine, now=None):
+        """Periksa obat yang akan ditambahkan terhadap obat lansia saat ini (k lookup)"""
+        self.reload_if_changed()
+        now = now or datetime.datetime.now()
+        with self.lock:
+            findings = [self._compare(medicine, other, now) for other in person.medicines if other is not medicine]
+        return [finding for finding in findings if finding is not None]
+    
+    def check_person(self, person, now=None):
+        """Semua temuan antar obat seorang lansia (di-cache per hari)"""
+        self.reload_if_changed()
+        now = now or datetime.datetime.now()
+        with self.lock:
+            cached = self.cache.get(person.name)
+            if cached is not None and cached[0] == now.date():
+                return cached[1]
+            findings = []
+            medicines = person.medicines
+            for index, medicine in enumerate(medicines):
+                for other in medicines[index + 1:]:
+                    finding = self._compare(medicine, other, now)
+                    if finding is not None:
+                        findings.append(finding)
+            findings.sort(key=lambda f: -self.SEVERITY_ORDER.get(f['severity'], 1))
+            self.cache[person.name] = (now.date(), findings)
+            return findings
+    
+    def audit(self, people, now=None):
+        """Audit seluruh fasilitas: {nama lansia: temuan} untuk lansia yang punya temuan"""
+        now = now or datetime.datetime.now()
+        result = {}
+        for person in people:
+            findings = self.check_person(person, now)
+            if findings:
+                result[person.name] = findings
+        return result
+    
+    def invalidate(self, person_name=None):
+        with self.lock:
+            if person_name is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(person_name, None)
+    
+    def bind(self, manager):
+        """Buang cache lansia yang daftar/jadwal obatnya berubah"""
+        def on_event(event):
+            if event.person is not None and event.kind in (
+                    ManagerEvent.MEDICINE_ADDED, ManagerEvent.MEDICINE_REMOVED, ManagerEvent.MEDICINE_UPDATED,
+                    ManagerEvent.PERSON_ADDED, ManagerEvent.PERSON_REMOVED):
+                self.invalidate(event.person.name)
+        
+        manager.events.subscribe(None, on_event)
+        return on_event
+
+def format_interaction(finding):
+    """Satu baris keterangan temuan interaksi untuk ditampilkan"""
+    text = f"[{finding['severity'].upper()}] {finding['medicine']} + {finding['other']}: {finding['note']}"
+    if finding['kind'] == 'jarak':
+        first, second = finding['slots']
+        text += (f" (jadwal {first:%H:%M} dan {second:%H:%M} hanya berjarak "
+                 f"{finding['gap_minutes'] / 60:.1f} jam, minimal {finding['min_gap_hours']} jam)")
+    return text
+
+class BackupStore:
+    """Backup file data dengan potongan (chunk) berbasis isi yang dideduplikasi per hash: setiap backup hanya
+    menyimpan potongan yang berubah. backup/chunks/<hash> berisi potongan (zlib), backup/manifests/<id>.json
+    berisi daftar potongan satu backup."""
+    MIN_CHUNK = 2 * 1024
+    MAX_CHUNK = 64 * 1024
+    BOUNDARY_MASK = 0x1FF  # batas potongan di baris dengan crc32 & mask == 0 (rata-rata ~16 KB untuk JSON)
+    
+    # Kebijakan retensi: N backup terakhir, satu per hari selama N hari, satu per minggu selama N minggu
+    KEEP_LAST = 24
+    KEEP_DAILY = 14
+    KEEP_WEEKLY = 8
+    
+    def __init__(self, backup_dir="backup"):
+        self.backup_dir = Path(backup_dir)
+        self.chunk_dir = self.backup_dir / "chunks"
+        self.manifest_dir = self.backup_dir / "manifests"
+        self.lock = threading.Lock()
+    
+    @classmethod
+    def split_chunks(cls, data):
+        """Memotong data di batas yang ditentukan isi baris, sehingga sisipan di satu tempat hanya
+        mengubah potongan di sekitarnya (potongan lain tetap sama dan tidak disimpan ulang)"""
+        chunks = []
+        start = pos = 0
+        lines = data.splitlines(keepends=True)
+        for line, line_hash in zip(lines, map(zlib.crc32, lines)):
+            pos += len(line)
+            size = pos - start
+            if (size >= cls.MIN_CHUNK and not line_hash & cls.BOUNDARY_MASK) or size >= cls.MAX_CHUNK:
+                # Baris sangat panjang (atau data biner tanpa baris) dipotong per MAX_CHUNK
+                while pos - start > cls.MAX_CHUNK:
+                    chunks.append(data[start:start + cls.MAX_CHUNK])
+                    start += cls.MAX_CHUNK
+                chunks.append(data[start:pos])
+                start = pos
+        if start < len(data):
+            chunks.append(data[start:])
+        return chunks
+    
+    def chunk_path(self, digest):
+        return self.chunk_dir / digest[:2] / digest
+    
+    def manifest_path(self, backup_id):
+        return self.manifest_dir / f"{backup_id}.json"
+    
+    def list_backups(self):
+        """Daftar manifest backup, terlama lebih dulu"""
+        if not self.manifest_dir.exists():
+            return []
+        manifests = []
+        for path in sorted(self.manifest_dir.glob("*.json")):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    manifests.append(json.load(f))
+            except Exception as e:
+                print(f"Error reading backup manifest {path.name}: {e}")
+        manifests.sort(key=lambda manifest: manifest['created'])
+        return manifests
+    
+    def latest(self):
+        backups = self.list_backups()
+        return backups[-1] if backups else None
+    
+    def get(self, backup_id=None):
+        """Manifest backup tertentu (None = terbaru)"""
+        if backup_id is None:
+            return self.latest()
+        with open(self.manifest_path(backup_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def backup(self, path, now=None):
+        """Membuat backup file; mengembalikan manifest, atau None bila isi file sama dengan backup terakhir"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.sha256(data).hexdigest()
+        with self.lock:
+            latest = self.latest()
+            if latest and latest['sha256'] == digest:
+                return None
+            
+            now = now or datetime.datetime.now()
+            backup_id = now.strftime("%Y%m%d-%H%M%S")
+            suffix = 1
+            while self.manifest_path(backup_id).exists():
+                backup_id = f"{now.strftime('%Y%m%d-%H%M%S')}-{suffix}"
+                suffix += 1
+            
+            hashes = []
+            new_chunks = new_bytes = 0
+            for chunk in self.split_chunks(data):
+                chunk_digest = hashlib.sha256(chunk).hexdigest()
+                hashes.append(chunk_digest)
+                chunk_path = self.chunk_path(chunk_digest)
+                if chunk_path.exists():
+                    continue
+                chunk_path.parent.mkdir(parents=True, exist_ok=True)
+                temp_file = chunk_path.with_suffix(".tmp")
+                with open(temp_file, 'wb') as f:
+                    f.write(zlib.compress(chunk))
+                os.replace(temp_file, chunk_path)
+                new_chunks += 1
+                new_bytes += len(chunk)
+            
+            manifest = {'id': backup_id, 'created': now.isoformat(), 'source': str(path), 'size': len(data),
+                        'sha256': digest, 'chunks': hashes, 'new_chunks': new_chunks, 'new_bytes': new_bytes}
+            self.manifest_dir.mkdir(parents=True, exist_ok=True)
+            temp_file = self.manifest_path(backup_id).with_suffix(".tmp")
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(manifest, f)
+            os.replace(temp_file, self.manifest_path(backup_id))
+            return manifest
+    
+    def read_chunk(self, digest):
+        with open(self.chunk_path(digest), 'rb') as f:
+            chunk = zlib.decompress(f.read())
+        if hashlib.sha256(chunk).hexdigest() != digest:
+            raise ValueError(f"Potongan {digest[:12]} rusak")
+        return chunk
+    
+    def assemble(self, backup_id=None):
+        """Menyusun kembali isi file dari potongan backup dan memeriksa hash keseluruhannya"""
+        manifest = self.get(backup_id)
+        if manifest is None:
+            raise FileNotFoundError("Belum ada backup")
+        data = b"".join(map(self.read_chunk, manifest['chunks']))
+        if hashlib.sha256(data).hexdigest() != manifest['sha256']:
+            raise ValueError(f"Backup {manifest['id']} tidak utuh")
+        return manifest, data
+    
+    def verify(self, backup_id=None):
+        """Memeriksa semua potongan (atau satu backup); mengembalikan {id backup: [masalah]} untuk yang rusak"""
+        manifests = [self.get(backup_id)] if backup_id else self.list_backups()
+        chunk_status = {}  # potongan dipakai banyak backup: cukup diperiksa sekali
+        problems = {}
+        for manifest in manifests:
+            errors = []
+            digest = hashlib.sha256()
+            for chunk_digest in manifest['chunks']:
+                if chunk_digest not in chunk_status:
+                    try:
+                        chunk_status[chunk_digest] = self.read_chunk(chunk_digest)
+                    except Exception as e:
+                        chunk_status[chunk_digest] = None
+                        errors.append(f"{chunk_digest[:12]}: {e}")
+                chunk = chunk_status[chunk_digest]
+                if chunk is not None:
+                    digest.update(chunk)
+            if not errors and digest.hexdigest() != manifest['sha256']:
+                errors.append("hash file tidak cocok")
+            if errors:
+                problems[manifest['id']] = errors
+        return problems
+    
+    def assemble_latest_valid(self):
+        """Backup terbaru yang masih utuh (melewati backup yang potongannya rusak/hilang)"""
+        for manifest in reversed(self.list_backups()):
+            try:
+                return self.assemble(manifest['id'])
+            except Exception as e:
+                print(f"Error backup {manifest['id']}: {e}")
+        raise FileNotFoundError("Tidak ada backup yang utuh")
+    
+    def restore(self, destination, backup_id=None, keep_previous=None):
+        """Mengembalikan file dari backup (None = terbaru yang utuh) secara atomik; file lama disimpan
+        sebagai keep_previous bila diberikan. Mengembalikan manifest."""
+        manifest, data = self.assemble(backup_id) if backup_id else self.assemble_latest_valid()
+        if keep_previous and os.path.exists(destination):
+            shutil.copyfile(destination, keep_previous)
+        temp_file = str(destination) + ".tmp"
+        with open(temp_file, 'wb') as f:
+            f.write(data)
+        os.replace(temp_file, destination)
+        return manifest
+    
+    def prune(self, keep_last=None, keep_daily=None, keep_weekly=None):
+        """Menghapus backup di luar kebijakan retensi dan potongan yang tidak dipakai lagi"""
+        keep_last = self.KEEP_LAST if keep_last is None else keep_last
+        keep_daily = self.KEEP_DAILY if keep_daily is None else keep_daily
+        keep_weekly = self.KEEP_WEEKLY if keep_weekly is None else keep_weekly
+        with self.lock:
+            backups = self.list_backups()
+            keep = {manifest['id'] for manifest in backups[-keep_last:]} if keep_last else set()
+            days, weeks = {}, {}
+            for manifest in reversed(backups):  # backup terbaru per hari/minggu
+                created = datetime.datetime.fromisoformat(manifest['created'])
+                days.setdefault(created.date(), manifest['id'])
+                weeks.setdefault(created.isocalendar()[:2], manifest['id'])
+            keep.update(list(days.values())[:keep_daily])
+            keep.update(list(weeks.values())[:keep_weekly])
+            
+            removed = [manifest for manifest in backups if manifest['id'] not in keep]
+            for manifest in removed:
+                os.remove(self.manifest_path(manifest['id']))
+            
+            used = {digest for manifest in backups if manifest['id'] in keep for digest in manifest['chunks']}
+            removed_chunks = 0
+            if self.chunk_dir.exists():
+                for chunk_path in self.chunk_dir.glob("*/*"):
+                    if chunk_path.name not in used:
+                        os.remove(chunk_path)
+                        removed_chunks += 1
+            return len(removed), removed_chunks
+
+class DataFileSalvager:
+    """Pemuat penyelamat untuk file data rusak atau format lama: membaca lansia satu per satu (memori sebesar
+    satu lansia terbesar), memvalidasi setiap lansia, obat, jam jadwal, dan catatan riwayat. Yang valid
+    diselamatkan; yang rusak ditulis ke file karantina (JSON per baris) beserta diagnosisnya."""
+    READ_SIZE = 256 * 1024
+    TIME_PATTERN = re.compile(r'([01]\d|2[0-3]):[0-5]\d$')
+    WRAPPER_START = re.compile(r'\s*\{\s*"generation"\s*:\s*(\d+)\s*,\s*"people"\s*:\s*\[')
+    SEPARATORS = re.compile(r'[\s,]*')
+    STATUSES = (None, 'taken', 'missed')
+    
+    def __init__(self, path, quarantine_file=None):
+        self.path = path
+        self.quarantine_file = quarantine_file or str(path) + ".karantina.jsonl"
+        self.quarantine = None  # file karantina dibuka saat ada entri pertama
+        self.generation = 0
+        self.counts = defaultdict(int)
+    
+    def report(self):
+        """Jumlah yang diselamatkan dan dikarantina"""
+        return dict(self.counts, generation=self.generation, quarantine_file=self.quarantine_file)
+    
+    def quarantine_entry(self, kind, location, problems, data=None, text=None):
+        if self.quarantine is None:
+            self.quarantine = open(self.quarantine_file, 'a', encoding='utf-8')
+            self.quarantine.write(json.dumps({'sumber': str(self.path),
+                                              'waktu': datetime.datetime.now().isoformat()}) + "\n")
+        entry = {'jenis': kind, 'lokasi': location, 'masalah': problems}
+        if text is not None:
+            entry['teks'] = text
+        else:
+            entry['data'] = data
+        self.quarantine.write(json.dumps(entry, ensure_ascii=False, default=str) + "\n")
+        self.counts[f"karantina_{kind}"] += 1
+    
+    def iter_elements(self, f):
+        """Menghasilkan (dict, None) per lansia yang bisa di-parse, atau (None, (teks rusak, pesan)).
+        Setelah bagian rusak, pembacaan dilanjutkan dari '{' berikutnya."""
+        decoder = json.JSONDecoder()
+        buf = f.read(self.READ_SIZE)
+        pos = 0
+        eof = False
+        offset = 0  # posisi buf[0] di dalam file
+        resynced = False  # setelah bagian rusak posisi bisa berada di dalam lansia: ']' bukan akhir daftar
+        
+        def fill(keep_from):
+            nonlocal buf, pos, eof, offset
+            chunk = f.read(self.READ_SIZE)
+            if not chunk:
+                eof = True
+            buf = buf[keep_from:] + chunk
+            pos -= keep_from
+            offset += keep_from
+            return bool(chunk)
+        
+        while len(buf) < 4096 and fill(0):
+            pass
+        header = self.WRAPPER_START.match(buf)
+        if header:
+            self.generation = int(header.group(1))
+            pos = header.end()
+        elif buf.lstrip().startswith('['):
+            pos = buf.index('[') + 1
+        
+        while True:
+            pos = self.SEPARATORS.match(buf, pos).end()
+            if pos >= len(buf):
+                if fill(pos):
+                    continue
+                return
+            if buf[pos] == ']' and not resynced:
+                return
+            start = pos
+            problem = f"karakter tidak terduga {buf[pos]!r} (karakter ke-{offset + pos})"
+            if buf[pos] == '{':
+                try:
+                    value, pos = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError as e:
+                    # Elemen terpotong oleh batas buffer: baca lagi lalu ulangi
+                    if not eof and (e.pos >= len(buf) - 1 or e.msg.startswith("Unterminated")):
+                        fill(start)
+                        continue
+                    problem = f"{e.msg} (karakter ke-{offset + e.pos})"
+                else:
+                    yield value, None
+                    continue
+            
+            # Cari awal elemen berikutnya
+            while True:
+                resume = buf.find('{', start + 1)
+                if resume >= 0 or eof:
+                    break
+                fill(start)
+                start = 0
+            if resume < 0:
+                resume = len(buf)
+            if buf[start] != ']':
+                yield None, (buf[start:resume], problem)
+            pos = resume
+            resynced = True
+    
+    def load(self):
+        """Membaca file dan mengembalikan daftar ElderlyPerson yang valid"""
+        people = []
+        try:
+            if SnapshotCodec.is_snapshot(self.path):
+                # Snapshot biner tidak bisa dibaca sebagian; validasi tetap per lansia
+                data, meta = SnapshotCodec.read_file(self.path)
+                self.generation = meta.get('generation', 0)
+                self.collect(((person, None) for person in data), people)
+            else:
+                with open(self.path, 'r', encoding='utf-8', errors='replace') as f:
+                    self.collect(self.iter_elements(f), people)
+                self.generation = self.generation or read_generation(self.path)
+        finally:
+            if self.quarantine is not None:
+                self.quarantine.close()
+                self.quarantine = None
+        self.counts['lansia'] = len(people)
+        return people
+    
+    @staticmethod
+    def is_person(data):
+        return isinstance(data, dict) and isinstance(data.get('name'), str) and \
+            ('medicines' in data or 'age' in data) and 'schedule' not in data
+    
+    def collect(self, elements, people):
+        fragments = []  # obat/riwayat yang terbaca lepas setelah bagian rusak, dikarantina bersama
+        for index, (data, damaged) in enumerate(elements):
+            if damaged is None and not self.is_person(data) and not (
+                    isinstance(data, dict) and isinstance(data.get('people'), list)):
+                fragments.append(data)
+                continue
+            if fragments:
+                self.quarantine_entry('pecahan', f"sebelum elemen #{index}",
+                                      ["potongan data di luar lansia yang utuh (obat/riwayat dari bagian rusak)"],
+                                      fragments)
+                fragments = []
+            if damaged is not None:
+                self.quarantine_entry('teks_rusak', f"elemen #{index}", [damaged[1]], text=damaged[0])
+                continue
+            if isinstance(data, dict) and isinstance(data.get('people'), list):
+                # Pembungkus generasi yang terbaca utuh (urutan kunci berbeda)
+                self.generation = data.get('generation', 0)
+                candidates = data['people']
+            else:
+                candidates = [data]
+            for data in candidates:
+                person = self.salvage_person(data, f"elemen #{index}")
+                if person is not None:
+                    people.append(person)
+        if fragments:
+            self.quarantine_entry('pecahan', "akhir file", ["potongan data di luar lansia yang utuh"], fragments)
+    
+    def salvage_person(self, data, location):
+        if not isinstance(data, dict):
+            self.quarantine_entry('tidak_dikenal', location, ["bukan objek"], data)
+            return None
+        if not self.is_person(data):
+            self.quarantine_entry('lansia', location, ["bukan data lansia (nama/umur/daftar obat tidak ada)"], data)
+            return None
+        name = data['name']
+        location = f"{location} ({name})"
+        
+        problems = {}
+        age = data.get('age', 0)
+        if isinstance(age, str) and age.strip().isdigit():
+            age = int(age)
+        if not isinstance(age, int) or isinstance(age, bool) or not 0 <= age <= 150:
+            problems['age'] = f"umur tidak valid: {age!r}"
+            age = 0
+        condition = data.get('condition', '')
+        if not isinstance(condition, str):
+            problems['condition'] = f"kondisi bukan teks: {condition!r}"
+            condition = str(condition)
+        volume = data.get('sound_volume', 1.0)
+        if not isinstance(volume, (int, float)) or isinstance(volume, bool) or not 0 <= volume <= 1:
+            problems['sound_volume'] = f"volume tidak valid: {volume!r}"
+            volume = 1.0
+        language = data.get('language', 'id')
+        if language not in VoicePromptEngine.LANGUAGES:
+            problems['language'] = f"bahasa tidak dikenal: {language!r}"
+            language = VoicePromptEngine.LANGUAGES[0]
+        ward = data.get('ward', '')
+        if not isinstance(ward, str):
+            problems['ward'] = f"bangsal bukan teks: {ward!r}"
+            ward = ""
+        medicines = data.get('medicines', [])
+        if not isinstance(medicines, list):
+            problems['medicines'] = "daftar obat bukan list"
+            medicines = []
+        suggestions = data.get('medicine_suggestions', {})
+        if not isinstance(suggestions, dict):
+            problems['medicine_suggestions'] = "saran obat bukan objek"
+            suggestions = {}
+        if problems:
+            self.quarantine_entry('field_lansia', location, list(problems.values()),
+                                  {field: data.get(field) for field in problems if field != 'medicines'})
+        
+        person = ElderlyPerson(name, age, condition, volume, language, ward)
+        person.medicine_suggestions = defaultdict(list, suggestions)
+        for med_index, medicine_data in enumerate(medicines):
+            medicine = self.salvage_medicine(medicine_data, f"{location} / obat #{med_index}")
+            if medicine is not None:
+                person.medicines.append(medicine)
+        return person
+    
+    def salvage_medicine(self, data, location):
+        if not isinstance(data, dict) or not isinstance(data.get('name'), str) or not data.get('name'):
+            self.quarantine_entry('obat', location, ["nama obat tidak ada atau bukan teks"], data)
+            return None
+        location = f"{location} ({data['name']})"
+        data = dict(data)
+        
+        schedule = data.get('schedule')
+        if not isinstance(schedule, list):
+            schedule = []
+        bad_times = [entry for entry in schedule if not isinstance(entry, str) or not self.TIME_PATTERN.match(entry)]
+        if bad_times:
+            self.quarantine_entry('jam_jadwal', location, ["format jam harus HH:MM"], bad_times)
+        data['schedule'] = [entry for entry in schedule if entry not in bad_times]
+        if not data['schedule']:
+            self.quarantine_entry('obat', location, ["tidak ada jam jadwal yang valid"], data)
+            return None
+        if not isinstance(data.get('dosage'), str):
+            data['dosage'] = str(data.get('dosage', ''))
+        stock = data.get('stock')
+        if stock is not None and (not isinstance(stock, (int, float)) or isinstance(stock, bool) or stock < 0):
+            self.quarantine_entry('field_obat', location, [f"stok tidak valid: {stock!r}"], {'stock': stock})
+            data['stock'] = None
+        dose_amount = data.get('dose_amount', 1)
+        if not isinstance(dose_amount, (int, float)) or isinstance(dose_amount, bool) or dose_amount <= 0:
+            self.quarantine_entry('field_obat', location, [f"takaran tidak valid: {dose_amount!r}"],
+                                  {'dose_amount': dose_amount})
+            data['dose_amount'] = 1
+        
+        history = data.get('history', [])
+        if not isinstance(history, list):
+            self.quarantine_entry('riwayat', location, ["riwayat bukan list"], history)
+            history = []
+        data['history'] = []
+        for record_index, record in enumerate(history):
+            problems = self.record_problems(record)
+            if problems:
+                self.quarantine_entry('riwayat', f"{location} / riwayat #{record_index}", problems, record)
+            else:
+                data['history'].append(record)
+                self.counts['riwayat'] += 1
+        
+        try:
+            medicine = Medicine.from_dict(data)
+            medicine.get_rule()
+        except Exception as e:
+            self.quarantine_entry('obat', location, [f"aturan jadwal tidak valid: {e}"], data)
+            return None
+        self.counts['obat'] += 1
+        return medicine
+    
+    def record_problems(self, record):
+        if not isinstance(record, dict):
+            return ["catatan bukan objek"]
+        problems = []
+        for field in ('timestamp', 'scheduled'):
+            value = record.get(field)
+            if value is None and field == 'scheduled':
+                continue
+            try:
+                datetime.datetime.fromisoformat(value)
+            except (TypeError, ValueError):
+                problems.append(f"{field} bukan waktu ISO: {value!r}")
+        if 'time' in record and (not isinstance(record['time'], str) or not self.TIME_PATTERN.match(record['time'])):
+            problems.append(f"jam tidak valid: {record['time']!r}")
+        if record.get('status') not in self.STATUSES:
+            problems.append(f"status tidak dikenal: {record.get('status')!r}")
+        return problems
+
+def format_salvage_report(report):
+    """Ringkasan satu baris laporan DataFileSalvager"""
+    quarantined = {kind[len("karantina_"):]: count for kind, count in report.items() if kind.startswith("karantina_")}
+    text = f"{report.get('lansia', 0)} lansia, {report.get('obat', 0)} obat, {report.get('riwayat', 0)} riwayat"
+    if quarantined:
+        text += "; dikarantina: " + ", ".join(f"{kind} {count}" for kind, count in sorted(quarantined.items()))
+        text += f" ({report['quarantine_file']})"
+    return text
+
+class CommandLog:
+    """Riwayat undo/redo terbatas: setiap perubahan menyimpan operasi kebalikannya (bukan salinan seluruh data).
+    Operasi: ('insert_person', lansia, indeks), ('delete_person', lansia),
+    ('insert_medicines', lansia, [(indeks, obat)]), ('delete_medicines', lansia, [obat]),
+    ('set_fields', lansia, lansia/obat, {field: nilai})"""
+    
+    def __init__(self, manager, limit=50):
+        self.manager = manager
+        self.undo_stack = deque(maxlen=limit)  # [(label, operasi kebalikan)]
+        self.redo_stack = deque(maxlen=limit)
+        self.lock = threading.RLock()
+    
+    def record(self, label, ops):
+        """Catat perubahan baru; operasi yang dibatalkan sebelumnya tidak bisa diulang lagi"""
+        with self.lock:
+            self.undo_stack.append((label, ops))
+            self.redo_stack.clear()
+    
+    def can_undo(self):
+        return bool(self.undo_stack)
+    
+    def can_redo(self):
+        return bool(self.redo_stack)
+    
+    def undo(self):
+        """Membatalkan perubahan terakhir; mengembalikan labelnya atau None"""
+        return self._replay(self.undo_stack, self.redo_stack)
+    
+    def redo(self):
+        """Mengulang perubahan yang terakhir dibatalkan; mengembalikan labelnya atau None"""
+        return self._replay(self.redo_stack, self.undo_stack)
+    
+    def _replay(self, source, target):
+        with self.lock:
+            while source:
+                label, ops = source.pop()
+                if all(self._applicable(op) for op in ops):
+                    break
+                # Data sudah berubah (misalnya lansia dihapus di stasiun lain): entri dibuang
+                print(f"Error undo/redo: '{label}' tidak dapat diterapkan lagi")
+            else:
+                return None
+            events = []
+            inverse = [self._apply(op, events) for op in ops]
+            inverse.reverse()
+            target.append((label, inverse))
+        
+        manager = self.manager
+        manager.touch_schedules()
+        manager.save_data()
+        for event in events:
+            manager.events.publish(event)
+        return label
+    
+    def _has_person(self, person):
+        return any(p is person for p in self.manager.elderly_people)
+    
+    def _applicable(self, op):
+        if op[0] == 'insert_person':
+            return not self._has_person(op[1])
+        if op[0] == 'delete_medicines':
+            return self._has_person(op[1]) and all(any(m is medicine for m in op[1].medicines) for medicine in op[2])
+        return self._has_person(op[1])
+    
+    def _select(self, person, events):
+        manager = self.manager
+        if manager.current_person is not person:
+            manager.current_person = person
+            events.append(ManagerEvent(ManagerEvent.PERSON_SELECTED, person))
+    
+    def _apply(self, op, events):
+        """Menerapkan satu operasi dan mengembalikan operasi kebalikannya"""
+        manager = self.manager
+        kind, person = op[0], op[1]
+        if kind == 'insert_person':
+            manager.elderly_people.insert(min(op[2], len(manager.elderly_people)), person)
+            events.append(ManagerEvent(ManagerEvent.PERSON_ADDED, person))
+            self._select(person, events)
+            return ('delete_person', person)
+        if kind == 'delete_person':
+            index = next(i for i, p in enumerate(manager.elderly_people) if p is person)
+            del manager.elderly_people[index]
+            events.append(ManagerEvent(ManagerEvent.PERSON_REMOVED, person))
+            if manager.current_person is person:
+                self._select(manager.elderly_people[0] if manager.elderly_people else None, events)
+            return ('insert_person', person, index)
+        if kind == 'insert_medicines':
+            for index, medicine in op[2]:
+                person.medicines.insert(min(index, len(person.medicines)), medicine)
+                events.append(ManagerEvent(ManagerEvent.MEDICINE_ADDED, person, medicine))
+            self._select(person, events)
+            return ('delete_medicines', person, [medicine for _, medicine in op[2]])
+        if kind == 'delete_medicines':
+            removed = [(i, m) for i, m in enumerate(person.medicines) if any(m is medicine for medicine in op[2])]
+            for index, medicine in reversed(removed):
+                del person.medicines[index]
+                events.append(ManagerEvent(ManagerEvent.MEDICINE_REMOVED, person, medicine.name))
+            self._select(person, events)
+            return ('insert_medicines', person, removed)
+        if kind == 'set_fields':
+            target, values = op[2], op[3]
+            current = {field: getattr(target, field) for field in values}
+            for field, value in values.items():
+                setattr(target, field, value)
+            if target is person:
+                events.append(ManagerEvent(ManagerEvent.PERSON_UPDATED, person))
+            else:
+                events.append(ManagerEvent(ManagerEvent.MEDICINE_UPDATED, person, target, {'fields': sorted(values)}))
+            self._select(person, events)
+            return ('set_fields', person, target, current)
+        raise ValueError(f"Operasi undo tidak dikenal: {kind}")
+
+class DataFileLock:
+    """Kunci advisori antar proses untuk file data (file <data>.lock); boleh dimasuki ulang oleh pemegangnya"""
+    
+    def __init__(self, data_file, timeout=10):
+        self.lock_file = str(data_file) + ".lock"
+        self.timeout = timeout
+        self.handle = None
+        self.depth = 0
+    
+    def _try_lock(self):
+        if msvcrt is not None:
+            self.handle.seek(0)
+            msvcrt.locking(self.handle.fileno(), msvcrt.LK_NBLCK, 1)
+        elif fcntl is not None:
+            fcntl.flock(self.handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    
+    def __enter__(self):
+        if self.depth:
+            self.depth += 1
+            return self
+        self.handle = open(self.lock_file, 'a+b')
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._try_lock()
+                self.depth = 1
+                return self
+            except OSError:
+                if time.monotonic() > deadline:
+                    self.handle.close()
+                    raise TimeoutError(f"File data sedang dikunci proses lain: {self.lock_file}")
+                time.sleep(0.05)
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.depth -= 1
+        if self.depth:
+            return
+        try:
+            if msvcrt is not None:
+                self.handle.seek(0)
+                msvcrt.locking(self.handle.fileno(), msvcrt.LK_UNLCK, 1)
+            elif fcntl is not None:
+                fcntl.flock(self.handle.fileno(), fcntl.LOCK_UN)
+        finally:
+            self.handle.close()
+
+def generation_file(path):
+    """File pendamping berisi nomor generasi file data JSON (<data>.gen); file JSON tetap berupa daftar
+    lansia agar versi aplikasi lama masih bisa membacanya"""
+    return str(path) + ".gen"
+
+def read_generation(path):
+    """Nomor generasi file data: dari header snapshot, atau dari file pendamping untuk JSON"""
+    try:
+        with open(path, 'rb') as f:
+            head = f.read(4096)
+        if head[:4] == SnapshotCodec.MAGIC:
+            return SnapshotCodec.read_meta(head)[0].get('generation', 0)
+        with open(generation_file(path), 'r', encoding='utf-8') as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+def read_data_store(path):
+    """(daftar dict lansia, generasi, format) dari file JSON atau snapshot biner"""
+    with open(path, 'rb') as f:
+        data, generation, data_format = decode_data_store(f.read())
+    if data_format == 'json' and generation is None:
+        generation = read_generation(path)
+    return data, generation or 0, data_format
+
+def decode_data_store(raw):
+    """Seperti read_data_store tetapi dari isi file (misalnya hasil rakitan backup); generasi None bila
+    tersimpan di file pendamping"""
+    if raw[:4] == SnapshotCodec.MAGIC:
+        data, meta = SnapshotCodec.decode(raw)
+        return data, meta.get('generation', 0), 'snapshot'
+    data = json.loads(raw.decode('utf-8'))
+    if isinstance(data, dict) and 'people' in data:
+        return data['people'], data.get('generation', 0), 'json'  # pembungkus dari versi sebelumnya
+    if isinstance(data, dict):
+        data = [data]  # format lama satu lansia
+    return data, None, 'json'
+
+def write_data_store(path, people_data, data_format='json', generation=0, compress=True):
+    """Menulis file data secara atomik (file sementara lalu os.replace) beserta nomor generasinya.
+    Generasi JSON ditulis lebih dulu ke file pendamping: crash di antaranya hanya membuat proses lain
+    menggabung ulang isi yang sama, bukan melewatkan perubahan."""
+    if data_format == 'snapshot':
+        return SnapshotCodec.write_file(path, people_data, compress, {'generation': generation})
+    temp_file = generation_file(path) + ".tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        f.write(str(generation))
+    os.replace(temp_file, generation_file(path))
+    temp_file = str(path) + ".tmp"
+    with open(temp_file, 'w', encoding='utf-8') as f:
+        json.dump(people_data, f, indent=4, ensure_ascii=False)
+    os.replace(temp_file, path)
+    return os.path.getsize(path)
+
+def content_digest(path):
+    """Hash SHA-1 isi file (membedakan isi yang benar-benar berubah dari sekadar mtime baru)"""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def file_signature(path):
+    """(mtime_ns, ukuran) untuk mendeteksi perubahan file tanpa membacanya"""
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+def history_identity(record):
+    """Kunci unik catatan minum obat untuk menggabung riwayat dari dua sumber"""
+    return (record.get('timestamp'), record.get('time'), record.get('scheduled'))
+
+class ElderlyManager:
+    LOAD_RETRIES = 3  # percobaan ulang bila file data sedang dikunci proses lain saat dibuka
+    
+    def __init__(self, data_file="elderly_data.json", sound_manager=None,
+                 state_file="reminder_state.json", clock=None, latency_file="reminder_latency.json",
+                 backup_dir="backup", interaction_file="interaksi_obat.json"):
+        self.data_file = data_file  # None = data hanya di memori (simulasi)
+        self.data_format = 'json'  # 'json' atau 'snapshot' (dideteksi saat load)
+        self.snapshot_compress = True
+        self.elderly_people = []  # Daftar semua lansia
+        self.current_person = None  # Lansia yang sedang aktif
+        self.elderly_suggestions = defaultdict(list)  # Saran untuk lansia
+        self.sound_manager = sound_manager or SoundManager()
+        self.clock = clock or SystemClock()
+        self.schedule_version = 0  # naik setiap kali jadwal/daftar obat berubah
+        self.events = EventBus()
+        self.missed_dose_tracker = MissedDoseTracker(self)
+        self.reminder_state = ReminderStateStore(state_file)
+        self.latency_log = ReminderLatencyLog(latency_file)
+        self.stock_lock = threading.Lock()
+        self.stock_index = StockForecastIndex()
+        self.stock_index.bind(self)
+        self.upcoming_doses = UpcomingDoseIndex()
+        self.upcoming_doses.bind(self)
+        self.interactions = InteractionChecker(interaction_file)
+        self.interactions.bind(self)
+        self.sync = None  # StationSync jika sinkronisasi antar stasiun aktif
+        self.save_lock = threading.RLock()
+        self.file_lock = DataFileLock(data_file) if data_file else None
+        self.commands = CommandLog(self)  # undo/redo perubahan data
+        self.backups = BackupStore(backup_dir) if data_file and backup_dir else None
+        self.salvage_report = None  # laporan jika file data rusak dan diselamatkan sebagian saat load
+        self.recovery = None  # pilihan pemulihan file data rusak yang belum dikonfirmasi (lihat prepare_recovery)
+        self.generation = 0  # generasi file data saat terakhir dibaca/ditulis
+        self.file_signature = None
+        self.file_digest = None  # hash isi file saat terakhir dibaca/ditulis
+        # Isi file saat terakhir dibaca/ditulis (basis penggabungan tiga arah)
+        self.base_people = {}  # nama lansia -> {field: nilai}
+        self.base_medicines = {}  # (nama lansia, nama obat) -> {field: nilai}
+        self.load_data()
+        
+        # Pesan suara disusun ulang otomatis saat data lansia/obat berubah
+        prompt_engine = getattr(self.sound_manager, 'prompt_engine', None)
+        if prompt_engine is not None:
+            self.events.subscribe(None, prompt_engine.on_manager_event)
+            prompt_engine.collect_garbage(self.elderly_people)
+            prompt_engine.warm(self.elderly_people)
+    
+    def touch_schedules(self):
+        """Tandai bahwa jadwal berubah agar indeks jadwal pengingat dibangun ulang"""
+        self.schedule_version += 1
+    
+    def load_data(self, allow_restore=True):
+        self.touch_schedules()
+        if self.data_file and os.path.exists(self.data_file):
+            try:
+                data = self.read_data_locked()
+                
+                # Load multiple elderly people
+                if isinstance(data, list):
+                    self.elderly_people = [ElderlyPerson.from_dict(person_data) for person_data in data]
+                    if self.elderly_people:
+                        self.current_person = self.elderly_people[0]
+                else:
+                    # Backward compatibility with old single-person format
+                    person = ElderlyPerson.from_dict(data)
+                    self.elderly_people = [person]
+                    self.current_person = person
+            except TimeoutError:
+                raise  # file sibuk, bukan rusak: jangan diselamatkan atau ditimpa
+            except Exception as e:
+                print(f"Error loading data: {e}")
+                # File rusak (misalnya terpotong saat crash): muat hasil penyelamatan atau backup utuh
+                # terbaru, mana yang datanya lebih banyak. File data tidak ditulis sampai confirm_recovery().
+                if allow_restore:
+                    self.prepare_recovery()
+                else:
+                    self.elderly_people = [ElderlyPerson("", 0)]
+                    self.current_person = self.elderly_people[0]
+            
+            # Load elderly suggestions
+            for person in self.elderly_people:
+                if person.name:
+                    self.elderly_suggestions[person.name].append({
+                        'age': person.age,
+                        'condition': person.condition,
+                        'count': 1
                     })
-            self.sound_manager.play_sound("success")
-            self.save_data()
+        else:
+            self.elderly_people = [ElderlyPerson("", 0)]
+            self.current_person = self.elderly_people[0]
+        self.remember_base([person.to_dict() for person in self.elderly_people])
+        self.stock_index.rebuild(self.elderly_people, self.clock.now())
+        self.upcoming_doses.rebuild(self.elderly_people, self.clock.now())
+        self.interactions.invalidate()
+    
+    def backup_data(self):
+        """Backup file data ke folder backup (hanya potongan yang berubah) lalu terapkan retensi"""
+        if not self.backups or self.recovery is not None or not os.path.exists(self.data_file):
+            return None  # file rusak yang belum dipulihkan tidak di-backup agar backup utuh tidak terpangkas
+        try:
+            with self.save_lock, self.file_lock:
+                manifest = self.backups.backup(self.data_file)
+            if manifest:
+                self.backups.prune()
+            return manifest
+        except Exception as e:
+            print(f"Error backup data: {e}")
+            return None
+    
+    @staticmethod
+    def data_size(people):
+        """Jumlah lansia, obat, dan catatan riwayat; dipakai untuk membandingkan pilihan pemulihan"""
+        medicines = [medicine for person in people for medicine in person.medicines]
+        return {'people': len(people), 'medicines': len(medicines),
+                'history': sum(len(medicine.history) for medicine in medicines)}
+    
+    def prepare_recovery(self):
+        """File data rusak: siapkan hasil penyelamatan (bagian rusak ke <data>.karantina.jsonl) dan backup utuh
+        terbaru tanpa menulis ke file data. Yang datanya lebih banyak dimuat; file data baru ditimpa setelah
+        confirm_recovery() sehingga data parsial tidak pernah menimpa file tanpa persetujuan."""
+        options = {}
+        try:
+            with self.save_lock, self.file_lock:
+                salvager = DataFileSalvager(self.data_file)
+                people = salvager.load()
+            if people:
+                options['salvage'] = {'people': people, 'generation': salvager.generation,
+                                      'report': salvager.report()}
+        except Exception as e:
+            print(f"Error salvaging data: {e}")
+        if self.backups:
+            try:
+                manifest, raw = self.backups.assemble_latest_valid()
+                people_data, generation, _ = decode_data_store(raw)
+                generation = generation or 0
+                options['backup'] = {'people': [ElderlyPerson.from_dict(data) for data in people_data],
+                                     'generation': generation, 'manifest': manifest}
+            except Exception as e:
+                print(f"Error membaca backup: {e}")
+        
+        for option in options.values():
+            option['size'] = self.data_size(option['people'])
+        recommended = max(options, key=lambda key: sum(options[key]['size'].values()), default=None)
+        self.recovery = {'options': options, 'recommended': recommended}
+        self.salvage_report = options['salvage']['report'] if 'salvage' in options else None
+        self.use_recovery_option(recommended)
+        print(f"File data rusak; dimuat: {recommended or 'data kosong'} (belum disimpan, menunggu konfirmasi)")
+        return self.recovery
+    
+    def use_recovery_option(self, choice):
+        """Muat salah satu pilihan pemulihan ('salvage', 'backup', atau None = data kosong) ke memori"""
+        option = self.recovery['options'].get(choice) if choice else None
+        if option:
+            self.elderly_people = option['people']
+            self.generation = option['generation']
+        else:
+            self.elderly_people = [ElderlyPerson("", 0)]
+        self.current_person = self.elderly_people[0]
+    
+    def confirm_recovery(self, choice):
+        """Simpan pilihan pemulihan ke file data; file rusak disimpan dulu sebagai <data>.rusak"""
+        if self.recovery is None:
+            return False
+        try:
+            with self.save_lock, self.file_lock:
+                shutil.copyfile(self.data_file, str(self.data_file) + ".rusak")
+                self.file_signature = file_signature(self.data_file)  # isi rusak tidak ikut digabung
+            self.use_recovery_option(choice)
+            self.recovery = None
+            self.touch_schedules()
+            self.remember_base([person.to_dict() for person in self.elderly_people])
+            self.stock_index.rebuild(self.elderly_people, self.clock.now())
+            self.upcoming_doses.rebuild(self.elderly_people, self.clock.now())
+            self.interactions.invalidate()
+            self.save_data()
+            return True
+        except Exception as e:
+            print(f"Error menyimpan data pulihan: {e}")
+            return False
+    
+    def read_data_locked(self):
+        """Membaca file data di bawah kunci; bila dikunci proses lain dicoba lagi, lalu TimeoutError"""
+        for attempt in range(self.LOAD_RETRIES + 1):
+            try:
+                with self.save_lock, self.file_lock:
+                    data = self.read_data_file(self.data_file)
+                    self.file_signature = file_signature(self.data_file)
+                    return data
+            except TimeoutError:
+                if attempt == self.LOAD_RETRIES:
+                    raise
+                print(f"File data sedang dipakai proses lain, mencoba lagi ({attempt + 1}/{self.LOAD_RETRIES})")
+    
+    def read_data_file(self, path):
+        """Membaca file data JSON atau snapshot biner; format, generasi dan hash isi dicatat untuk save berikutnya"""
+        data, self.generation, self.data_format = read_data_store(path)
+        self.file_digest = content_digest(path)
+        return data
+    
+    def read_disk_changes(self):
+        """(daftar dict lansia, generasi) bila isi file berbeda dari yang terakhir dibaca/ditulis di sini, selain itu
+        None. Generasi yang sama belum berarti isi sama: versi lama menulis JSON tanpa menaikkan file .gen."""
+        with open(self.data_file, 'rb') as f:
+            raw = f.read()
+        digest = hashlib.sha1(raw).hexdigest()
+        generation = read_generation(self.data_file)
+        if generation == self.generation and digest == self.file_digest:
+            return None
+        self.file_digest = digest
+        return decode_data_store(raw)[0], generation
+    
+    def remember_base(self, people_data):
+        """Catat isi file (tanpa riwayat) sebagai basis untuk mendeteksi perubahan lokal maupun dari proses lain"""
+        self.base_people = {}
+        self.base_medicines = {}
+        for data in people_data:
+            self.base_people[data['name']] = {field: copy.deepcopy(data.get(field))
+                                              for field in StationSync.PERSON_FIELDS}
+            for medicine in data.get('medicines', []):
+                self.base_medicines.setdefault((data['name'], medicine['name']), {
+                    field: copy.deepcopy(medicine.get(field)) for field in StationSync.MEDICINE_FIELDS})
+    
+    def save_data(self):
+        if not self.data_file:
+            return
+        if self.recovery is not None:
+            print("File data rusak belum dipulihkan; perubahan tidak disimpan sampai pemulihan dikonfirmasi")
+            return
+        try:
+            with self.save_lock, self.file_lock:
+                # Proses lain menyimpan sejak terakhir kita baca: gabungkan dulu, jangan ditimpa
+                if os.path.exists(self.data_file) and file_signature(self.data_file) != self.file_signature:
+                    changes = self.read_disk_changes()
+                    if changes is not None:
+                        people_data, generation = changes
+                        self.merge_disk_data(people_data)
+                        self.generation = max(self.generation, generation)
+                
+                # Simpan semua data lansia
+                data_to_save = [person.to_dict() for person in self.elderly_people]
+                self.generation = max(self.generation, read_generation(self.data_file)) + 1
+                write_data_store(self.data_file, data_to_save, self.data_format, self.generation,
+                                 self.snapshot_compress)
+                self.file_signature = file_signature(self.data_file)
+                self.file_digest = content_digest(self.data_file)
+                self.remember_base(data_to_save)
+        except Exception as e:
+            print(f"Error saving data: {e}")
+    
+    def check_external_changes(self):
+        """Muat ulang hanya bagian yang berubah jika file data diperbarui proses lain; mengembalikan jumlah event"""
+        if not self.data_file or self.recovery is not None or \
+                file_signature(self.data_file) in (None, self.file_signature):
+            return 0
+        try:
+            with self.save_lock, self.file_lock:
+                changes = self.read_disk_changes()
+                self.file_signature = file_signature(self.data_file)
+                if changes is None:
+                    return 0
+                people_data, generation = changes
+                count = self.merge_disk_data(people_data)
+                self.generation = max(self.generation, generation)
+                # Perubahan lokal yang belum disimpan tetap terdeteksi sebagai selisih terhadap basis baru
+                self.remember_base(people_data)
+                return count
+        except Exception as e:
+            print(f"Error reloading data: {e}")
+            return 0
+    
+    def merge_disk_data(self, people_data):
+        """Menggabung isi file ke memori secara tiga arah terhadap basis: field yang tidak diubah di sini diambil
+        dari file, catatan minum digabung, dan penambahan/penghapusan di salah satu sisi dipertahankan.
+        Mengembalikan jumlah event."""
+        events = []
+        disk_people = {data['name']: data for data in people_data}
+        
+        for person in list(self.elderly_people):
+            # Dihapus proses lain dan tidak diubah di sini
+            if person.name not in disk_people and person.name in self.base_people \
+                    and self.person_fields(person) == self.base_people[person.name]:
+                self.elderly_people.remove(person)
+                events.append(ManagerEvent(ManagerEvent.PERSON_REMOVED, person, origin=ManagerEvent.DISK))
+        
+        local_people = {person.name: person for person in self.elderly_people}
+        for name, data in disk_people.items():
+            person = local_people.get(name)
+            if person is None:
+                if name not in self.base_people:  # ditambah proses lain (bukan dihapus di sini)
+                    person = ElderlyPerson.from_dict(data)
+                    self.elderly_people.append(person)
+                    events.append(ManagerEvent(ManagerEvent.PERSON_ADDED, person, origin=ManagerEvent.DISK))
+                continue
+            base = self.base_people.get(name, {})
+            changed = []
+            for field in StationSync.PERSON_FIELDS:
+                if field in data and data[field] != base.get(field) and getattr(person, field) == base.get(field):
+                    setattr(person, field, copy.deepcopy(data[field]))
+                    changed.append(field)
+            if changed:
+                events.append(ManagerEvent(ManagerEvent.PERSON_UPDATED, person, origin=ManagerEvent.DISK))
+            self._merge_medicines(person, data.get('medicines', []), events)
+        
+        if self.current_person not in self.elderly_people:
+            self.current_person = self.elderly_people[0] if self.elderly_people else None
+            events.append(ManagerEvent(ManagerEvent.PERSON_SELECTED, self.current_person, origin=ManagerEvent.DISK))
+        if events:
+            self.touch_schedules()
+            for event in events:
+                self.events.publish(event)
+        return len(events)
+    
+    @staticmethod
+    def person_fields(person):
+        return {field: getattr(person, field) for field in StationSync.PERSON_FIELDS}
+    
+    @staticmethod
+    def medicine_fields(medicine):
+        return {field: getattr(medicine, field) for field in StationSync.MEDICINE_FIELDS}
+    
+    def _merge_medicines(self, person, disk_medicines_data, events):
+        disk_medicines = {}
+        for data in disk_medicines_data:
+            disk_medicines.setdefault(data['name'], data)
+        
+        for medicine in list(person.medicines):
+            key = (person.name, medicine.name)
+            if medicine.name not in disk_medicines and key in self.base_medicines \
+                    and self.medicine_fields(medicine) == self.base_medicines[key]:
+                person.remove_medicine(medicine.name)
+                events.append(ManagerEvent(ManagerEvent.MEDICINE_REMOVED, person, medicine.name,
+                                           origin=ManagerEvent.DISK))
+        
+        for name, data in disk_medicines.items():
+            key = (person.name, name)
+            medicines = [medicine for medicine in person.medicines if medicine.name == name]
+            if not medicines:
+                if key not in self.base_medicines:
+                    medicine = Medicine.from_dict(data)
+                    person.add_medicine(medicine)
+                    events.append(ManagerEvent(ManagerEvent.MEDICINE_ADDED, person, medicine,
+                                               origin=ManagerEvent.DISK))
+                continue
+            base = self.base_medicines.get(key, {})
+            disk_history = data.get('history', [])
+            for medicine in medicines:
+                changed = []
+                for field in StationSync.MEDICINE_FIELDS:
+                    if field == 'stock' or field not in data or data[field] == base.get(field):
+                        continue
+                    if getattr(medicine, field) == base.get(field):
+                        setattr(medicine, field, copy.deepcopy(data[field]))
+                        changed.append(field)
+                # Stok: perubahan dari kedua sisi dijumlahkan (pemakaian di sini + pemakaian/isi ulang di file)
+                if data.get('stock') != base.get('stock'):
+                    if medicine.stock is not None and data.get('stock') is not None and base.get('stock') is not None:
+                        medicine.stock = max(0, data['stock'] + medicine.stock - base['stock'])
+                    elif medicine.stock == base.get('stock'):
+                        medicine.stock = data.get('stock')
+                    changed.append('stock')
+                
+                local_ids = {history_identity(record) for record in medicine.history}
+                new_records = [dict(record) for record in disk_history if history_identity(record) not in local_ids]
+                if new_records:
+                    medicine.history.extend(new_records)
+                    medicine.history.sort(key=lambda record: record.get('timestamp', ''))
+                if changed:
+                    events.append(ManagerEvent(ManagerEvent.MEDICINE_UPDATED, person, medicine,
+                                               {'fields': changed}, origin=ManagerEvent.DISK))
+                for record in new_records:
+                    events.append(ManagerEvent(ManagerEvent.INTAKE_RECORDED, person, medicine, record,
+                                               origin=ManagerEvent.DISK))
+    
+    def get_elderly_names(self):
+        """Mendapatkan semua nama lansia unik yang pernah dimasukkan"""
+        names = list(set(person.name for person in self.elderly_people if person.name))
+        return sorted(names)
+    
+    def get_elderly_suggestions(self, name):
+        """Mendapatkan saran untuk lansia tertentu"""
+        return self.elderly_suggestions.get(name, [])
+    
+    def set_current_person(self, name, age=None, condition=None, sound_volume=None, language=None, ward=None):
+        """Mengatur lansia yang sedang aktif"""
+        # Cari apakah lansia sudah ada
+        for person in self.elderly_people:
+            if person.name == name:
+                requested = {'age': age, 'condition': condition, 'sound_volume': sound_volume, 'language': language,
+                             'ward': ward}
+                previous = {field: getattr(person, field) for field, value in requested.items()
+                            if value is not None and value != getattr(person, field)}
+                updated = bool(previous)
+                if updated:
+                    self.commands.record(f"Ubah data {name}", [('set_fields', person, person, previous)])
+                if age is not None:
+                    person.age = age
+                if condition is not None:
+                    person.condition = condition
+                if sound_volume is not None:
+                    person.sound_volume = sound_volume
+                if language is not None:
+                    person.language = language
+                if ward is not None:
+                    person.ward = ward
+                selected = self.current_person is not person
+                # Lansia aktif diganti dulu: tick pengingat yang melihat versi jadwal baru harus membangun
+                # heap untuk lansia yang baru dipilih, bukan yang lama
+                self.current_person = person
+                if selected:
+                    self.touch_schedules()
+                self.save_data()
+                if updated:
+                    self.events.publish(ManagerEvent(ManagerEvent.PERSON_UPDATED, person))
+                if selected:
+                    self.events.publish(ManagerEvent(ManagerEvent.PERSON_SELECTED, person))
+                return person
+        
+        # Jika tidak ada, buat baru
+        if age is None:
+            age = 0
+        if condition is None:
+            condition = ""
+        
+        new_person = ElderlyPerson(name, age, condition, 1.0 if sound_volume is None else sound_volume,
+                                   language or "id", ward or "")
+        self.elderly_people.append(new_person)
+        self.current_person = new_person
+        self.touch_schedules()
+        self.commands.record(f"Tambah lansia {name}", [('delete_person', new_person)])
+        
+        # Tambahkan ke saran
+        if name:
+            self.elderly_suggestions[name].append({
+                'age': age,
+                'condition': condition,
+                'count': 1
+            })
+        
+        self.save_data()
+        self.events.publish(ManagerEvent(ManagerEvent.PERSON_ADDED, new_person))
+        self.events.publish(ManagerEvent(ManagerEvent.PERSON_SELECTED, new_person))
+        return new_person
+    
+    def get_person_info(self, name):
+        """Mendapatkan informasi lansia berdasarkan nama"""
+        for person in self.elderly_people:
+            if person.name == name:
+                return {
+                    'name': person.name,
+                    'age': person.age,
+                    'condition': person.condition
+                }
+        return None
+    
+    def remove_person(self, name):
+        """Menghapus lansia berdasarkan nama"""
+        removed = [p for p in self.elderly_people if p.name == name]
+        if removed:
+            self.commands.record(f"Hapus lansia {name}", [('insert_person', p, i)
+                                                           for i, p in enumerate(self.elderly_people) if p.name == name])
+        self.elderly_people = [p for p in self.elderly_people if p.name != name]
+        selected = self.current_person is not None and self.current_person.name == name
+        if selected:
+            self.current_person = self.elderly_people[0] if self.elderly_people else None
+        self.touch_schedules()
+        self.save_data()
+        for person in removed:
+            self.events.publish(ManagerEvent(ManagerEvent.PERSON_REMOVED, person))
+        if selected:
+            self.events.publish(ManagerEvent(ManagerEvent.PERSON_SELECTED, self.current_person))
+    
+    def add_medicine(self, medicine):
+        if self.current_person:
+            self.current_person.add_medicine(medicine)
+            self.commands.record(f"Tambah obat {medicine.name}",
+                                 [('delete_medicines', self.current_person, [medicine])])
+            self.touch_schedules()
+            self.save_data()
+            self.events.publish(ManagerEvent(ManagerEvent.MEDICINE_ADDED, self.current_person, medicine))
+    
+    def remove_medicine(self, medicine_name):
+        if self.current_person:
+            removed = [(i, m) for i, m in enumerate(self.current_person.medicines) if m.name == medicine_name]
+            if removed:
+                # Obat beserta riwayatnya disimpan utuh agar bisa dikembalikan
+                self.commands.record(f"Hapus obat {medicine_name}",
+                                     [('insert_medicines', self.current_person, removed)])
+            self.current_person.remove_medicine(medicine_name)
+            self.touch_schedules()
+            self.save_data()
+            self.events.publish(ManagerEvent(ManagerEvent.MEDICINE_REMOVED, self.current_person, medicine_name))
+    
+    def update_medicine(self, medicine_name, person=None, **fields):
+        """Mengubah atribut obat (misal custom_sound, schedule, recurrence) untuk semua entri bernama sama"""
+        person = person or self.current_person
+        if not person:
+            return
+        changed = []
+        undo_ops = []
+        for medicine in person.medicines:
+            if medicine.name == medicine_name:
+                undo_ops.append(('set_fields', person, medicine, {field: getattr(medicine, field) for field in fields}))
+                for field, value in fields.items():
+                    setattr(medicine, field, value)
+                changed.append(medicine)
+        if not changed:
+            return
+        self.commands.record(f"Ubah obat {medicine_name}", undo_ops)
+        if 'schedule' in fields or 'recurrence' in fields:
+            self.touch_schedules()
+        self.save_data()
+        for medicine in changed:
+            self.events.publish(ManagerEvent(ManagerEvent.MEDICINE_UPDATED, person, medicine,
+                                             {'fields': sorted(fields)}))
+    
+    def refill_medicine(self, medicine_name, quantity, person=None, replace=False, dose_amount=None):
+        """Menambah stok (atau menetapkan stok bila replace=True) dan memperbarui perkiraan habis"""
+        person = person or self.current_person
+        if not person:
+            return
+        _, medicine = self.find_medicine(person.name, medicine_name)
+        if medicine is None:
+            return
+        with self.stock_lock:
+            stock = quantity if replace or medicine.stock is None else medicine.stock + quantity
+        fields = {'stock': stock, 'stock_updated': self.clock.now().isoformat()}
+        if dose_amount is not None:
+            fields['dose_amount'] = dose_amount
+        self.update_medicine(medicine_name, person=person, **fields)
+    
+    def runs_out_within(self, days):
+        """Obat di seluruh fasilitas yang stoknya habis dalam N hari"""
+        return self.stock_index.runs_out_within(days, self.clock.now())
+    
+    def propose_schedule(self, person=None, optimizer=None):
+        """Usulan jadwal gabungan untuk lansia (belum diterapkan)"""
+        person = person or self.current_person
+        if not person:
+            return None
+        return (optimizer or ScheduleOptimizer()).propose(person)
+    
+    def apply_schedule_proposal(self, proposal):
+        for medicine_name, _, new_schedule in proposal.changes():
+            self.update_medicine(medicine_name, person=proposal.person, schedule=list(new_schedule))
+    
+    def record_medicine_taken(self, medicine_name, time_taken):
+        self.record_medicines_taken([(medicine_name, time_taken)])
+    
+    def record_medicines_taken(self, doses, person=None):
+        """Mencatat beberapa dosis sekaligus dengan satu kali simpan.
+        doses: [(nama obat, "HH:MM")] atau [(nama obat, "HH:MM", slot_dt)] untuk jadwal hari lain"""
+        person = person or self.current_person
+        if not person or not doses:
+            return
+        
+        now = self.clock.now()
+        resolved = []
+        recorded = []
+        for dose in doses:
+            medicine_name, time_taken = dose[0], dose[1]
+            scheduled = dose[2] if len(dose) > 2 else None
+            for medicine in person.medicines:
+                if medicine.name == medicine_name:
+                    record = {
+                        'time': time_taken,
+                        'timestamp': now.isoformat()
+                    }
+                    if scheduled is not None:
+                        record['scheduled'] = scheduled.isoformat()
+                    with self.stock_lock:
+                        medicine.history.append(record)
+                        medicine.consume_stock(now)
+                    recorded.append((medicine, record))
+            slot_dt = scheduled or datetime.datetime.combine(
+                now.date(), datetime.datetime.strptime(time_taken, "%H:%M").time())
+            if self.missed_dose_tracker.acknowledge(person.name, medicine_name, slot_dt) or scheduled is not None:
+                self.latency_log.record_acknowledged(person.name, medicine_name, slot_dt, now)
+            else:
+                # Ditandai manual dari daftar obat: hentikan semua eskalasi obat ini
+                self.missed_dose_tracker.acknowledge(person.name, medicine_name)
+                slot_dt = None
+            resolved.append((person.name, medicine_name, slot_dt))
+        self.reminder_state.resolve(resolved)
+        self.sound_manager.play_sound("success", person=person)
+        self.save_data()
+        for medicine, record in recorded:
+            self.events.publish(ManagerEvent(ManagerEvent.INTAKE_RECORDED, person, medicine, record))
+    
+    def find_medicine(self, person_name, medicine_name):
+        """Mencari (lansia, obat) berdasarkan nama; (None, None) jika tidak ada"""
+        for person in self.elderly_people:
+            if person.name == person_name:
+                for medicine in person.medicines:
+                    if medicine.name == medicine_name:
+                        return person, medicine
+        return None, None
+    
+    def record_missed_dose(self, person, medicine_name, slot_dt, detected_at):
+        """Mencatat dosis terlewat ke riwayat (status 'missed')"""
+        recorded = []
+        for medicine in person.medicines:
+            if medicine.name == medicine_name:
+                record = {
+                    'time': slot_dt.strftime("%H:%M"),
+                    'timestamp': detected_at.isoformat(),
+                    'status': 'missed',
+                    'scheduled': slot_dt.isoformat()
+                }
+                medicine.history.append(record)
+                recorded.append((medicine, record))
+        self.reminder_state.resolve([(person.name, medicine_name, slot_dt)])
+        self.save_data()
+        for medicine, record in recorded:
+            self.events.publish(ManagerEvent(ManagerEvent.INTAKE_RECORDED, person, medicine, record))
+    
+    def add_custom_sound(self, file_path, sound_name, callback=None):
+        return self.sound_manager.add_custom_sound(file_path, sound_name, callback)
+    
+    def get_available_sounds(self):
+        return self.sound_manager.get_available_sounds()
+    
+    def get_medicine_names(self):
+        if self.current_person:
+            return self.current_person.get_medicine_names()
+        return []
+    
+    def get_medicine_suggestions(self, medicine_name):
+        if self.current_person:
+            return self.current_person.get_medicine_suggestions(medicine_name)
+        return []
+
+class StationSync:
+    """Sinkronisasi antar PC stasiun perawat lewat log operasi per stasiun.
+    
+    Setiap perubahan lokal dicatat sebagai operasi ber-ID unik (stasiun:urutan). Catatan minum obat
+    digabung sebagai himpunan (tanpa konflik), perubahan data lansia/obat memakai last-writer-wins per
+    field dengan jam Lamport. Pertukaran bersifat inkremental berdasarkan vektor urutan per stasiun.
+    
+    Log aktif (ops.jsonl) dipadatkan berkala: operasi lama dipindah ke ops-arsip.jsonl dan hasil gabungannya
+    (register, jam Lamport, urutan dasar per stasiun) ke checkpoint.json, sehingga saat mulai hanya checkpoint
+    dan ekor log yang dibaca. Arsip hanya dibaca bila ada stasiun yang tertinggal sebelum checkpoint."""
+    PERSON_FIELDS = ('age', 'condition', 'sound_volume', 'language', 'ward')
+    MEDICINE_FIELDS = ('dosage', 'schedule', 'description', 'with_food', 'sound_enabled', 'custom_sound',
+                       'recurrence', 'schedule_constraints', 'stock', 'dose_amount', 'stock_updated')
+    DELETED = '_deleted'
+    OP_KEYS = ('id', 'station', 'seq', 'lamport', 'kind')  # wajib ada di setiap operasi
+    COMPACT_OPS = 5000  # padatkan log aktif bila berisi lebih dari ini
+    KEEP_OPS = 500      # operasi terbaru per stasiun yang tetap di log aktif setelah pemadatan
+    MAX_REQUEST = 64 * 1024
+    
+    def __init__(self, manager, state_dir="sync", station_id=None, shared_dir=None, secret=None):
+        self.manager = manager
+        self.state_dir = Path(state_dir)
+        self.ops_file = self.state_dir / "ops.jsonl"
+        self.archive_file = self.state_dir / "ops-arsip.jsonl"
+        self.checkpoint_file = self.state_dir / "checkpoint.json"
+        self.quarantine_file = self.state_dir / "ops-karantina.jsonl"  # baris log folder bersama yang rusak
+        self.state_file = self.state_dir / "state.json"
+        self.shared_dir = Path(shared_dir) if shared_dir else None
+        self.secret = secret.encode('utf-8') if isinstance(secret, str) else secret  # kunci HMAC peer socket
+        self.lock = threading.RLock()
+        self.station = None
+        self.offsets = {}    # file stasiun lain di folder bersama -> posisi byte yang sudah dibaca
+        self.published = {}  # vektor operasi yang sudah ditulis ke file stasiun ini di folder bersama
+        self.parked = []     # catatan minum untuk obat yang belum ada di stasiun ini
+        self.waiting = {}    # operasi yang datang tidak berurutan: "stasiun:urutan" -> operasi
+        self.ops = defaultdict(list)  # stasiun -> [operasi] berurutan setelah checkpoint
+        self.base = {}  # stasiun -> urutan terakhir yang sudah dipindah ke arsip
+        self.registers = defaultdict(dict)  # (lansia, obat) -> field -> [lamport, stasiun, nilai]
+        self.lamport = 0
+        self.inbox = deque()  # operasi dari peer socket, diterapkan oleh process_inbox di thread utama
+        self.load()
+        
+        if station_id:
+            self.station = station_id
+        if not self.station:
+            self.station = f"{socket.gethostname()}-{uuid.uuid4().hex[:6]}"
+        manager.sync = self
+        manager.events.subscribe(None, self.on_manager_event)
+        if not self.seq(self.station):
+            self.bootstrap()
+        self.compact()
+        self.save_state()
+    
+    def seq(self, station):
+        """Urutan operasi terakhir yang dimiliki dari stasiun ini"""
+        return self.base.get(station, 0) + len(self.ops[station])
+    
+    @property
+    def vector(self):
+        stations = set(self.base) | {station for station, ops in self.ops.items() if ops}
+        return {station: self.seq(station) for station in stations}
+    
+    # --- penyimpanan lokal ---
+    def load(self):
+        if self.state_file.exists():
+            try:
+                with open(self.state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                self.station = state.get('station')
+                self.offsets = state.get('offsets', {})
+                self.published = state.get('published', {})
+                self.parked = state.get('parked', [])
+                self.waiting = {op['id']: op for op in state.get('waiting', [])}
+            except Exception as e:
+                print(f"Error loading sync state: {e}")
+        if self.checkpoint_file.exists():
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+            self.base = checkpoint['base']
+            self.lamport = checkpoint['lamport']
+            for person_name, medicine_name, register in checkpoint['registers']:
+                self.registers[(person_name, medicine_name)] = register
+        if self.ops_file.exists():
+            # Checkpoint + log aktif adalah sumber kebenaran: vektor, jam Lamport, dan register dibangun darinya.
+            # Operasi yang sudah tercakup checkpoint (crash di tengah pemadatan) dilewati.
+            with open(self.ops_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        op = json.loads(line)
+                    except ValueError:
+                        continue  # baris terakhir terpotong saat crash
+                    if op['seq'] == self.seq(op['station']) + 1:
+                        self.ops[op['station']].append(op)
+                        self.lamport = max(self.lamport, op['lamport'])
+                        self._merge_registers(op)
+    
+    def save_state(self):
+        state = {'station': self.station, 'offsets': self.offsets, 'published': self.published,
+                 'parked': self.parked, 'waiting': list(self.waiting.values())}
+        try:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            temp_file = str(self.state_file) + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, ensure_ascii=False)
+            os.replace(temp_file, self.state_file)
+        except Exception as e:
+            print(f"Error saving sync state: {e}")
+    
+    def _store(self, ops):
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.ops_file, 'a', encoding='utf-8') as f:
+            for op in ops:
+                f.write(json.dumps(op, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+    
+    def compact(self):
+        """Pindahkan operasi lama ke arsip dan tulis checkpoint bila log aktif terlalu panjang.
+        Register disimpan utuh (penggabungan ulang operasi ekor tidak mengubahnya). Urutan tulis (arsip,
+        checkpoint, log aktif) aman terhadap crash: arsip boleh berisi duplikat dan operasi di log aktif yang
+        sudah tercakup checkpoint dilewati saat load."""
+        with self.lock:
+            if sum(len(ops) for ops in self.ops.values()) <= self.COMPACT_OPS:
+                return 0
+            moved = {station: ops[:len(ops) - self.KEEP_OPS] for station, ops in self.ops.items()
+                     if len(ops) > self.KEEP_OPS}
+            base = dict(self.base)
+            for station, ops in moved.items():
+                base[station] = base.get(station, 0) + len(ops)
+            
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.archive_file, 'a', encoding='utf-8') as f:
+                for ops in moved.values():
+                    for op in ops:
+                        f.write(json.dumps(op, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            checkpoint = {'base': base, 'lamport': self.lamport,
+                          'registers': [[person_name, medicine_name, register]
+                                        for (person_name, medicine_name), register in self.registers.items()]}
+            temp_file = str(self.checkpoint_file) + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(checkpoint, f, ensure_ascii=False)
+            os.replace(temp_file, self.checkpoint_file)
+            
+            self.base = base
+            for station, ops in moved.items():
+                del self.ops[station][:len(ops)]
+            temp_file = str(self.ops_file) + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                for ops in self.ops.values():
+                    for op in ops:
+                        f.write(json.dumps(op, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_file, self.ops_file)
+            return sum(len(ops) for ops in moved.values())
+    
+    def archived_ops(self, ranges):
+        """Operasi dari arsip untuk rentang {stasiun: (setelah urutan, sampai urutan)}"""
+        found = {}
+        if not self.archive_file.exists():
+            return []
+        with open(self.archive_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                op = json.loads(line)
+                bounds = ranges.get(op['station'])
+                if bounds and bounds[0] < op['seq'] <= bounds[1]:
+                    found[op['id']] = op
+        return sorted(found.values(), key=lambda op: (op['station'], op['seq']))
+    
+    # --- operasi lokal ---
+    def _new_op(self, kind, person_name, medicine_name=None, **payload):
+        self.lamport += 1
+        op = {
+            'id': f"{self.station}:{self.seq(self.station) + 1}",
+            'station': self.station,
+            'seq': self.seq(self.station) + 1,
+            'lamport': self.lamport,
+            'time': self.manager.clock.now().isoformat(),
+            'kind': kind,
+            'person': person_name,
+            'medicine': medicine_name
+        }
+        op.update(payload)
+        self.ops[self.station].append(op)
+        self._merge_registers(op)
+        return op
+    
+    def record_local(self, ops_args):
+        with self.lock:
+            ops = [self._new_op(*args[:3], **args[3]) for args in ops_args]
+            self._store(ops)
+            self.compact()
+    
+    def person_fields(self, person, deleted=False):
+        fields = {field: getattr(person, field) for field in self.PERSON_FIELDS}
+        fields[self.DELETED] = deleted
+        return fields
+    
+    def medicine_fields(self, medicine, names=None, deleted=False):
+        fields = {field: getattr(medicine, field) for field in (names or self.MEDICINE_FIELDS)
+                  if field in self.MEDICINE_FIELDS}
+        if names is None:
+            fields[self.DELETED] = deleted
+        return fields
+    
+    def on_manager_event(self, event):
+        if event.origin != ManagerEvent.LOCAL or not event.person or not event.person.name:
+            return
+        person = event.person
+        medicine_name = getattr(event.medicine, 'name', event.medicine)
+        if event.kind in (ManagerEvent.PERSON_ADDED, ManagerEvent.PERSON_UPDATED):
+            self.record_local([('set', person.name, None, {'fields': self.person_fields(person)})])
+        elif event.kind == ManagerEvent.PERSON_REMOVED:
+            self.record_local([('set', person.name, None, {'fields': {self.DELETED: True}})])
+        elif event.kind == ManagerEvent.MEDICINE_ADDED:
+            self.record_local([('set', person.name, medicine_name, {'fields': self.medicine_fields(event.medicine)})])
+        elif event.kind == ManagerEvent.MEDICINE_UPDATED:
+            fields = self.medicine_fields(event.medicine, event.data.get('fields', []))
+            if fields:
+                self.record_local([('set', person.name, medicine_name, {'fields': fields})])
+        elif event.kind == ManagerEvent.MEDICINE_REMOVED:
+            self.record_local([('set', person.name, medicine_name, {'fields': {self.DELETED: True}})])
+        elif event.kind == ManagerEvent.INTAKE_RECORDED:
+            self.record_local([('intake', person.name, medicine_name, {'record': dict(event.data)})])
+    
+    def bootstrap(self):
+        """Operasi awal untuk data yang sudah ada sebelum sinkronisasi diaktifkan"""
+        ops_args = []
+        for person in self.manager.elderly_people:
+            if not person.name:
+                continue
+            ops_args.append(('set', person.name, None, {'fields': self.person_fields(person)}))
+            for medicine in person.medicines:
+                ops_args.append(('set', person.name, medicine.name, {'fields': self.medicine_fields(medicine)}))
+                for record in medicine.history:
+                    ops_args.append(('intake', person.name, medicine.name, {'record': dict(record)}))
+        if ops_args:
+            self.record_local(ops_args)
+    
+    # --- penggabungan ---
+    def _merge_registers(self, op):
+        """Last-writer-wins per field; mengembalikan field yang nilainya berubah"""
+        if op['kind'] != 'set':
+            return {}
+        register = self.registers[(op['person'], op['medicine'])]
+        stamp = [op['lamport'], op['station']]
+        won = {}
+        for field, value in op['fields'].items():
+            current = register.get(field)
+            if current is None or stamp > current[:2]:
+                register[field] = stamp + [value]
+                won[field] = value
+        return won
+    
+    def entity_values(self, person_name, medicine_name):
+        return {field: entry[2] for field, entry in self.registers.get((person_name, medicine_name), {}).items()}
+    
+    def ops_since(self, vector):
+        """Operasi yang belum dimiliki pemegang vektor, berurutan per stasiun (dari arsip bila tertinggal)"""
+        with self.lock:
+            behind = {station: (vector.get(station, 0), base) for station, base in self.base.items()
+                      if vector.get(station, 0) < base}
+            archived = self.archived_ops(behind) if behind else []
+            return archived + [op for station, ops in self.ops.items()
+                               for op in ops[max(0, vector.get(station, 0) - self.base.get(station, 0)):]]
+    
+    def apply_ops(self, ops):
+        """Menerapkan operasi dari stasiun lain (idempoten); mengembalikan jumlah yang baru diterapkan"""
+        applied = 0
+        events = []
+        valid = []
+        for op in ops:
+            problem = self.op_problem(op)
+            if problem is None:
+                valid.append(op)
+            else:
+                print(f"Operasi sinkronisasi diabaikan: {problem}")
+        ops = valid
+        with self.lock:
+            fresh = []
+            candidates = {op['id']: op for op in ops if op['seq'] > self.seq(op['station'])}
+            candidates.update(self.waiting)
+            self.waiting = {}
+            for op in sorted(candidates.values(), key=lambda op: (op['station'], op['seq'])):
+                if op['station'] == self.station or op['seq'] <= self.seq(op['station']):
+                    continue  # sudah dimiliki
+                if op['seq'] != self.seq(op['station']) + 1:
+                    self.waiting[op['id']] = op  # ada celah: tunggu operasi sebelumnya
+                    continue
+                self.ops[op['station']].append(op)
+                self.lamport = max(self.lamport, op['lamport'])
+                fresh.append(op)
+                if op['kind'] == 'set':
+                    won = self._merge_registers(op)
+                    if won:
+                        self._apply_fields(op['person'], op['medicine'], won, events)
+                elif not self._apply_intake(op, events):
+                    self.parked.append(op)
+                applied += 1
+            if fresh or self.waiting:
+                self._store(fresh)
+                # Catatan minum yang tertunda karena obatnya belum ada dicoba lagi
+                parked, self.parked = self.parked, []
+                for op in parked:
+                    if not self._apply_intake(op, events):
+                        self.parked.append(op)
+                self.save_state()
+            if fresh:
+                self.compact()
+        
+        if events:
+            self.manager.touch_schedules()
+            self.manager.save_data()
+            for event in events:
+                event.origin = ManagerEvent.SYNC
+                self.manager.events.publish(event)
+        return applied
+    
+    def _find_person(self, name):
+        for person in self.manager.elderly_people:
+            if person.name == name:
+                return person
+        return None
+    
+    def _apply_fields(self, person_name, medicine_name, fields, events):
+        manager = self.manager
+        person = self._find_person(person_name)
+        if medicine_name is None:
+            if fields.get(self.DELETED):
+                if person is not None:
+                    manager.elderly_people = [p for p in manager.elderly_people if p is not person]
+                    if manager.current_person is person:
+                        manager.current_person = manager.elderly_people[0] if manager.elderly_people else None
+                        events.append(ManagerEvent(ManagerEvent.PERSON_SELECTED, manager.current_person))
+                    events.append(ManagerEvent(ManagerEvent.PERSON_REMOVED, person))
+                return
+            values = self.entity_values(person_name, None)
+            if values.get(self.DELETED):
+                return
+            created = person is None
+            if created:
+                person = ElderlyPerson(person_name, 0)
+                manager.elderly_people.append(person)
+                fields = values  # lansia baru: pakai semua nilai terakhir yang diketahui
+            for field, value in fields.items():
+                if field in self.PERSON_FIELDS:
+                    setattr(person, field, value)
+            events.append(ManagerEvent(ManagerEvent.PERSON_ADDED if created else ManagerEvent.PERSON_UPDATED, person))
+            return
+        
+        if person is None:
+            if fields.get(self.DELETED):
+                return
+            self._apply_fields(person_name, None, {self.DELETED: False}, events)
+            person = self._find_person(person_name)
+            if person is None:
+                return
+        medicines = [medicine for medicine in person.medicines if medicine.name == medicine_name]
+        if fields.get(self.DELETED):
+            if medicines:
+                person.remove_medicine(medicine_name)
+                events.append(ManagerEvent(ManagerEvent.MEDICINE_REMOVED, person, medicine_name))
+            return
+        values = self.entity_values(person_name, medicine_name)
+        if values.get(self.DELETED):
+            return
+        if not medicines:
+            medicine = Medicine(medicine_name, values.get('dosage', ''), list(values.get('schedule') or []))
+            for field, value in values.items():
+                if field in self.MEDICINE_FIELDS:
+                    setattr(medicine, field, value)
+            person.add_medicine(medicine)
+            events.append(ManagerEvent(ManagerEvent.MEDICINE_ADDED, person, medicine))
+            return
+        for medicine in medicines:
+            for field, value in fields.items():
+                if field in self.MEDICINE_FIELDS:
+                    setattr(medicine, field, value)
+            events.append(ManagerEvent(ManagerEvent.MEDICINE_UPDATED, person, medicine,
+                                       {'fields': sorted(field for field in fields if field != self.DELETED)}))
+    
+    def _apply_intake(self, op, events):
+        person = self._find_person(op['person'])
+        medicines = [medicine for medicine in person.medicines
+                     if medicine.name == op['medicine']] if person else []
+        if not medicines:
+            return False
+        record = op['record']
+        identity = (record.get('timestamp'), record.get('time'), record.get('scheduled'))
+        for medicine in medicines:
+            # Catatan yang sama (misal dari data awal yang disalin) tidak digandakan
+            if any((r.get('timestamp'), r.get('time'), r.get('scheduled')) == identity for r in medicine.history):
+                continue
+            entry = dict(record)
+            medicine.history.append(entry)
+            if entry.get('status', 'taken') == 'taken':
+                medicine.consume_stock(datetime.datetime.fromisoformat(entry['timestamp']))
+            events.append(ManagerEvent(ManagerEvent.INTAKE_RECORDED, person, medicine, entry))
+        
+        # Dosis yang sudah diminum di stasiun lain tidak perlu dieskalasi di sini
+        try:
+            slot_dt = datetime.datetime.fromisoformat(record['scheduled']) if record.get('scheduled') else \
+                datetime.datetime.combine(datetime.date.fromisoformat(record['timestamp'][:10]),
+                                          datetime.datetime.strptime(record['time'], "%H:%M").time())
+            self.manager.missed_dose_tracker.acknowledge(person.name, op['medicine'], slot_dt)
+            self.manager.reminder_state.resolve([(person.name, op['medicine'], slot_dt)])
+        except (KeyError, ValueError):
+            pass
+        return True
+    
+    # --- transport: folder bersama ---
+    def sync_directory(self, shared_dir=None):
+        """Tulis operasi baru ke <folder>/<stasiun>.jsonl dan baca operasi baru dari file stasiun lain.
+        Operasi yang diterima lewat peer ikut diteruskan agar sampai ke stasiun yang hanya memakai folder."""
+        shared_dir = Path(shared_dir) if shared_dir else self.shared_dir
+        if shared_dir is None:
+            return 0
+        shared_dir.mkdir(parents=True, exist_ok=True)
+        with self.lock:
+            new_ops = self.ops_since(self.published)
+            if new_ops:
+                own_log = shared_dir / f"{self.station}.jsonl"
+                ends_mid_line = self._ends_mid_line(own_log)
+                with open(own_log, 'a', encoding='utf-8') as f:
+                    if ends_mid_line:
+                        f.write("\n")  # tutup baris yang terpotong saat crash agar operasi baru tidak tersambung
+                    for op in new_ops:
+                        f.write(json.dumps(op, ensure_ascii=False) + "\n")
+                self.published = self.vector
+        
+        incoming = []
+        for path in sorted(shared_dir.glob("*.jsonl")):
+            if path.stem == self.station:
+                continue
+            offset = self.offsets.get(path.name, 0)
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                chunk = f.read()
+            # Hanya baris lengkap; baris yang sedang ditulis dibaca pada sinkronisasi berikutnya
+            complete = chunk[:chunk.rfind(b"\n") + 1]
+            for line in complete.splitlines():
+                if not line.strip():
+                    continue
+                # Baris rusak dikarantina dan offset tetap maju, supaya log stasiun itu tidak macet
+                op, problem = self.decode_op_line(line)
+                if op is not None and problem is None:
+                    problem = self.op_problem(op)
+                    if problem is not None:
+                        op = None
+                if problem is not None:
+                    self.quarantine_line(path.name, line, problem)
+                if op is not None:
+                    incoming.append(op)
+            self.offsets[path.name] = offset + len(complete)
+        applied = self.apply_ops(incoming)
+        with self.lock:
+            # Operasi yang sudah ada di folder bersama tidak perlu diteruskan lagi
+            for op in incoming:
+                if op['seq'] <= self.seq(op['station']):
+                    self.published[op['station']] = max(self.published.get(op['station'], 0), op['seq'])
+        self.save_state()
+        return applied
+    
+    @staticmethod
+    def _ends_mid_line(path):
+        try:
+            with open(path, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                return f.read(1) != b"\n"
+        except OSError:
+            return False  # belum ada atau kosong
+    
+    @classmethod
+    def decode_op_line(cls, line):
+        """(op atau None, masalah atau None) dari satu baris log. Baris yang tersambung dengan sisa baris
+        terpotong diselamatkan mulai dari awal operasi terakhirnya ('{"id": ...')."""
+        try:
+            return json.loads(line), None
+        except ValueError as e:
+            problem = f"JSON tidak valid: {e}"
+        start = line.rfind(b'{"id": ')
+        if start > 0:
+            try:
+                op = json.loads(line[start:])
+                if cls.op_problem(op) is None:
+                    return op, problem
+            except ValueError:
+                pass
+        return None, problem
+    
+    @classmethod
+    def op_problem(cls, op):
+        """Alasan operasi tidak bisa diterapkan, atau None bila lengkap"""
+        if not isinstance(op, dict):
+            return "operasi bukan objek"
+        missing = [key for key in cls.OP_KEYS if key not in op]
+        if missing:
+            return "field hilang: " + ", ".join(missing)
+        if not isinstance(op['station'], str) or not isinstance(op['seq'], int) or \
+                not isinstance(op['lamport'], int) or op['seq'] < 1:
+            return "station/seq/lamport tidak valid"
+        if op['kind'] == 'set':
+            if not isinstance(op.get('fields'), dict):
+                return "operasi set tanpa fields"
+        elif op['kind'] == 'intake':
+            record = op.get('record')
+            if not isinstance(record, dict) or not isinstance(record.get('timestamp'), str):
+                return "operasi intake tanpa catatan"
+        else:
+            return f"jenis operasi tidak dikenal: {op['kind']}"
+        if not isinstance(op.get('person'), str):
+            return "nama lansia tidak valid"
+        return None
+    
+    def quarantine_line(self, source, line, problem):
+        print(f"Operasi sinkronisasi rusak dari {source} dikarantina: {problem}")
+        try:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.quarantine_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'file': source, 'problem': problem,
+                                    'text': line.decode('utf-8', errors='replace')}, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"Error menulis karantina sinkronisasi: {e}")
+    
+    # --- transport: peer socket ---
+    # Setiap batch pesan ditutup baris {'mac': ...}: HMAC-SHA256 dengan kunci rahasia bersama atas semua baris
+    # batch, diberi awalan nonce dari pihak lawan sehingga batch lama tidak bisa diputar ulang.
+    def batch_digest(self, nonce, label):
+        if not self.secret:
+            raise ValueError("kunci rahasia sinkronisasi (--sync-secret) belum diatur")
+        return hmac.new(self.secret, f"{nonce}|{label}".encode('utf-8'), hashlib.sha256)
+    
+    @staticmethod
+    def _send(stream, message, digest=None):
+        line = (json.dumps(message, ensure_ascii=False) + "\n").encode('utf-8')
+        if digest is not None:
+            digest.update(line)
+        stream.write(line)
+    
+    @classmethod
+    def _send_batch(cls, stream, ops, closing, digest):
+        for op in ops:
+            cls._send(stream, op, digest)
+        cls._send(stream, closing, digest)
+        cls._send(stream, {'mac': digest.hexdigest()})
+        stream.flush()
+    
+    @staticmethod
+    def _receive_batch(stream, digest, limit=None):
+        """Membaca operasi, pesan penutup, lalu MAC batch; mengembalikan (operasi, pesan penutup).
+        MAC salah, hilang, atau batch terputus -> ValueError (tidak ada operasi yang dipakai)."""
+        ops = []
+        closing = None
+        while True:
+            line = stream.readline(limit) if limit else stream.readline()
+            if not line or (limit and not line.endswith(b"\n")):
+                raise ValueError("batch sinkronisasi terputus")
+            message = json.loads(line)
+            if 'mac' in message:
+                received = str(message['mac']).encode('utf-8')
+                if closing is None or not hmac.compare_digest(received, digest.hexdigest().encode('ascii')):
+                    raise ValueError("MAC batch sinkronisasi tidak cocok")
+                return ops, closing
+            if closing is not None:
+                raise ValueError("batch sinkronisasi tidak valid")
+            digest.update(line)
+            if 'kind' in message:
+                ops.append(message)
+            else:
+                closing = message
+    
+    def sync_peer(self, host, port, timeout=3):
+        """Tukar operasi dengan peer: kirim vektor, terima yang belum dimiliki, kirim yang belum dimiliki peer"""
+        with socket.create_connection((host, port), timeout=timeout) as connection:
+            stream = connection.makefile('rwb')
+            server_nonce = json.loads(stream.readline(self.MAX_REQUEST))['nonce']
+            nonce = uuid.uuid4().hex
+            self._send_batch(stream, [], {'vector': self.vector, 'nonce': nonce},
+                             self.batch_digest(server_nonce, 'request'))
+            ops, closing = self._receive_batch(stream, self.batch_digest(nonce, 'reply'))
+            self._send_batch(stream, self.ops_since(closing.get('vector', {})), {'done': True},
+                             self.batch_digest(server_nonce, 'ops'))
+        return self.apply_ops(ops)
+    
+    def serve(self, port, host="127.0.0.1"):
+        """Menjalankan peer server di thread latar belakang. Default hanya menerima koneksi dari PC ini;
+        beri host (misalnya 0.0.0.0) untuk menerima dari jaringan. Kunci rahasia wajib diatur."""
+        if not self.secret:
+            raise ValueError("kunci rahasia sinkronisasi (--sync-secret) wajib untuk menerima koneksi peer")
+        sync = self
+        
+        class Handler(socketserver.StreamRequestHandler):
+            timeout = 30
+            
+            def handle(self):
+                nonce = uuid.uuid4().hex
+                sync._send(self.wfile, {'nonce': nonce})
+                self.wfile.flush()
+                try:
+                    _, request = sync._receive_batch(self.rfile, sync.batch_digest(nonce, 'request'),
+                                                     sync.MAX_REQUEST)
+                    sync._send_batch(self.wfile, sync.ops_since(request.get('vector', {})),
+                                     {'vector': sync.vector}, sync.batch_digest(request['nonce'], 'reply'))
+                    ops, _ = sync._receive_batch(self.rfile, sync.batch_digest(nonce, 'ops'))
+                except (ValueError, KeyError) as e:
+                    print(f"Sinkronisasi dari {self.client_address[0]} ditolak: {e}")
+                    return
+                sync.inbox.extend(ops)
+        
+        server = socketserver.ThreadingTCPServer((host, port), Handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+    
+    def process_inbox(self):
+        """Terapkan operasi yang diterima peer server (panggil dari thread utama/Tk)"""
+        ops = []
+        while self.inbox:
+            ops.append(self.inbox.popleft())
+        return self.apply_ops(ops) if ops else 0
+
+def history_slot_key(record):
+    """(tanggal, "HH:MM") jadwal yang diselesaikan oleh satu catatan riwayat"""
+    if record.get('scheduled'):
+        return (record['scheduled'][:10], record['time'])
+    return (record['timestamp'][:10], record['time'])
+
+class ReminderStateStore:
+    """Menyimpan status pengingat (jalan terakhir, tunda, pending) agar tidak hilang saat restart"""
+    
+    def __init__(self, state_file="reminder_state.json"):
+        self.state_file = state_file  # None = hanya di memori
+        self.lock = threading.Lock()
+        self.last_run = None
+        self.snoozes = {}  # key -> {'person', 'medicine', 'slot_dt', 'until'}
+        self.pending = {}  # key -> {'person', 'medicine', 'slot_dt', 'fired_at'}
+        self.load()
+    
+    @staticmethod
+    def make_key(person_name, medicine_name, slot_dt):
+        return f"{person_name}|{medicine_name}|{slot_dt.strftime('%Y-%m-%dT%H:%M')}"
+    
+    def load(self):
+        if not self.state_file or not os.path.exists(self.state_file):
+            return
+        try:
+            with open(self.state_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('last_run'):
+                self.last_run = datetime.datetime.fromisoformat(data['last_run'])
+            for entry in data.get('snoozes', []):
+                entry['slot_dt'] = datetime.datetime.fromisoformat(entry['slot_dt'])
+                entry['until'] = datetime.datetime.fromisoformat(entry['until'])
+                self.snoozes[self.make_key(entry['person'], entry['medicine'], entry['slot_dt'])] = entry
+            for entry in data.get('pending', []):
+                entry['slot_dt'] = datetime.datetime.fromisoformat(entry['slot_dt'])
+                entry['fired_at'] = datetime.datetime.fromisoformat(entry['fired_at'])
+                self.pending[self.make_key(entry['person'], entry['medicine'], entry['slot_dt'])] = entry
+        except Exception as e:
+            print(f"Error loading reminder state: {e}")
+    
+    def save(self):
+        if not self.state_file:
+            return
+        with self.lock:
+            data = {
+                'last_run': self.last_run.isoformat() if self.last_run else None,
+                'snoozes': [dict(entry, slot_dt=entry['slot_dt'].isoformat(), until=entry['until'].isoformat())
+                            for entry in self.snoozes.values()],
+                'pending': [dict(entry, slot_dt=entry['slot_dt'].isoformat(), fired_at=entry['fired_at'].isoformat())
+                            for entry in self.pending.values()]
+            }
+        try:
+            temp_file = self.state_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=4, ensure_ascii=False)
+            os.replace(temp_file, self.state_file)
+        except Exception as e:
+            print(f"Error saving reminder state: {e}")
+    
+    def mark_run(self, now):
+        """Catat waktu jalan terakhir (disimpan paling sering sekali per menit)"""
+        previous = self.last_run
+        self.last_run = now
+        if previous is None or now.replace(second=0, microsecond=0) != previous.replace(second=0, microsecond=0):
+            self.save()
+    
+    def add_pending(self, person_name, medicine_name, slot_dt, fired_at):
+        with self.lock:
+            self.pending[self.make_key(person_name, medicine_name, slot_dt)] = {
+                'person': person_name, 'medicine': medicine_name,
+                'slot_dt': slot_dt, 'fired_at': fired_at
+            }
+        self.save()
+    
+    def add_snooze(self, person_name, medicine_name, slot_dt, until):
+        with self.lock:
+            self.snoozes[self.make_key(person_name, medicine_name, slot_dt)] = {
+                'person': person_name, 'medicine': medicine_name,
+                'slot_dt': slot_dt, 'until': until
+            }
+        self.save()
+    
+    def resolve(self, doses):
+        """Hapus pending/tunda untuk dosis [(lansia, obat, slot_dt atau None)] yang sudah selesai"""
+        changed = False
+        with self.lock:
+            for person_name, medicine_name, slot_dt in doses:
+                if slot_dt is not None:
+                    keys = [self.make_key(person_name, medicine_name, slot_dt)]
+                else:
+                    prefix = f"{person_name}|{medicine_name}|"
+                    keys = [k for k in list(self.pending) + list(self.snoozes) if k.startswith(prefix)]
+                for key in keys:
+                    changed |= self.pending.pop(key, None) is not None
+                    changed |= self.snoozes.pop(key, None) is not None
+        if changed:
+            self.save()
+    
+    def pop_due_snoozes(self, now):
+        with self.lock:
+            due = [key for key, entry in self.snoozes.items() if entry['until'] <= now]
+            entries = [self.snoozes.pop(key) for key in due]
+        if entries:
+            self.save()
+        return entries
+
+def percentile(sorted_values, fraction):
+    """Percentile nearest-rank dari daftar yang sudah terurut"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+class ReminderLatencyLog:
+    """Ring buffer waktu jadwal/ditembakkan/ditampilkan/dikonfirmasi per pengingat untuk audit SLO"""
+    FIELDS = ('fired', 'displayed', 'acknowledged')
+    
+    def __init__(self, log_file="reminder_latency.json", capacity=20000):
+        self.log_file = log_file  # None = hanya di memori
+        self.capacity = capacity
+        self.records = deque()
+        self.index = {}  # key -> record
+        self.lock = threading.Lock()
+        self.dirty = False
+        self.load()
+    
+    def _record_for(self, person_name, medicine_name, slot_dt, create=False):
+        key = ReminderStateStore.make_key(person_name, medicine_name, slot_dt)
+        record = self.index.get(key)
+        if record is None and create:
+            if len(self.records) >= self.capacity:
+                oldest = self.records.popleft()
+                self.index.pop(ReminderStateStore.make_key(oldest['person'], oldest['medicine'], oldest['slot_dt']), None)
+            record = {'person': person_name, 'medicine': medicine_name, 'slot_dt': slot_dt,
+                      'fired': None, 'displayed': None, 'acknowledged': None}
+            self.records.append(record)
+            self.index[key] = record
+        return record
+    
+    def record_fired(self, person_name, medicine_name, slot_dt, moment):
+        with self.lock:
+            record = self._record_for(person_name, medicine_name, slot_dt, create=True)
+            if record['fired'] is None:
+                record['fired'] = moment
+                self.dirty = True
+    
+    def record_displayed(self, person_name, medicine_name, slot_dt, moment):
+        with self.lock:
+            record = self._record_for(person_name, medicine_name, slot_dt, create=True)
+            if record['displayed'] is None:
+                record['displayed'] = moment
+                self.dirty = True
+    
+    def record_acknowledged(self, person_name, medicine_name, slot_dt, moment):
+        with self.lock:
+            record = self._record_for(person_name, medicine_name, slot_dt)
+            if record is not None and record['acknowledged'] is None:
+                record['acknowledged'] = moment
+                self.dirty = True
+    
+    @staticmethod
+    def latency(record, metric):
+        """Detik latensi: fire/display diukur dari menit jadwal, ack dari saat ditampilkan"""
+        if metric == 'ack':
+            start = record['displayed'] or record['fired']
+            end = record['acknowledged']
+        else:
+            start = record['slot_dt']
+            end = record['fired' if metric == 'fire' else 'displayed']
+        if start is None or end is None:
+            return None
+        return (end - start).total_seconds()
+    
+    def percentiles(self, metric='fire', group_by='person'):
+        """{kelompok: {'count', 'p50', 'p95', 'p99'}} per lansia atau per hari"""
+        groups = defaultdict(list)
+        with self.lock:
+            for record in self.records:
+                value = self.latency(record, metric)
+                if value is None:
+                    continue
+                group = record['person'] if group_by == 'person' else record['slot_dt'].date().isoformat()
+                groups[group].append(value)
+        
+        result = {}
+        for group, values in sorted(groups.items()):
+            values.sort()
+            result[group] = {
+                'count': len(values),
+                'p50': percentile(values, 0.50),
+                'p95': percentile(values, 0.95),
+                'p99': percentile(values, 0.99)
+            }
+        return result
+    
+    def late_slots(self, threshold_seconds=60):
+        """Pengingat yang ditembakkan lebih lambat dari ambang batas"""
+        with self.lock:
+            return [dict(record) for record in self.records
+                    if (self.latency(record, 'fire') or 0) > threshold_seconds]
+    
+    def format_report(self, threshold_seconds=60):
+        lines = []
+        for metric, title in (('fire', "Latensi pengingat ditembakkan"),
+                              ('display', "Latensi pengingat ditampilkan"),
+                              ('ack', "Waktu sampai 'Sudah Diminum'")):
+            for group_by, group_title in (('person', "per lansia"), ('day', "per hari")):
+                stats = self.percentiles(metric, group_by)
+                if not stats:
+                    continue
+                lines.append(f"{title} ({group_title}, detik):")
+                for group, values in stats.items():
+                    lines.append(f"  {group:<24} n={values['count']:<5} p50={values['p50']:.0f} "
+                                 f"p95={values['p95']:.0f} p99={values['p99']:.0f}")
+        
+        late = self.late_slots(threshold_seconds)
+        lines.append(f"Jadwal terlambat > {threshold_seconds} detik: {len(late)}")
+        for record in late[:50]:
+            lines.append(f"  {record['slot_dt'].strftime('%Y-%m-%d %H:%M')} {record['person']} - "
+                         f"{record['medicine']} (+{self.latency(record, 'fire'):.0f} detik)")
+        return "\n".join(lines)
+    
+    def load(self):
+        if not self.log_file or not os.path.exists(self.log_file):
+            return
+        try:
+            with open(self.log_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            # Format ringkas: [lansia, obat, epoch jadwal, +fired, +displayed, +acknowledged]
+            for person_name, medicine_name, slot_epoch, *offsets in data.get('records', []):
+                slot_dt = datetime.datetime.fromtimestamp(slot_epoch)
+                record = self._record_for(person_name, medicine_name, slot_dt, create=True)
+                for field, offset in zip(self.FIELDS, offsets):
+                    if offset is not None:
+                        record[field] = slot_dt + datetime.timedelta(seconds=offset)
+        except Exception as e:
+            print(f"Error loading latency log: {e}")
+    
+    def save(self):
+        if not self.log_file or not self.dirty:
+            return
+        with self.lock:
+            rows = []
+            for record in self.records:
+                slot_dt = record['slot_dt']
+                rows.append([record['person'], record['medicine'], int(slot_dt.timestamp())] + [
+                    round((record[field] - slot_dt).total_seconds(), 1) if record[field] else None
+                    for field in self.FIELDS
+                ])
+            self.dirty = False
+        try:
+            temp_file = self.log_file + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump({'version': 1, 'records': rows}, f, separators=(',', ':'), ensure_ascii=False)
+            os.replace(temp_file, self.log_file)
+        except Exception as e:
+            print(f"Error saving latency log: {e}")
+
+class MissedDoseTracker:
+    """Melacak pengingat yang belum dikonfirmasi dan menjalankan eskalasi bertahap"""
+    
+    def __init__(self, manager, stages=None, notifier=None):
+        self.manager = manager
+        self.stages = sorted(stages or ESCALATION_STAGES, key=lambda stage: stage['after_minutes'])
+        self.notifier = notifier or self.default_notifier
+        self.escalation_listeners = []  # callback(event) untuk GUI / mode headless
+        self.outstanding = defaultdict(set)  # (lansia, obat) -> key yang masih dilacak
+        self.lock = threading.Lock()
+        self.wheel = HierarchicalTimerWheel(manager.clock.now().replace(microsecond=0), tick_seconds=5)
+    
+    @staticmethod
+    def make_key(person_name, medicine_name, slot_dt):
+        return (person_name, medicine_name, slot_dt.strftime("%Y-%m-%dT%H:%M"))
+    
+    @staticmethod
+    def default_notifier(event):
+        print(f"[Pos Perawat] {event['person']} belum minum {event['medicine']} "
+              f"(jadwal {event['slot']}, tahap {event['stage'] + 1})")
+    
+    def track(self, person, medicine, slot_dt, fired_at):
+        """Mulai menghitung masa tenggang sejak pengingat ditampilkan"""
+        if not self.stages:
+            return
+        key = self.make_key(person.name, medicine.name, slot_dt)
+        payload = {'person': person, 'medicine': medicine, 'slot_dt': slot_dt,
+                   'fired_at': fired_at, 'stage': 0}
+        with self.lock:
+            if not len(self.wheel):
+                # Wheel kosong: jangkarkan ulang ke jam pengingat (bisa jam virtual saat simulasi)
+                self.wheel = HierarchicalTimerWheel(fired_at.replace(microsecond=0), tick_seconds=5)
+            self.wheel.schedule(key, fired_at + datetime.timedelta(minutes=self.stages[0]['after_minutes']), payload)
+            self.outstanding[(person.name, medicine.name)].add(key)
+    
+    def acknowledge(self, person_name, medicine_name, slot_dt=None):
+        """Hentikan eskalasi untuk satu jadwal; tanpa slot_dt semua jadwal obat itu dihentikan"""
+        with self.lock:
+            keys = self.outstanding.get((person_name, medicine_name), set())
+            if slot_dt is not None:
+                keys = keys & {self.make_key(person_name, medicine_name, slot_dt)}
+            cancelled = 0
+            for key in list(keys):
+                cancelled += self.wheel.cancel(key)
+                self._forget(key)
+            return cancelled
+    
+    def _forget(self, key):
+        owner = (key[0], key[1])
+        keys = self.outstanding.get(owner)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.outstanding[owner]
+    
+    def is_tracking(self, person_name, medicine_name, slot_dt):
+        with self.lock:
+            return self.make_key(person_name, medicine_name, slot_dt) in self.wheel
+    
+    def pending_count(self):
+        with self.lock:
+            return len(self.wheel)
+    
+    def tick(self, now):
+        """Proses semua tenggat yang lewat; dipanggil dari loop pengingat"""
+        with self.lock:
+            expired = self.wheel.advance(now)
+            for key, payload in expired:
+                next_stage = payload['stage'] + 1
+                if next_stage < len(self.stages):
+                    deadline = payload['fired_at'] + datetime.timedelta(
+                        minutes=self.stages[next_stage]['after_minutes'])
+                    self.wheel.schedule(key, deadline, dict(payload, stage=next_stage))
+                else:
+                    self._forget(key)
+        
+        for key, payload in expired:
+            try:
+                self._run_stage(payload, now)
+            except Exception as e:
+                print(f"Error eskalasi: {e}")
+        return len(expired)
+    
+    def _run_stage(self, payload, now):
+        stage = self.stages[payload['stage']]
+        person = payload['person']
+        medicine = payload['medicine']
+        event = {
+            'action': stage['action'],
+            'stage': payload['stage'],
+            'person': person.name,
+            'medicine': medicine.name,
+            'slot': payload['slot_dt'].strftime("%H:%M"),
+            'slot_dt': payload['slot_dt'],
+            'config': stage
+        }
+        
+        if stage['action'] == 'sound':
+            self.manager.sound_manager.play_sound(stage.get('sound', medicine.custom_sound),
+                                                  volume=stage.get('volume'), person=person,
+                                                  key=SoundManager.reminder_key(person), medicine=medicine)
+        elif stage['action'] == 'notify':
+            self.notifier(event)
+        elif stage['action'] == 'missed':
+            self.manager.record_missed_dose(person, medicine.name, payload['slot_dt'], now)
+        
+        for listener in list(self.escalation_listeners):
+            listener(event)
+
+class SystemClock:
+    """Sumber waktu pengingat; bisa diganti jam virtual untuk pengujian/simulasi"""
+    
+    def now(self):
+        return datetime.datetime.now()
+    
+    def monotonic(self):
+        return time.monotonic()
+    
+    def utc_offset(self):
+        return datetime.datetime.now().astimezone().utcoffset()
+    
+    def sleep(self, seconds):
+        time.sleep(seconds)
+
+class MedicineReminder:
+    # Batas catch-up saat aplikasi baru dibuka, agar tidak membanjiri pengguna
+    MAX_CATCH_UP_DAYS = 7
+    # Selisih jam dinding vs monotonic di atas ini dianggap lompatan jam / suspend
+    JUMP_TOLERANCE_SECONDS = 90
+    
+    def __init__(self, medicine_manager, gui_callback, catch_up_callback=None, clock=None, tick_seconds=30,
+                 monitor_all=False):
+        self.medicine_manager = medicine_manager
+        self.gui_callback = gui_callback
+        self.catch_up_callback = catch_up_callback or self.print_missed_doses
+        self.clock = clock or SystemClock()
+        self.tick_seconds = tick_seconds
+        self.monitor_all = monitor_all  # True = semua lansia, False = hanya lansia aktif
+        self.running = False
+        self.reminder_thread = None
+        self.pending_reminders = {}  # key jadwal -> slot_dt yang sudah ditembakkan
+        self.scanned_until = None  # menit jam dinding terakhir yang sudah diperiksa
+        self.last_wall = None
+        self.last_mono = None
+        self.last_offset = None
+        self.clock_events = deque(maxlen=100)
+        # Heap (slot_dt, urutan, lansia, obat): tiap tick hanya melihat jadwal yang jatuh tempo
+        self.schedule_heap = []
+        self.heap_version = None
+        self.heap_sequence = 0
+        self.next_prune = None
+    
+    def start(self):
+        self.running = True
+        self.reminder_thread = threading.Thread(target=self._run)
+        self.reminder_thread.daemon = True
+        self.reminder_thread.start()
+    
+    def stop(self):
+        self.running = False
+    
+    def monitored_people(self):
+        """Lansia yang jadwalnya dipantau oleh loop pengingat"""
+        if self.monitor_all:
+            return [person for person in self.medicine_manager.elderly_people if person.name]
+        person = self.medicine_manager.current_person
+        return [person] if person else []
+    
+    def _push_next(self, person, medicine, after):
+        try:
+            slot_dt = medicine.next_occurrence(after)
+        except ValueError as e:  # aturan tersimpan yang tidak valid: obat lain tetap dipantau
+            print(f"Error jadwal {person.name}/{medicine.name}: {e}")
+            return
+        if slot_dt is not None:
+            self.heap_sequence += 1
+            heapq.heappush(self.schedule_heap, (slot_dt, self.heap_sequence, person, medicine))
+    
+    def _rebuild_heap(self, after):
+        self.schedule_heap = []
+        for person in self.monitored_people():
+            for medicine in person.medicines:
+                self._push_next(person, medicine, after)
+        self.heap_version = self.medicine_manager.schedule_version
+    
+    @staticmethod
+    def print_missed_doses(missed):
+        for dose in missed:
+            print(f"Terlewat: {dose['person'].name} - {dose['medicine'].name} "
+                  f"({dose['slot_dt'].strftime('%Y-%m-%d %H:%M')})")
+    
+    def _run(self):
+        try:
+            self.catch_up(self.clock.now())
+        except Exception as e:
+            print(f"Error catch-up pengingat: {e}")
+        self._check_reminders()
+    
+    def find_missed_doses(self, now):
+        """Semua jadwal sejak jalan terakhir (plus pending/tunda lama) yang belum tercatat di riwayat"""
+        state = self.medicine_manager.reminder_state
+        missed = {}
+        
+        def add(person, medicine, slot_dt):
+            missed[ReminderStateStore.make_key(person.name, medicine.name, slot_dt)] = {
+                'person': person, 'medicine': medicine, 'slot_dt': slot_dt
+            }
+        
+        # Pending dan tunda dari sesi sebelumnya
+        for entry in list(state.pending.values()) + [e for e in state.snoozes.values() if e['until'] <= now]:
+            person, medicine = self.medicine_manager.find_medicine(entry['person'], entry['medicine'])
+            if medicine is not None:
+                add(person, medicine, entry['slot_dt'])
+        
+        if state.last_run is not None:
+            since = max(state.last_run, now - datetime.timedelta(days=self.MAX_CATCH_UP_DAYS))
+            # Menit berjalan sekarang ditangani loop pengingat biasa
+            until = now.replace(second=0, microsecond=0) - datetime.timedelta(minutes=1)
+            # Semua lansia, bukan hanya yang dipantau: last_run dimajukan untuk semua sesudah ini
+            for person in self.medicine_manager.elderly_people:
+                if not person.name:
+                    continue
+                for medicine in person.medicines:
+                    try:
+                        slots = list(medicine.get_rule().occurrences_between(since, until))
+                    except ValueError as e:
+                        print(f"Error jadwal {person.name}/{medicine.name}: {e}")
+                        continue
+                    for slot_dt in slots:
+                        add(person, medicine, slot_dt)
+        
+        # Buang yang sudah tercatat (diminum atau terlewat) memakai indeks riwayat
+        resolved_index = {}
+        result = []
+        for dose in missed.values():
+            medicine = dose['medicine']
+            if id(medicine) not in resolved_index:
+                resolved_index[id(medicine)] = set(history_slot_key(r) for r in medicine.history)
+            slot_key = (dose['slot_dt'].strftime("%Y-%m-%d"), dose['slot_dt'].strftime("%H:%M"))
+            if slot_key not in resolved_index[id(medicine)]:
+                result.append(dose)
+        result.sort(key=lambda dose: (dose['slot_dt'], dose['person'].name, dose['medicine'].name))
+        return result
+    
+    def catch_up(self, now):
+        state = self.medicine_manager.reminder_state
+        missed = self.find_missed_doses(now)
+        
+        # Tunda yang belum jatuh tempo tetap dipertahankan; dosis terlewat menjadi pending
+        # sampai dicatat, sehingga tetap muncul lagi jika aplikasi ditutup sebelum ditangani
+        with state.lock:
+            state.snoozes = {k: e for k, e in state.snoozes.items() if e['until'] > now}
+            state.pending = {
+                ReminderStateStore.make_key(d['person'].name, d['medicine'].name, d['slot_dt']): {
+                    'person': d['person'].name, 'medicine': d['medicine'].name,
+                    'slot_dt': d['slot_dt'], 'fired_at': now
+                }
+                for d in missed
+            }
+        state.last_run = now
+        state.save()
+        
+        if missed:
+            self.catch_up_callback(missed)
+        return missed
+    
+    def _fire_snoozed(self, now):
+        for entry in self.medicine_manager.reminder_state.pop_due_snoozes(now):
+            person, medicine = self.medicine_manager.find_medicine(entry['person'], entry['medicine'])
+            if medicine is not None:
+                self.medicine_manager.reminder_state.add_pending(
+                    person.name, medicine.name, entry['slot_dt'], now)
+                self.gui_callback(medicine, entry['slot_dt'], person)
+    
+    def _detect_clock_change(self, now, mono):
+        """Bandingkan jam dinding dengan monotonic untuk mendeteksi suspend, lompatan jam, dan DST"""
+        offset = self.clock.utc_offset()
+        if self.last_wall is not None:
+            expected = self.last_wall + datetime.timedelta(seconds=mono - self.last_mono)
+            drift = now - expected
+            if abs(drift.total_seconds()) > self.JUMP_TOLERANCE_SECONDS:
+                if offset != self.last_offset:
+                    kind = 'dst'
+                elif drift > datetime.timedelta(0):
+                    kind = 'forward'  # resume dari suspend/hibernate atau jam dimajukan
+                else:
+                    kind = 'backward'
+                self.clock_events.append({'kind': kind, 'at': now, 'drift_seconds': drift.total_seconds()})
+            elif mono - self.last_mono > self.tick_seconds * 3:
+                # Tick terlambat (proses tertahan); jendela pemindaian tetap menutup celahnya
+                self.clock_events.append({'kind': 'late', 'at': now,
+                                          'drift_seconds': mono - self.last_mono - self.tick_seconds})
+        self.last_wall = now
+        self.last_mono = mono
+        self.last_offset = offset
+    
+    def _is_taken(self, medicine, slot_dt):
+        slot_key = (slot_dt.strftime("%Y-%m-%d"), slot_dt.strftime("%H:%M"))
+        return any(
+            history_slot_key(record) == slot_key and record.get('status', 'taken') == 'taken'
+            for record in medicine.history
+        )
+    
+    def _fire(self, person, medicine, slot_dt, now):
+        reminder_key = ReminderStateStore.make_key(person.name, medicine.name, slot_dt)
+        if reminder_key in self.pending_reminders or self._is_taken(medicine, slot_dt):
+            return False
+        
+        if medicine.sound_enabled:
+            self.medicine_manager.sound_manager.play_sound(medicine.custom_sound, person=person,
+                                                           key=SoundManager.reminder_key(person),
+                                                           medicine=medicine)
+        
+        self.pending_reminders[reminder_key] = slot_dt
+        self.medicine_manager.latency_log.record_fired(person.name, medicine.name, slot_dt, now)
+        self.medicine_manager.reminder_state.add_pending(person.name, medicine.name, slot_dt, now)
+        self.medicine_manager.missed_dose_tracker.track(person, medicine, slot_dt, now)
+        self.gui_callback(medicine, slot_dt, person)
+        return True
+    
+    def tick(self):
+        """Satu putaran pemeriksaan: tembakkan semua jadwal dalam (scanned_until, menit sekarang]"""
+        now = self.clock.now()
+        mono = self.clock.monotonic()
+        current_minute = now.replace(second=0, microsecond=0)
+        self._detect_clock_change(now, mono)
+        
+        if self.scanned_until is None or current_minute < self.scanned_until:
+            # Awal jalan, atau jam mundur (DST/koreksi jam): mulai lagi dari menit ini.
+            # Jadwal yang sudah ditembakkan tidak diulang karena tercatat di pending_reminders.
+            self.scanned_until = current_minute - datetime.timedelta(minutes=1)
+            self.heap_version = None
+        
+        since = max(self.scanned_until, current_minute - datetime.timedelta(days=self.MAX_CATCH_UP_DAYS))
+        if self.heap_version != self.medicine_manager.schedule_version:
+            self._rebuild_heap(since)
+        
+        fired = 0
+        while self.schedule_heap and self.schedule_heap[0][0] <= current_minute:
+            slot_dt, _, person, medicine = heapq.heappop(self.schedule_heap)
+            if slot_dt > since:
+                fired += self._fire(person, medicine, slot_dt, now)
+            self._push_next(person, medicine, slot_dt)
+        self.scanned_until = max(self.scanned_until, current_minute)
+        self._housekeeping(now, current_minute)
+        return fired
+    
+    def _housekeeping(self, now, current_minute):
+        """Tunda, eskalasi dosis terlewat, status jalan, dan pemangkasan berkala"""
+        self._fire_snoozed(now)
+        self.medicine_manager.missed_dose_tracker.tick(now)
+        self.medicine_manager.reminder_state.mark_run(now)
+        
+        if self.next_prune is None or now >= self.next_prune:
+            self.medicine_manager.latency_log.save()
+            cutoff = current_minute - datetime.timedelta(days=2)
+            self.pending_reminders = {
+                k: v for k, v in self.pending_reminders.items()
+                if v >= cutoff
+            }
+            self.next_prune = now + datetime.timedelta(hours=1)
+    
+    def _check_reminders(self):
+        while self.running:
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Error pengingat: {e}")
+            
+            self.clock.sleep(self.tick_seconds)
+
+def plan_ward_shards(people, workers):
+    """Bagi bangsal ke sejumlah proses: bangsal terbesar dulu ke proses yang lansianya paling sedikit"""
+    counts = defaultdict(int)
+    for person in people:
+        counts[person.ward or ""] += 1
+    plan = [[] for _ in range(max(1, min(workers, len(counts))))]
+    loads = [0] * len(plan)
+    for ward, residents in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+        index = loads.index(min(loads))
+        plan[index].append(ward)
+        loads[index] += residents
+    return plan
+
+def shard_for_ward(ward, plan):
+    """Indeks proses pemilik bangsal; bangsal baru yang belum ada di rencana dibagi dengan crc32"""
+    for index, wards in enumerate(plan):
+        if ward in wards:
+            return index
+    return zlib.crc32(ward.encode('utf-8')) % len(plan)
+
+def ward_label(wards):
+    return ", ".join(ward or "(tanpa bangsal)" for ward in wards) or "(kosong)"
+
+class ReminderShard(MedicineReminder):
+    """Penjadwal di proses pekerja: hanya memantau lansia bangsal miliknya dan mengirim pengingat
+    yang jatuh tempo ke front-end lewat antrean (suara, state, dan eskalasi ditangani front-end)"""
+    
+    def __init__(self, shard_index, plan, data_file, out_queue, tick_seconds=30):
+        manager = ElderlyManager(data_file=None, sound_manager=SimulatedSoundManager(),
+                                 state_file=None, latency_file=None)
+        super().__init__(manager, None, catch_up_callback=lambda missed: None,
+                         tick_seconds=tick_seconds, monitor_all=True)
+        self.shard_index = shard_index
+        self.plan = plan
+        self.data_file = data_file
+        self.out_queue = out_queue
+        self.data_signature = None
+    
+    def reload(self):
+        """Baca ulang file data bila berubah (riwayat dari front-end mencegah pengingat ganda)"""
+        signature = file_signature(self.data_file)
+        if signature == self.data_signature:
+            return
+        people_data = []
+        if signature is not None:
+            with DataFileLock(self.data_file):
+                people_data, _, _ = read_data_store(self.data_file)
+                signature = file_signature(self.data_file)
+        self.medicine_manager.elderly_people = [
+            ElderlyPerson.from_dict(data) for data in people_data
+            if shard_for_ward(data.get('ward', ''), self.plan) == self.shard_index
+        ]
+        self.medicine_manager.touch_schedules()
+        self.data_signature = signature
+    
+    def _fire(self, person, medicine, slot_dt, now):
+        reminder_key = ReminderStateStore.make_key(person.name, medicine.name, slot_dt)
+        if reminder_key in self.pending_reminders or self._is_taken(medicine, slot_dt):
+            return False
+        self.pending_reminders[reminder_key] = slot_dt
+        self.out_queue.put(('fired', self.shard_index, person.name, medicine.name, slot_dt, now))
+        return True
+    
+    def serve(self, resume_from=None):
+        """Loop pekerja; heartbeat hanya dikirim setelah tick berhasil sehingga pekerja macet terdeteksi.
+        Berhenti sendiri bila front-end hilang (proses induk berganti)."""
+        parent = os.getppid()
+        self.scanned_until = resume_from
+        while os.getppid() == parent:
+            try:
+                self.reload()
+                self.tick()
+                self.out_queue.put(('heartbeat', self.shard_index, self.scanned_until,
+                                    len(self.medicine_manager.elderly_people)))
+            except Exception as e:
+                self.out_queue.put(('error', self.shard_index, str(e)))
+            time.sleep(self.tick_seconds)
+
+def run_reminder_shard(shard_index, plan, data_file, out_queue, tick_seconds, resume_from):
+    """Titik masuk proses pekerja pengingat"""
+    try:
+        ReminderShard(shard_index, plan, data_file, out_queue, tick_seconds).serve(resume_from)
+    except KeyboardInterrupt:
+        pass
+
+class ShardedMedicineReminder(MedicineReminder):
+    """Pengingat multi-proses: lansia dibagi per bangsal ke beberapa proses ReminderShard. Front-end ini
+    menerima pengingat dari antrean lalu memutar suara, mencatat state, dan menjalankan eskalasi seperti
+    MedicineReminder biasa. Pekerja yang mati atau berhenti mengirim heartbeat dijalankan ulang dan
+    melanjutkan dari menit terakhir yang sudah diperiksa, sehingga tidak ada jadwal yang terlewat."""
+    HEARTBEAT_MISSES = 4  # heartbeat terlewat sebelum pekerja dianggap macet
+    MAX_RESTART_DELAY = 60
+    STOP_TIMEOUT = 5
+    
+    def __init__(self, medicine_manager, gui_callback, catch_up_callback=None, workers=None, clock=None,
+                 tick_seconds=1, worker_tick_seconds=30):
+        super().__init__(medicine_manager, gui_callback, catch_up_callback, clock=clock,
+                         tick_seconds=tick_seconds, monitor_all=True)
+        if not medicine_manager.data_file:
+            raise ValueError("Pengingat multi-proses membutuhkan file data")
+        self.data_file = medicine_manager.data_file
+        self.workers = workers or os.cpu_count() or 1
+        self.worker_tick_seconds = worker_tick_seconds
+        self.plan = []
+        self.shards = []
+        self.worker_events = deque(maxlen=100)
+    
+    def start(self):
+        self.plan = plan_ward_shards(self.medicine_manager.elderly_people, self.workers)
+        # Menit sebelum catch-up selesai diperiksa pekerja, meski proses butuh waktu untuk mulai
+        resume_from = self.clock.now().replace(second=0, microsecond=0) - datetime.timedelta(minutes=1)
+        self.shards = [
+            {'index': index, 'wards': wards, 'process': None, 'queue': None,
+             'scanned_until': resume_from, 'last_heartbeat': None, 'residents': 0,
+             'restarts': 0, 'restart_delay': 1, 'next_restart': None}
+            for index, wards in enumerate(self.plan)
+        ]
+        for shard in self.shards:
+            self._spawn(shard)
+        super().start()
+    
+    def stop(self):
+        super().stop()
+        for shard in self.shards:
+            self._stop_shard(shard)
+    
+    def _spawn(self, shard):
+        # Antrean baru tiap proses: antrean milik proses yang dihentikan paksa bisa rusak
+        shard['queue'] = multiprocessing.Queue()
+        shard['process'] = multiprocessing.Process(
+            target=run_reminder_shard, name=f"pengingat-{shard['index']}", daemon=True,
+            args=(shard['index'], self.plan, self.data_file, shard['queue'],
+                  self.worker_tick_seconds, shard['scanned_until']))
+        shard['process'].start()
+        shard['last_heartbeat'] = self.clock.monotonic()
+    
+    def _stop_shard(self, shard):
+        # Pekerja tidak menyimpan state apa pun, jadi cukup dihentikan. Sengaja tanpa multiprocessing.Event:
+        # set() bisa menggantung bila pekerja mati saat menunggu event tersebut.
+        process = shard['process']
+        if process is None:
+            return
+        if process.is_alive():
+            process.terminate()
+            process.join(self.STOP_TIMEOUT)
+        if process.is_alive():
+            process.kill()  # proses yang dihentikan (SIGSTOP) tidak menanggapi terminate
+            process.join(1)
+        shard['queue'].close()
+    
+    def _drain(self):
+        fired = 0
+        for shard in self.shards:
+            if shard['queue'] is None:
+                continue
+            while True:
+                try:
+                    message = shard['queue'].get_nowait()
+                except queue.Empty:
+                    break
+                except (EOFError, OSError, ValueError):
+                    break  # antrean ditutup
+                kind = message[0]
+                if kind == 'heartbeat':
+                    shard['last_heartbeat'] = self.clock.monotonic()
+                    shard['scanned_until'] = message[2]
+                    shard['residents'] = message[3]
+                    shard['restart_delay'] = 1
+                elif kind == 'fired':
+                    _, _, person_name, medicine_name, slot_dt, fired_at = message
+                    person, medicine = self.medicine_manager.find_medicine(person_name, medicine_name)
+                    if medicine is not None:
+                        fired += self._fire(person, medicine, slot_dt, fired_at)
+                elif kind == 'error':
+                    print(f"Error pengingat bangsal {ward_label(shard['wards'])}: {message[2]}")
+        return fired
+    
+    def _supervise(self):
+        mono = self.clock.monotonic()
+        timeout = self.worker_tick_seconds * self.HEARTBEAT_MISSES
+        for shard in self.shards:
+            process = shard['process']
+            if shard['next_restart'] is None:
+                alive = process.is_alive()
+                if alive and mono - shard['last_heartbeat'] <= timeout:
+                    continue
+                reason = "tidak mengirim heartbeat" if alive else f"berhenti (kode {process.exitcode})"
+                print(f"Pengingat bangsal {ward_label(shard['wards'])} {reason}, dijalankan ulang")
+                self.worker_events.append({'shard': shard['index'], 'reason': reason, 'at': self.clock.now()})
+                self._stop_shard(shard)
+                shard['next_restart'] = mono + shard['restart_delay']
+                shard['restart_delay'] = min(shard['restart_delay'] * 2, self.MAX_RESTART_DELAY)
+            elif mono >= shard['next_restart']:
+                shard['next_restart'] = None
+                shard['restarts'] += 1
+                self._spawn(shard)
+    
+    def tick(self):
+        """Terima pengingat dari pekerja, periksa kesehatannya, lalu tunda/eskalasi seperti biasa"""
+        now = self.clock.now()
+        fired = self._drain()
+        self._supervise()
+        self._housekeeping(now, now.replace(second=0, microsecond=0))
+        return fired
+    
+    def status(self):
+        mono = self.clock.monotonic()
+        return [{
+            'wards': ward_label(shard['wards']),
+            'pid': shard['process'].pid if shard['process'] else None,
+            'alive': bool(shard['process'] and shard['process'].is_alive()),
+            'residents': shard['residents'],
+            'restarts': shard['restarts'],
+            'heartbeat_age': mono - shard['last_heartbeat'] if shard['last_heartbeat'] is not None else None,
+            'scanned_until': shard['scanned_until']
+        } for shard in self.shards]
+
+class VirtualClock:
+    """Jam virtual untuk simulasi: sleep() memajukan waktu tanpa benar-benar menunggu"""
+    
+    def __init__(self, start, utc_offset=datetime.timedelta(hours=7)):
+        self.current = start
+        self.mono = 0.0
+        self.offset = utc_offset
+    
+    def now(self):
+        return self.current
+    
+    def monotonic(self):
+        return self.mono
+    
+    def utc_offset(self):
+        return self.offset
+    
+    def sleep(self, seconds):
+        self.current += datetime.timedelta(seconds=seconds)
+        self.mono += seconds
+    
+    def jump(self, seconds):
+        """Lompatan jam dinding saja (suspend, jam diubah) tanpa menggerakkan monotonic"""
+        self.current += datetime.timedelta(seconds=seconds)
+
+class SimulatedSoundManager:
+    """Pengganti SoundManager yang hanya menghitung suara yang diputar"""
+    
+    def __init__(self):
+        self.sound_enabled = True
+        self.played = defaultdict(int)
+    
+    def play_sound(self, sound_name="reminder", volume=None, person=None, category=None, key=None, medicine=None):
+        self.played[sound_name] += 1
+        return True
+    
+    def stop_sound(self, key):
+        return False
+    
+    def get_available_sounds(self):
+        return ["reminder", "success"]
+
+SYNTHETIC_MEDICINES = [
+    ("Amlodipine", "5 mg"), ("Metformin", "500 mg"), ("Simvastatin", "20 mg"),
+    ("Captopril", "25 mg"), ("Paracetamol", "500 mg"), ("Omeprazole", "20 mg"),
+    ("Glimepiride", "2 mg"), ("Furosemide", "40 mg"), ("Aspirin", "80 mg"),
+    ("Allopurinol", "100 mg"), ("Vitamin B12", "1 tablet"), ("Kalsium", "1 tablet"),
+]
+
+SYNTHETIC_SCHEDULES = [
+    (["07:00"], None),
+    (["07:00", "19:00"], None),
+    (["06:00", "12:00", "18:00"], None),
+    (["08:00"], {'weekdays': [0, 2, 4]}),
+    (["09:00"], {'interval_days': 2}),
+    (["06:00"], {'interval_hours': 8}),
+    (["21:00"], None),
+]
+
+def generate_synthetic_facility(num_residents=200, seed=42, start_date=None, history_days=0):
+    """Data panti sintetis untuk simulasi dan benchmark (bisa dengan riwayat hari-hari sebelumnya)"""
+    rng = random.Random(seed)
+    start_date = start_date or datetime.date.today()
+    people = []
+    for index in range(num_residents):
+        person = ElderlyPerson(f"Lansia {index + 1:04d}", rng.randint(60, 95),
+                               rng.choice(["Hipertensi", "Diabetes", "Jantung", "Asam urat", ""]))
+        person.ward = f"Bangsal {chr(ord('A') + index % 4)}"
+        for name, dosage in rng.sample(SYNTHETIC_MEDICINES, rng.randint(1, 6)):
+            schedule, recurrence = rng.choice(SYNTHETIC_SCHEDULES)
+            if recurrence and 'interval_days' in recurrence:
+                recurrence = dict(recurrence, start_date=(start_date - datetime.timedelta(days=history_days)).isoformat())
+            medicine = Medicine(name, dosage, list(schedule), "", rng.random() < 0.5, True, "reminder",
+                                dict(recurrence) if recurrence else None)
+            
+            if history_days:
+                history_start = datetime.datetime.combine(start_date - datetime.timedelta(days=history_days),
+                                                          datetime.time(0, 0))
+                history_end = datetime.datetime.combine(start_date, datetime.time(0, 0))
+                for slot_dt in medicine.get_rule().occurrences_between(history_start, history_end):
+                    taken_at = slot_dt + datetime.timedelta(seconds=rng.randint(30, 1800))
+                    if rng.random() < 0.92:
+                        medicine.history.append({'time': slot_dt.strftime("%H:%M"),
+                                                 'timestamp': taken_at.isoformat()})
+                    else:
+                        medicine.history.append({'time': slot_dt.strftime("%H:%M"),
+                                                 'timestamp': taken_at.isoformat(),
+                                                 'status': 'missed', 'scheduled': slot_dt.isoformat()})
+            person.add_medicine(medicine)
+        people.append(person)
+    return people
+
+class ReminderSimulation:
+    """Menjalankan MedicineReminder dengan jam virtual dan sink palsu untuk uji skala yang bisa diulang"""
+    
+    def __init__(self, num_residents=200, days=30, seed=42, adherence=0.9, start=None,
+                 suspend_every_days=None, suspend_hours=2, suspend_at=datetime.time(6, 30)):
+        self.num_residents = num_residents
+        self.days = days
+        self.seed = seed
+        self.adherence = adherence
+        self.start = start or datetime.datetime(2026, 1, 1, 0, 0)
+        self.suspend_every_days = suspend_every_days
+        self.suspend_hours = suspend_hours
+        self.suspend_at = suspend_at  # jam mulai tidur; default menutupi jadwal pagi 07:00 dan 08:00
+        self.suspends = []  # (mulai tidur, bangun)
+        self.rng = random.Random(seed)
+        
+        self.clock = VirtualClock(self.start)
+        self.sound_manager = SimulatedSoundManager()
+        self.manager = ElderlyManager(data_file=None, sound_manager=self.sound_manager,
+                                      state_file=None, clock=self.clock, latency_file=None)
+        self.manager.elderly_people = generate_synthetic_facility(num_residents, seed, self.start.date())
+        self.manager.current_person = self.manager.elderly_people[0] if self.manager.elderly_people else None
+        self.manager.touch_schedules()
+        self.manager.missed_dose_tracker.notifier = self._on_nurse_notified
+        
+        self.reminder = MedicineReminder(self.manager, self._on_reminder, self._on_catch_up,
+                                         clock=self.clock, monitor_all=True)
+        self.fired = defaultdict(int)  # key jadwal -> berapa kali ditembakkan
+        self.first_fired = {}  # key jadwal -> waktu pertama ditembakkan
+        self.acknowledgements = []  # heap (waktu, urutan, lansia, nama obat, slot_dt)
+        self.nurse_notifications = 0
+        self.tick_costs = []
+    
+    def _on_reminder(self, medicine, slot_dt, person):
+        now = self.clock.now()
+        self.manager.latency_log.record_displayed(person.name, medicine.name, slot_dt, now)
+        key = ReminderStateStore.make_key(person.name, medicine.name, slot_dt)
+        self.fired[key] += 1
+        self.first_fired.setdefault(key, now)
+        if self.fired[key] == 1 and self.rng.random() < self.adherence:
+            delay = datetime.timedelta(seconds=self.rng.randint(30, 20 * 60))
+            heapq.heappush(self.acknowledgements, (now + delay, len(self.fired), person, medicine.name, slot_dt))
+    
+    def _on_catch_up(self, missed):
+        pass
+    
+    def _on_nurse_notified(self, event):
+        self.nurse_notifications += 1
+    
+    def _acknowledge_due(self):
+        now = self.clock.now()
+        while self.acknowledgements and self.acknowledgements[0][0] <= now:
+            _, _, person, medicine_name, slot_dt = heapq.heappop(self.acknowledgements)
+            self.manager.record_medicines_taken([(medicine_name, slot_dt.strftime("%H:%M"), slot_dt)], person)
+    
+    def expected_slots(self, end):
+        expected = set()
+        for person in self.manager.elderly_people:
+            for medicine in person.medicines:
+                for slot_dt in medicine.get_rule().occurrences_between(self.start, end):
+                    expected.add(ReminderStateStore.make_key(person.name, medicine.name, slot_dt))
+        return expected
+    
+    def check_suspends(self):
+        """Setiap jadwal yang jatuh saat PC tidur harus ditembakkan tepat sekali pada tick pertama setelah
+        bangun, dengan latensi = bangun - jadwal. Mengembalikan ringkasan dan daftar pelanggaran."""
+        slots = 0
+        failures = []
+        latencies = []
+        for asleep, resumed in self.suspends:
+            for person in self.manager.elderly_people:
+                for medicine in person.medicines:
+                    for slot_dt in medicine.get_rule().occurrences_between(asleep, resumed):
+                        slots += 1
+                        key = ReminderStateStore.make_key(person.name, medicine.name, slot_dt)
+                        expected_latency = (resumed - slot_dt).total_seconds()
+                        fired_at = self.first_fired.get(key)
+                        latency = (fired_at - slot_dt).total_seconds() if fired_at else None
+                        fired = self.fired.get(key, 0)
+                        if fired != 1 or latency != expected_latency:
+                            failures.append({'key': key, 'fired': fired, 'latency': latency,
+                                             'expected_latency': expected_latency})
+                        else:
+                            latencies.append(latency)
+        return {'suspends': len(self.suspends), 'slots': slots, 'failures': failures,
+                'latency_max_s': max(latencies, default=0.0)}
+    
+    def run(self):
+        end = self.start + datetime.timedelta(days=self.days)
+        next_suspend = None
+        if self.suspend_every_days:
+            next_suspend = datetime.datetime.combine(
+                self.start.date() + datetime.timedelta(days=self.suspend_every_days), self.suspend_at)
+        
+        wall_started = time.perf_counter()
+        self.reminder.scanned_until = self.start
+        while self.clock.now() < end:
+            self._acknowledge_due()
+            started = time.process_time()
+            self.reminder.tick()
+            self.tick_costs.append(time.process_time() - started)
+            
+            if next_suspend is not None and self.clock.now() >= next_suspend:
+                asleep = self.clock.now()
+                self.clock.jump(self.suspend_hours * 3600)
+                self.suspends.append((asleep, self.clock.now()))
+                next_suspend += datetime.timedelta(days=self.suspend_every_days)
+            else:
+                self.clock.sleep(self.reminder.tick_seconds)
+        wall_elapsed = time.perf_counter() - wall_started
+        
+        last_checked = self.reminder.scanned_until
+        expected = self.expected_slots(last_checked)
+        missed_records = sum(
+            1 for person in self.manager.elderly_people for medicine in person.medicines
+            for record in medicine.history if record.get('status') == 'missed'
+        )
+        costs = sorted(self.tick_costs)
+        suspend_check = self.check_suspends()
+        fire_latencies = sorted(
+            value for value in (ReminderLatencyLog.latency(r, 'fire') for r in self.manager.latency_log.records)
+            if value is not None
+        )
+        
+        return {
+            'residents': self.num_residents,
+            'medicines': sum(len(p.medicines) for p in self.manager.elderly_people),
+            'days': self.days,
+            'ticks': len(costs),
+            'expected_slots': len(expected),
+            'reminders_fired': sum(self.fired.values()),
+            'duplicates': sum(count - 1 for count in self.fired.values() if count > 1),
+            'not_fired': len(expected - set(self.fired)),
+            'unexpected': len(set(self.fired) - expected),
+            'missed_dose_records': missed_records,
+            'nurse_notifications': self.nurse_notifications,
+            'clock_events': len(self.reminder.clock_events),
+            'suspends': suspend_check['suspends'],
+            'suspend_slots': suspend_check['slots'],
+            'suspend_failures': len(suspend_check['failures']),
+            'suspend_latency_max_s': suspend_check['latency_max_s'],
+            'tick_cpu_mean_ms': sum(costs) / len(costs) * 1000 if costs else 0.0,
+            'tick_cpu_p95_ms': (percentile(costs, 0.95) or 0.0) * 1000,
+            'tick_cpu_max_ms': (costs[-1] if costs else 0.0) * 1000,
+            'fire_latency_p50_s': percentile(fire_latencies, 0.50) or 0.0,
+            'fire_latency_p99_s': percentile(fire_latencies, 0.99) or 0.0,
+            'late_slots_over_60s': len(self.manager.latency_log.late_slots(60)),
+            'wall_seconds': wall_elapsed
+        }
+
+def print_report(title, report):
+    print(title)
+    for key, value in report.items():
+        if isinstance(value, float):
+            print(f"  {key:<24} {value:.3f}")
+        else:
+            print(f"  {key:<24} {value}")
+
+class TkAfterTracker:
+    """Mencatat setiap id after milik satu komponen agar semuanya bisa dibatalkan saat komponen ditutup"""
+    
+    def __init__(self, widget):
+        self.widget = widget
+        self.ids = set()
+    
+    def schedule(self, delay_ms, callback):
+        after_id = None
+        
+        def run():
+            self.ids.discard(after_id)
+            callback()
+        
+        after_id = self.widget.after(delay_ms, run)
+        self.ids.add(after_id)
+        return after_id
+    
+    def cancel(self, after_id):
+        if after_id not in self.ids:
+            return
+        self.ids.discard(after_id)
+        try:
+            self.widget.after_cancel(after_id)
+        except tk.TclError:
+            pass
+    
+    def cancel_all(self):
+        for after_id in list(self.ids):
+            self.cancel(after_id)
+    
+    def pending(self):
+        return len(self.ids)
+
+class ReminderBatchWindow:
+    """Satu jendela pengingat per lansia yang menggabungkan semua dosis yang jatuh tempo.
+    Dipinjam dari ReminderWindowPool; baris checklist yang selesai disimpan untuk dipakai ulang."""
+    MAX_FREE_ROWS = 8
+    
+    def __init__(self, pool):
+        self.pool = pool
+        self.gui = pool.gui
+        self.person = None
+        self.window = None
+        self.list_frame = None
+        self.title_label = None
+        self.person_label = None
+        self.items = {}  # (nama obat, "HH:MM") -> data baris checklist
+        self.free_rows = []  # (Checkbutton, BooleanVar) yang disembunyikan, siap dipakai ulang
+        self.timers = TkAfterTracker(self.gui.root)
+        self.sound_after_id = None
+        self.sound_name = None  # diganti oleh tahap eskalasi
+        self.sound_volume = None
+    
+    def bind(self, person):
+        self.person = person
+        if self.person_label is not None:
+            self.person_label.config(text=self._person_text())
+    
+    def _person_text(self):
+        return f"Untuk: {self.person.name}" if self.person and self.person.name else ""
+    
+    def exists(self):
+        return self.window is not None and self.window.winfo_exists()
+    
+    def is_open(self):
+        return self.exists() and self.window.winfo_viewable()
+    
+    def _ensure_window(self):
+        if self.exists():
+            self.window.deiconify()
+            self.window.lift()
+            return
+        
+        self.window = tk.Toplevel(self.gui.root)
+        self.window.title("⏰ PENGINGAT OBAT! 🔊")
+        self.window.geometry("420x320")
+        self.window.configure(bg=COLORS['warning'])
+        self.window.attributes('-topmost', True)
+        self.window.transient(self.gui.root)
+        self.window.protocol("WM_DELETE_WINDOW", self.snooze)
+        
+        self.title_label = ttk.Label(self.window, text="⏰ WAKTU MINUM OBAT! 🔊",
+                                     font=('Arial', 14, 'bold'), background=COLORS['warning'])
+        self.title_label.pack(pady=5)
+        
+        self.person_label = ttk.Label(self.window, text=self._person_text(),
+                                      font=('Arial', 11, 'italic'), background=COLORS['warning'])
+        self.person_label.pack(pady=2)
+        
+        self.list_frame = tk.Frame(self.window, bg=COLORS['warning'])
+        self.list_frame.pack(fill=tk.BOTH, expand=True, padx=15, pady=5)
+        self.free_rows = []
+        
+        btn_frame = ttk.Frame(self.window)
+        btn_frame.pack(pady=10)
+        
+        ttk.Button(btn_frame, text="✓ Semua Sudah Diminum",
+                   command=self.mark_all_taken, style='Success.TButton').pack(side=tk.LEFT, padx=3)
+        ttk.Button(btn_frame, text="✓ Yang Dicentang",
+                   command=self.mark_selected_taken, style='Primary.TButton').pack(side=tk.LEFT, padx=3)
+        ttk.Button(btn_frame, text="⏰ Tunda 5 menit",
+                   command=self.snooze, style='Primary.TButton').pack(side=tk.LEFT, padx=3)
+    
+    def add_dose(self, medicine, slot_dt):
+        """Tambahkan satu dosis; baris dikunci per tanggal-jam jadwal sehingga dosis hari berbeda tidak tergabung"""
+        key = (medicine.name, slot_dt)
+        if key in self.items:
+            return
+        self._ensure_window()
+        
+        now = self.gui.manager.clock.now()
+        slot_text = slot_dt.strftime("%H:%M") if slot_dt.date() == now.date() else slot_dt.strftime("%d/%m %H:%M")
+        text = f"{slot_text}  {medicine.name} - {medicine.dosage}"
+        if medicine.with_food:
+            text += " (setelah makan)"
+        if self.free_rows:
+            row, var = self.free_rows.pop()
+            row.config(text=text, state=tk.NORMAL)
+            var.set(True)
+        else:
+            var = tk.BooleanVar(value=True)
+            row = tk.Checkbutton(self.list_frame, text=text, variable=var, anchor='w',
+                                 bg=COLORS['warning'], font=('Arial', 11))
+            self.pool.rows_created += 1
+        row.pack(fill=tk.X, pady=1)
+        self.items[key] = {'medicine': medicine, 'slot_dt': slot_dt, 'var': var, 'row': row, 'status': 'pending'}
+        
+        self.gui.manager.latency_log.record_displayed(self.person.name, medicine.name, slot_dt, now)
+        
+        if self.sound_after_id is None:
+            self._play_sound_loop()
+    
+    def pending_items(self):
+        return [item for item in self.items.values() if item['status'] == 'pending']
+    
+    def _play_sound_loop(self):
+        self.sound_after_id = None
+        pending = [item for item in self.pending_items() if item['medicine'].sound_enabled]
+        if not pending or not self.is_open():
+            return
+        
+        sound_manager = self.gui.manager.sound_manager
+        if sound_manager.sound_enabled:
+            sound_manager.play_sound(self.sound_name or pending[0]['medicine'].custom_sound,
+                                     volume=self.sound_volume, person=self.person,
+                                     key=SoundManager.reminder_key(self.person),
+                                     medicine=pending[0]['medicine'])
+        self.sound_after_id = self.timers.schedule(5000, self._play_sound_loop)
+    
+    def _stop_sound_loop(self):
+        self.timers.cancel(self.sound_after_id)
+        self.sound_after_id = None
+        self.gui.manager.sound_manager.stop_sound(SoundManager.reminder_key(self.person))
+    
+    def _release_row(self, item):
+        """Sembunyikan baris untuk dipakai ulang; data obat di baris itu ikut dilepas"""
+        if len(self.free_rows) < self.MAX_FREE_ROWS:
+            item['row'].pack_forget()
+            self.free_rows.append((item['row'], item['var']))
+        else:
+            item['row'].destroy()
+    
+    def _finish(self, items):
+        for item in items:
+            self._release_row(item)
+            del self.items[(item['medicine'].name, item['slot_dt'])]
+        
+        if not self.pending_items():
+            self.close()
+    
+    def close(self):
+        """Sembunyikan jendela dan kembalikan ke pool (tanpa mencatat apa pun untuk dosis yang tersisa)"""
+        self._stop_sound_loop()
+        for item in self.items.values():
+            self._release_row(item)
+        self.items.clear()
+        self.sound_name = None
+        self.sound_volume = None
+        if self.exists():
+            self.title_label.config(text="⏰ WAKTU MINUM OBAT! 🔊")
+            self.window.configure(bg=COLORS['warning'])
+            self.window.withdraw()
+        self.pool.release(self)
+    
+    def destroy(self):
+        """Tutup permanen: batalkan semua after dan lepaskan widget serta referensi data"""
+        self.timers.cancel_all()
+        self.sound_after_id = None
+        if self.exists():
+            self.window.destroy()
+        self.window = self.list_frame = self.title_label = self.person_label = None
+        self.items.clear()
+        self.free_rows = []
+        self.person = None
+    
+    def _record_taken(self, items):
+        if items:
+            doses = [(item['medicine'].name, item['slot_dt'].strftime("%H:%M"), item['slot_dt']) for item in items]
+            self.gui.manager.record_medicines_taken(doses, self.person)
+        self._finish(items)
+    
+    def mark_all_taken(self):
+        self._record_taken(self.pending_items())
+    
+    def mark_selected_taken(self):
+        self._record_taken([item for item in self.pending_items() if item['var'].get()])
+    
+    def snooze(self):
+        """Tunda 5 menit; disimpan ke reminder_state sehingga tetap berlaku setelah restart"""
+        now = self.gui.manager.clock.now()
+        state = self.gui.manager.reminder_state
+        for item in self.pending_items():
+            state.add_snooze(self.person.name, item['medicine'].name, item['slot_dt'],
+                             now + datetime.timedelta(minutes=5))
+        self._finish(list(self.items.values()))
+    
+    def apply_escalation(self, event):
+        item = self.items.get((event['medicine'], event.get('slot_dt')))
+        if event['action'] == 'sound':
+            self.sound_name = event['config'].get('sound', self.sound_name)
+            self.sound_volume = event['config'].get('volume')
+            self.window.configure(bg=COLORS['danger'])
+        elif event['action'] == 'notify':
+            self.title_label.config(text="⚠ PERAWAT TELAH DIBERITAHU")
+        elif event['action'] == 'missed' and item is not None:
+            item['status'] = 'missed'
+            item['var'].set(False)
+            item['row'].config(text=item['row'].cget('text') + "  ✗ terlewat", state=tk.DISABLED)
+            if not self.pending_items():
+                self._finish([])
+
+class ReminderWindowPool:
+    """Pool jendela pengingat: jendela yang selesai disembunyikan lalu dipinjamkan ke lansia berikutnya,
+    sehingga jumlah Toplevel tidak bertambah seiring jumlah lansia maupun lamanya aplikasi berjalan"""
+    MAX_IDLE = 6
+    
+    def __init__(self, gui, max_idle=None):
+        self.gui = gui
+        self.max_idle = self.MAX_IDLE if max_idle is None else max_idle
+        self.active = {}  # nama lansia -> ReminderBatchWindow yang sedang dipakai
+        self.idle = []
+        self.windows_created = 0
+        self.windows_reused = 0
+        self.rows_created = 0
+    
+    def window_for(self, person):
+        key = person.name if person else ""
+        batch_window = self.active.get(key)
+        if batch_window is None:
+            if self.idle:
+                batch_window = self.idle.pop()
+                self.windows_reused += 1
+            else:
+                batch_window = ReminderBatchWindow(self)
+                self.windows_created += 1
+            batch_window.bind(person)
+            self.active[key] = batch_window
+        return batch_window
+    
+    def get(self, person_name):
+        return self.active.get(person_name)
+    
+    def release(self, batch_window):
+        """Dipanggil jendela saat semua dosisnya selesai"""
+        key = batch_window.person.name if batch_window.person else ""
+        if self.active.get(key) is batch_window:
+            del self.active[key]
+        batch_window.bind(None)
+        if batch_window in self.idle:
+            return
+        if len(self.idle) < self.max_idle and batch_window.exists():
+            self.idle.append(batch_window)
+        else:
+            batch_window.destroy()
+    
+    def discard(self, person_name):
+        """Tutup jendela lansia yang dihapus agar objeknya tidak tertahan"""
+        batch_window = self.active.get(person_name)
+        if batch_window is not None:
+            batch_window.close()
+    
+    def close_all(self):
+        for batch_window in list(self.active.values()) + self.idle:
+            batch_window.destroy()
+        self.active.clear()
+        self.idle.clear()
+    
+    def stats(self):
+        windows = list(self.active.values()) + self.idle
+        return {
+            'active': len(self.active),
+            'idle': len(self.idle),
+            'windows_created': self.windows_created,
+            'windows_reused': self.windows_reused,
+            'rows_created': self.rows_created,
+            'pending_after': sum(w.timers.pending() for w in windows)
+        }
+
+class ReminderWindowSoakTest:
+    """Uji ketahanan jendela pengingat: siklus tampil/centang/tunda/eskalasi selama beberapa hari virtual,
+    dengan memori Python (tracemalloc), jumlah widget Tk, dan antrean after diukur di akhir tiap hari"""
+    TICK_MINUTES = 5
+    GROWTH_LIMIT_KB = 64  # pertumbuhan memori per hari yang masih dianggap datar
+    
+    def __init__(self, days=7, num_residents=30, seed=42, start=None):
+        self.days = days
+        self.num_residents = num_residents
+        self.rng = random.Random(seed)
+        self.start = start or datetime.datetime(2026, 1, 1, 0, 0)
+        self.clock = VirtualClock(self.start)
+        self.manager = ElderlyManager(data_file=None, sound_manager=SimulatedSoundManager(),
+                                      state_file=None, clock=self.clock, latency_file=None)
+        self.manager.elderly_people = generate_synthetic_facility(num_residents, seed, self.start.date())
+        self.people_by_name = {person.name: person for person in self.manager.elderly_people}
+        self.root = None
+        self.reminder_pool = None
+    
+    def _count_widgets(self, widget):
+        return sum(1 + self._count_widgets(child) for child in widget.winfo_children())
+    
+    def _sample(self, day):
+        gc.collect()
+        current, _ = tracemalloc.get_traced_memory()
+        pooled = list(self.reminder_pool.active.values()) + self.reminder_pool.idle
+        widgets = self._count_widgets(self.root)
+        sample = {
+            'day': day,
+            'memory_kb': current / 1024,
+            'widgets': widgets,
+            'orphan_widgets': widgets - sum(1 + self._count_widgets(w.window) for w in pooled if w.exists()),
+            'tk_after': len(self.root.tk.splitlist(self.root.tk.call('after', 'info')))
+        }
+        sample.update(self.reminder_pool.stats())
+        return sample
+    
+    def _show_due(self, due, now):
+        while due and due[0][0] <= now:
+            _, _, person_name, medicine_name, slot_dt = heapq.heappop(due)
+            person = self.people_by_name[person_name]
+            medicine = next((m for m in person.medicines if m.name == medicine_name), None)
+            if medicine is not None:
+                self.reminder_pool.window_for(person).add_dose(medicine, slot_dt)
+        for entry in self.manager.reminder_state.pop_due_snoozes(now):
+            heapq.heappush(due, (now, len(due), entry['person'], entry['medicine'], entry['slot_dt']))
+    
+    def _act(self, batch_window):
+        """Tindakan perawat acak pada satu jendela yang terbuka"""
+        roll = self.rng.random()
+        pending = batch_window.pending_items()
+        if roll < 0.35 or not pending:
+            return  # belum ditanggapi
+        if roll < 0.65:
+            batch_window.mark_all_taken()
+        elif roll < 0.75:
+            for item in pending:
+                item['var'].set(self.rng.random() < 0.5)
+            batch_window.mark_selected_taken()
+        elif roll < 0.85:
+            batch_window.snooze()
+        else:
+            base = {'person': batch_window.person.name, 'config': {'sound': 'reminder', 'volume': 1.0}}
+            batch_window.apply_escalation(dict(base, action='sound', medicine=None, slot_dt=None))
+            batch_window.apply_escalation(dict(base, action='notify', medicine=None, slot_dt=None))
+            for item in pending:
+                batch_window.apply_escalation(dict(base, action='missed',
+                                                   medicine=item['medicine'].name, slot_dt=item['slot_dt']))
     
-    def add_custom_sound(self, file_path, sound_name):
-        return self.sound_manager.add_custom_sound(file_path, sound_name)
+    def _trim_data(self):
+        """Riwayat dan log latensi memang bertambah; dibuang tiap hari agar yang diukur hanya siklus jendela"""
+        for person in self.manager.elderly_people:
+            for medicine in person.medicines:
+                medicine.history.clear()
+        with self.manager.latency_log.lock:
+            self.manager.latency_log.records.clear()
+            self.manager.latency_log.index.clear()
+        self.manager.commands.undo_stack.clear()
+        self.manager.commands.redo_stack.clear()
     
-    def get_available_sounds(self):
-        return self.sound_manager.get_available_sounds()
+    def _run_day(self):
+        now = self.clock.now()
+        end = now + datetime.timedelta(days=1)
+        due = []
+        for person in self.manager.elderly_people:
+            for medicine in person.medicines:
+                for slot_dt in medicine.get_rule().occurrences_between(now, end):
+                    due.append((slot_dt, len(due), person.name, medicine.name, slot_dt))
+        heapq.heapify(due)
+        
+        while self.clock.now() < end:
+            self._show_due(due, self.clock.now())
+            for batch_window in list(self.reminder_pool.active.values()):
+                self._act(batch_window)
+            self.root.update()
+            self.clock.sleep(self.TICK_MINUTES * 60)
+        # pergantian shift: semua jendela ditanggapi sehingga pengukuran tidak bergantung pada jendela yang terbuka
+        for batch_window in list(self.reminder_pool.active.values()):
+            batch_window.mark_all_taken()
+        self.root.update()
+        self._trim_data()
     
-    def get_medicine_names(self):
-        if self.current_person:
-            return self.current_person.get_medicine_names()
-        return []
+    def run(self):
+        tracemalloc.start()
+        self.root = tk.Tk()
+        self.root.withdraw()
+        self.reminder_pool = ReminderWindowPool(self)
+        try:
+            self.root.update()
+            samples = [self._sample(0)]
+            for day in range(1, self.days + 1):
+                self._run_day()
+                samples.append(self._sample(day))
+        finally:
+            self.reminder_pool.close_all()
+            self.root.destroy()
+            tracemalloc.stop()
+        return samples
     
-    def get_medicine_suggestions(self, medicine_name):
-        if self.current_person:
-            return self.current_person.get_medicine_suggestions(medicine_name)
-        return []
+    @classmethod
+    def is_flat(cls, samples):
+        """Datar bila setelah hari pertama (pemanasan) memori tumbuh di bawah batas per hari, semua widget
+        milik jendela di pool, dan tidak ada after yang tertinggal di akhir hari"""
+        if len(samples) < 3:
+            return True
+        baseline, last = samples[1], samples[-1]
+        growth_per_day = (last['memory_kb'] - baseline['memory_kb']) / (last['day'] - baseline['day'])
+        return (growth_per_day < cls.GROWTH_LIMIT_KB
+                and all(s['orphan_widgets'] == 0 and s['tk_after'] == 0 and s['pending_after'] == 0
+                        for s in samples[1:]))
 
-class MedicineReminder:
-    def __init__(self, medicine_manager, gui_callback):
-        self.medicine_manager = medicine_manager
-        self.gui_callback = gui_callback
-        self.running = False
-        self.reminder_thread = None
-        self.pending_reminders = {}
+class TkEventDispatcher:
+    """Mengantar event manager (dari thread mana pun) ke thread Tk lewat satu antrean after"""
+    DRAIN_DELAY_MS = 50
     
-    def start(self):
-        self.running = True
-        self.reminder_thread = threading.Thread(target=self._check_reminders)
-        self.reminder_thread.daemon = True
-        self.reminder_thread.start()
+    def __init__(self, root, handler):
+        self.root = root
+        self.handler = handler  # dipanggil di thread Tk dengan daftar event
+        self.queue = deque()
+        self.lock = threading.Lock()
+        self.drain_scheduled = False
     
-    def stop(self):
-        self.running = False
+    def __call__(self, event):
+        with self.lock:
+            self.queue.append(event)
+            if self.drain_scheduled:
+                return
+            self.drain_scheduled = True
+        self.root.after(self.DRAIN_DELAY_MS, self.drain)
     
-    def _check_reminders(self):
-        while self.running:
-            try:
-                now = datetime.datetime.now()
-                current_time = now.strftime("%H:%M")
-                current_date = now.strftime("%Y-%m-%d")
-                
-                if self.medicine_manager.current_person:
-                    for medicine in self.medicine_manager.current_person.medicines:
-                        if current_time in medicine.schedule:
-                            reminder_key = f"{medicine.name}_{current_time}_{current_date}"
-                            
-                            taken_today = any(
-                                record['time'] == current_time and 
-                                record['timestamp'].startswith(current_date)
-                                for record in medicine.history
-                            )
-                            
-                            reminder_shown = reminder_key in self.pending_reminders
-                            
-                            if not taken_today and not reminder_shown:
-                                if medicine.sound_enabled:
-                                    self.medicine_manager.sound_manager.play_sound(medicine.custom_sound)
-                                
-                                self.pending_reminders[reminder_key] = now
-                                self.gui_callback(medicine, current_time)
-                
-                one_day_ago = now - datetime.timedelta(days=1)
-                self.pending_reminders = {
-                    k: v for k, v in self.pending_reminders.items() 
-                    if v > one_day_ago
-                }
-                
-            except:
-                pass
-            
-            time.sleep(30)
+    def drain(self):
+        with self.lock:
+            events = list(self.queue)
+            self.queue.clear()
+            self.drain_scheduled = False
+        if events:
+            self.handler(events)
 
 class MedicineGUI:
-    def __init__(self, root):
+    LOW_STOCK_DAYS = 7  # batas peringatan stok hampir habis
+    SYNC_INTERVAL_MS = 30000
+    FILE_WATCH_MS = 2000
+    BACKUP_INTERVAL_MS = 30 * 60 * 1000
+    UPCOMING_REFRESH_MS = 60000
+    UPCOMING_HOURS = 4
+    
+    def __init__(self, root, sync_options=None, reminder_workers=None):
         self.root = root
         self.root.title("💊 Manajemen Obat Lansia (Yuda(164), Danies(195), Fakih(133))")
         self.root.geometry("1100x750")
         self.root.configure(bg=COLORS['bg'])
         
         self.manager = ElderlyManager()
-        self.reminder = MedicineReminder(self.manager, self.show_reminder)
+        if reminder_workers:
+            self.reminder = ShardedMedicineReminder(self.manager, self.show_reminder, self.show_missed_doses,
+                                                    workers=reminder_workers)
+        else:
+            self.reminder = MedicineReminder(self.manager, self.show_reminder, self.show_missed_doses)
+        self.reminder_pool = ReminderWindowPool(self)
+        self.manager.missed_dose_tracker.escalation_listeners.append(self.on_reminder_escalated)
+        
+        # Baris Treeview dicatat per obat/slot supaya event cukup menambal baris yang terdampak
+        self.medicine_items = {}  # Medicine -> iid di medicines_tree
+        self.history_items = {}  # Medicine -> [iid catatan di history_tree]
+        self.upcoming_items = {}  # (slot, nama lansia, nama obat) -> (iid, values, tags)
+        self.upcoming_keys = []  # kunci upcoming_items, urut seperti di upcoming_tree
+        self.elderly_names = []
         
         self.setup_styles()
         self.create_gui()
+        self.event_dispatcher = TkEventDispatcher(self.root, self.on_manager_events)
+        self.manager.events.subscribe(None, self.event_dispatcher)
         self.reminder.start()
         
+        self.root.after(self.FILE_WATCH_MS, self.watch_data_file)
+        self.root.after(self.FILE_WATCH_MS, self.run_backup)
+        
+        self.sync_options = sync_options or {}
+        if self.sync_options:
+            sync = StationSync(self.manager, station_id=self.sync_options.get('station'),
+                               shared_dir=self.sync_options.get('shared_dir'), secret=self.sync_options.get('secret'))
+            if self.sync_options.get('port'):
+                sync.serve(self.sync_options['port'], self.sync_options.get('host') or "127.0.0.1")
+            self.root.after(1000, self.run_sync)
+        
+        if self.manager.recovery is not None:
+            self.ask_recovery()
         self.load_initial_data()
+        self.run_upcoming_refresh()
+    
+    def ask_recovery(self):
+        """File data rusak: tanyakan data mana yang dipakai sebelum file ditimpa"""
+        options = self.manager.recovery['options']
+        lines = ["File data rusak. Data yang tersedia:"]
+        if 'salvage' in options:
+            lines.append(f"• Hasil penyelamatan: {format_salvage_report(options['salvage']['report'])}")
+        if 'backup' in options:
+            manifest = options['backup']['manifest']
+            lines.append(f"• Backup {manifest['id']}: {self.format_data_size(options['backup']['size'])}")
+        text = "\n".join(lines)
+        kept = f"\n\nFile asli disimpan sebagai {self.manager.data_file}.rusak."
+        
+        if 'salvage' in options and 'backup' in options:
+            recommended = "backup" if self.manager.recovery['recommended'] == 'backup' else "hasil penyelamatan"
+            answer = messagebox.askyesnocancel(
+                "Data Rusak", f"{text}\n\nData terbanyak: {recommended}.\n"
+                "Ya = pakai backup, Tidak = pakai hasil penyelamatan, "
+                f"Batal = jangan simpan apa pun sesi ini.{kept}")
+            choice = None if answer is None else ('backup' if answer else 'salvage')
+        elif options:
+            choice = next(iter(options))
+            if not messagebox.askyesno("Data Rusak", f"{text}\n\nSimpan data ini ke file data?{kept}"):
+                choice = None
+        else:
+            if messagebox.askyesno("Data Rusak", "File data rusak dan tidak ada data maupun backup yang bisa "
+                                   f"dipulihkan.\n\nMulai dengan data kosong?{kept}"):
+                self.manager.confirm_recovery(None)
+            return
+        
+        if choice is None:
+            messagebox.showwarning("Data Rusak", "File data tidak diubah. Perubahan selama sesi ini tidak "
+                                   "disimpan; buka ulang aplikasi untuk memulihkan.")
+            return
+        self.manager.confirm_recovery(choice)
+    
+    @staticmethod
+    def format_data_size(size):
+        return f"{size['people']} lansia, {size['medicines']} obat, {size['history']} riwayat"
+    
+    def watch_data_file(self):
+        """Memuat perubahan yang disimpan aplikasi lain pada file data yang sama"""
+        self.manager.check_external_changes()
+        self.root.after(self.FILE_WATCH_MS, self.watch_data_file)
+    
+    def run_backup(self):
+        """Backup berkala di latar belakang (saat mulai lalu tiap 30 menit)"""
+        threading.Thread(target=self.manager.backup_data, daemon=True).start()
+        self.root.after(self.BACKUP_INTERVAL_MS, self.run_backup)
+    
+    def run_sync(self):
+        """Sinkronisasi berkala dengan stasiun lain (di thread Tk agar data tidak diubah bersamaan)"""
+        sync = self.manager.sync
+        try:
+            sync.process_inbox()
+            sync.sync_directory()
+        except Exception as e:
+            print(f"Error sync folder: {e}")
+        for host, port in self.sync_options.get('peers', []):
+            try:
+                sync.sync_peer(host, port, timeout=1)
+            except Exception as e:
+                print(f"Error sync peer {host}:{port}: {e}")
+        self.root.after(self.SYNC_INTERVAL_MS, self.run_sync)
     
     def setup_styles(self):
         style = ttk.Style()
@@ -553,6 +6018,14 @@ class MedicineGUI:
         self.sound_btn.pack(side=tk.LEFT, padx=2)
         ttk.Button(sound_frame, text="Test Sound", 
                   command=self.test_sound, style='Accent.TButton').pack(side=tk.LEFT, padx=2)
+        ttk.Button(sound_frame, text="📈 Latensi", 
+                  command=self.show_latency_report, style='Primary.TButton').pack(side=tk.LEFT, padx=2)
+        ttk.Button(sound_frame, text="↶ Urungkan", 
+                  command=self.undo, style='Accent.TButton').pack(side=tk.LEFT, padx=2)
+        ttk.Button(sound_frame, text="↷ Ulangi", 
+                  command=self.redo, style='Accent.TButton').pack(side=tk.LEFT, padx=2)
+        self.root.bind_all("<Control-z>", lambda e: self.undo())
+        self.root.bind_all("<Control-y>", lambda e: self.redo())
         
         # Left Panel (Info & Add Medicine)
         left_panel = ttk.Frame(main_container, style='Custom.TFrame')
@@ -593,6 +6066,23 @@ class MedicineGUI:
         ttk.Button(info_card, text="Simpan Info", 
                   command=self.save_person_info, style='Primary.TButton').grid(row=2, column=4, pady=3)
         
+        ttk.Label(info_card, text="Volume (%):").grid(row=3, column=0, sticky=tk.W, pady=3)
+        self.volume_var = tk.StringVar(value="100")
+        self.volume_spin = ttk.Spinbox(info_card, from_=0, to=100, increment=10,
+                                       textvariable=self.volume_var, width=6)
+        self.volume_spin.grid(row=3, column=1, sticky=tk.W, pady=3, padx=(5, 0))
+        
+        ttk.Label(info_card, text="Bahasa:").grid(row=3, column=3, sticky=tk.W, pady=3)
+        self.language_var = tk.StringVar(value=VoicePromptEngine.LANGUAGES[0])
+        self.language_combo = ttk.Combobox(info_card, textvariable=self.language_var, width=5,
+                                           values=VoicePromptEngine.LANGUAGES, state="readonly")
+        self.language_combo.grid(row=3, column=4, sticky=tk.W, pady=3)
+        
+        ttk.Label(info_card, text="Bangsal:").grid(row=4, column=0, sticky=tk.W, pady=3)
+        self.ward_var = tk.StringVar()
+        self.ward_entry = ttk.Entry(info_card, textvariable=self.ward_var, width=25, style='Custom.TEntry')
+        self.ward_entry.grid(row=4, column=1, sticky=(tk.W, tk.E), pady=3, padx=(5, 10), columnspan=2)
+        
         # Add Medicine Card
         medicine_card = ttk.Frame(left_panel, padding="15", style='Card.TFrame', relief='ridge', borderwidth=1)
         medicine_card.grid(row=1, column=0, sticky=(tk.W, tk.E), pady=(0, 10))
@@ -619,6 +6109,7 @@ class MedicineGUI:
             ("Dosis:", "dosage_entry", 25),
             ("Jadwal (contoh: 08:00,12:00):", "schedule_entry", 25),
             ("Keterangan:", "desc_entry", 25),
+            ("Pengulangan (opsional):", "recurrence_entry", 25),
         ]
         
         for i, (label, attr_name, width) in enumerate(fields, 2):
@@ -628,20 +6119,23 @@ class MedicineGUI:
             setattr(self, attr_name, entry)
         
         # Sound selection
-        ttk.Label(medicine_card, text="Suara Notifikasi:").grid(row=5, column=0, sticky=tk.W, pady=3)
+        ttk.Label(medicine_card, text="contoh: hari=Sen,Rab,Jum; selama=10; setiap=2; tiap_jam=8",
+                 font=('Arial', 8), foreground=COLORS['text_light']).grid(row=6, column=0, columnspan=3, sticky=tk.W)
+        
+        ttk.Label(medicine_card, text="Suara Notifikasi:").grid(row=7, column=0, sticky=tk.W, pady=3)
         self.sound_combobox = ttk.Combobox(medicine_card, width=23, state="readonly", style='Custom.TCombobox')
-        self.sound_combobox.grid(row=5, column=1, sticky=(tk.W, tk.E), pady=3, padx=(5, 0))
+        self.sound_combobox.grid(row=7, column=1, sticky=(tk.W, tk.E), pady=3, padx=(5, 0))
         
         self.with_food_var = tk.BooleanVar(value=True)
         ttk.Checkbutton(medicine_card, text="Diminum setelah makan", 
-                       variable=self.with_food_var).grid(row=6, column=0, columnspan=2, sticky=tk.W, pady=3)
+                       variable=self.with_food_var).grid(row=8, column=0, columnspan=2, sticky=tk.W, pady=3)
         
         self.sound_enabled_var = tk.BooleanVar(value=True)
         ttk.Checkbutton(medicine_card, text="Aktifkan notifikasi suara", 
-                       variable=self.sound_enabled_var).grid(row=7, column=0, columnspan=2, sticky=tk.W, pady=3)
+                       variable=self.sound_enabled_var).grid(row=9, column=0, columnspan=2, sticky=tk.W, pady=3)
         
         ttk.Button(medicine_card, text="Tambah Obat", 
-                  command=self.add_medicine, style='Success.TButton').grid(row=8, column=0, columnspan=3, pady=10)
+                  command=self.add_medicine, style='Success.TButton').grid(row=10, column=0, columnspan=3, pady=10)
         
         # Sound Management Card
         sound_card = ttk.Frame(left_panel, padding="15", style='Card.TFrame', relief='ridge', borderwidth=1)
@@ -702,12 +6196,13 @@ class MedicineGUI:
         
         ttk.Label(list_card, text="📋 Daftar Obat", style='Header.TLabel').grid(row=0, column=0, sticky=tk.W, pady=(0, 10))
         
-        columns = ('Nama', 'Dosis', 'Jadwal', 'Suara', 'Status')
+        columns = ('Nama', 'Dosis', 'Jadwal', 'Suara', 'Status', 'Stok')
         self.medicines_tree = ttk.Treeview(list_card, columns=columns, show='headings', height=8)
         
         for col in columns:
             self.medicines_tree.heading(col, text=col)
             self.medicines_tree.column(col, width=120 if col != 'Jadwal' else 150)
+        self.medicines_tree.tag_configure('low_stock', foreground=COLORS['danger'])
         
         self.medicines_tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
         
@@ -727,6 +6222,18 @@ class MedicineGUI:
         ttk.Button(btn_frame, text="Ubah Suara", 
                   command=self.change_medicine_sound, style='Primary.TButton').pack(side=tk.LEFT, padx=2)
         
+        ttk.Button(btn_frame, text="🧮 Gabungkan Jadwal", 
+                  command=self.show_schedule_optimizer, style='Primary.TButton').pack(side=tk.LEFT, padx=2)
+        
+        ttk.Button(btn_frame, text="💊 Stok", 
+                  command=self.show_stock_dialog, style='Primary.TButton').pack(side=tk.LEFT, padx=2)
+        
+        ttk.Button(btn_frame, text="📅 Kalender", 
+                  command=self.export_calendars, style='Primary.TButton').pack(side=tk.LEFT, padx=2)
+        
+        ttk.Button(btn_frame, text="⚠ Interaksi", 
+                  command=self.show_interaction_audit, style='Primary.TButton').pack(side=tk.LEFT, padx=2)
+        
         # History Card
         history_card = ttk.Frame(right_panel, padding="15", style='Card.TFrame', relief='ridge', borderwidth=1)
         history_card.grid(row=2, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
@@ -751,6 +6258,87 @@ class MedicineGUI:
         
         ttk.Button(history_card, text="Refresh Riwayat", 
                   command=self.refresh_history, style='Primary.TButton').grid(row=2, column=0, pady=(10, 0))
+        
+        # Upcoming Doses Card (semua lansia)
+        upcoming_card = ttk.Frame(main_container, padding="15", style='Card.TFrame', relief='ridge', borderwidth=1)
+        upcoming_card.grid(row=1, column=2, sticky=(tk.W, tk.E, tk.N, tk.S), padx=(10, 0))
+        upcoming_card.rowconfigure(1, weight=1)
+        upcoming_card.columnconfigure(0, weight=1)
+        
+        upcoming_header = ttk.Frame(upcoming_card, style='Card.TFrame')
+        upcoming_header.grid(row=0, column=0, columnspan=2, sticky=(tk.W, tk.E), pady=(0, 10))
+        ttk.Label(upcoming_header, text="🕒 Dosis Mendatang", style='Header.TLabel').pack(side=tk.LEFT)
+        self.upcoming_hours_var = tk.IntVar(value=self.UPCOMING_HOURS)
+        ttk.Label(upcoming_header, text="jam").pack(side=tk.RIGHT)
+        ttk.Spinbox(upcoming_header, from_=1, to=UpcomingDoseIndex.HORIZON_HOURS, width=4,
+                    textvariable=self.upcoming_hours_var,
+                    command=self.refresh_upcoming_doses).pack(side=tk.RIGHT, padx=(10, 2))
+        
+        columns = ('Jam', 'Lansia', 'Obat', 'Dosis', 'Status')
+        self.upcoming_tree = ttk.Treeview(upcoming_card, columns=columns, show='headings', height=20)
+        column_widths = {'Jam': 70, 'Lansia': 120, 'Obat': 110, 'Dosis': 70, 'Status': 120}
+        for col in columns:
+            self.upcoming_tree.heading(col, text=col)
+            self.upcoming_tree.column(col, width=column_widths[col])
+        self.upcoming_tree.tag_configure('overdue', foreground=COLORS['danger'])
+        self.upcoming_tree.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        scrollbar3 = ttk.Scrollbar(upcoming_card, orient=tk.VERTICAL, command=self.upcoming_tree.yview)
+        scrollbar3.grid(row=1, column=1, sticky=(tk.N, tk.S))
+        self.upcoming_tree.configure(yscrollcommand=scrollbar3.set)
+    
+    def refresh_upcoming_doses(self, people=None):
+        """Dosis semua lansia dalam N jam ke depan (dan yang terlambat belum dicatat) dari indeks jadwal.
+        people: nama lansia yang barisnya diperbarui (None = semua)"""
+        now = self.manager.clock.now()
+        try:
+            hours = max(1, int(self.upcoming_hours_var.get()))
+        except (tk.TclError, ValueError):
+            hours = self.UPCOMING_HOURS
+        index = self.manager.upcoming_doses
+        index.advance(now)
+        doses = index.due_between(now - datetime.timedelta(hours=index.OVERDUE_HOURS),
+                                  now + datetime.timedelta(hours=hours))
+        
+        rows = {}
+        for slot_dt, person_name, medicine in doses:
+            if people is not None and person_name not in people:
+                continue
+            minutes = int((slot_dt - now).total_seconds() // 60)
+            tags = ()
+            if minutes < 0:
+                status = f"⚠ Terlambat {-minutes} mnt"
+                tags = ('overdue',)
+            elif minutes == 0:
+                status = "Sekarang"
+            elif minutes >= 60:
+                status = f"{minutes // 60} j {minutes % 60} mnt lagi"
+            else:
+                status = f"{minutes} mnt lagi"
+            time_text = slot_dt.strftime("%H:%M") if slot_dt.date() == now.date() else slot_dt.strftime("%d/%m %H:%M")
+            rows[(slot_dt, person_name, medicine.name)] = ((time_text, person_name, medicine.name,
+                                                            medicine.dosage, status), tags)
+        
+        # Tambal hanya baris yang hilang, baru, atau isinya berubah; urutan dijaga dengan bisect
+        tree = self.upcoming_tree
+        stale = [key for key in self.upcoming_items
+                 if key not in rows and (people is None or key[1] in people)]
+        for key in stale:
+            tree.delete(self.upcoming_items.pop(key)[0])
+            del self.upcoming_keys[bisect.bisect_left(self.upcoming_keys, key)]
+        for key, (values, tags) in rows.items():
+            current = self.upcoming_items.get(key)
+            if current is None:
+                position = bisect.bisect_left(self.upcoming_keys, key)
+                self.upcoming_keys.insert(position, key)
+                self.upcoming_items[key] = (tree.insert('', position, values=values, tags=tags), values, tags)
+            elif current[1:] != (values, tags):
+                tree.item(current[0], values=values, tags=tags)
+                self.upcoming_items[key] = (current[0], values, tags)
+    
+    def run_upcoming_refresh(self):
+        self.refresh_upcoming_doses()
+        self.root.after(self.UPCOMING_REFRESH_MS, self.run_upcoming_refresh)
     
     def load_initial_data(self):
         self.refresh_elderly_names()
@@ -763,6 +6351,72 @@ class MedicineGUI:
             self.refresh_medicines_list()
             self.refresh_history()
     
+    def on_manager_events(self, events):
+        """Menambal hanya baris/widget yang terdampak oleh sekumpulan event (di thread Tk)"""
+        current = self.manager.current_person
+        refresh = set()
+        upcoming_people = set()  # dashboard mencakup semua lansia; cukup baris lansia yang berubah
+        added_names = set()
+        removed_names = set()
+        medicine_rows = {}  # Medicine lansia aktif yang barisnya berubah (dict: urutan event terjaga)
+        history_rows = {}  # Medicine lansia aktif yang blok riwayatnya berubah
+        for event in events:
+            if event.kind == ManagerEvent.PERSON_SELECTED:
+                refresh.update(('person', 'form', 'medicines'))
+                continue
+            if event.kind != ManagerEvent.PERSON_UPDATED:
+                upcoming_people.add(event.person.name)
+            if event.kind in (ManagerEvent.PERSON_ADDED, ManagerEvent.PERSON_REMOVED,
+                              ManagerEvent.PERSON_UPDATED):
+                if event.kind == ManagerEvent.PERSON_ADDED:
+                    added_names.add(event.person.name)
+                elif event.kind == ManagerEvent.PERSON_REMOVED:
+                    removed_names.add(event.person.name)
+                    self.reminder_pool.discard(event.person.name)
+                if event.person is current:
+                    refresh.add('person')
+            elif event.person is not current:
+                continue
+            elif event.kind == ManagerEvent.MEDICINE_REMOVED:
+                refresh.update(('removed_medicines', 'medicine_names'))
+            elif event.kind == ManagerEvent.MEDICINE_ADDED:
+                refresh.add('medicine_names')
+                medicine_rows[event.medicine] = history_rows[event.medicine] = True
+            elif event.kind == ManagerEvent.MEDICINE_UPDATED:
+                fields = event.data.get('fields')
+                medicine_rows[event.medicine] = True
+                if fields is None or 'name' in fields:
+                    refresh.add('medicine_names')
+                if fields is None or {'name', 'dosage'} & set(fields):
+                    history_rows[event.medicine] = True  # baris riwayat memuat nama dan dosis obat
+            elif event.kind == ManagerEvent.INTAKE_RECORDED:
+                history_rows[event.medicine] = True
+                if event.medicine.stock is not None:
+                    medicine_rows[event.medicine] = True
+        
+        if added_names or removed_names:
+            self.patch_elderly_names(added_names, removed_names)
+        if 'form' in refresh:
+            self.load_current_person_info()
+        if 'person' in refresh:
+            self.update_current_person_display()
+        if 'medicines' in refresh:
+            # Ganti lansia aktif: seluruh daftar memang berganti isi
+            self.refresh_medicine_names()
+            self.refresh_medicines_list()
+            self.refresh_history()
+        else:
+            if 'medicine_names' in refresh:
+                self.refresh_medicine_names()
+            if 'removed_medicines' in refresh:
+                self.remove_medicine_items()
+            for medicine in medicine_rows:
+                self.update_medicine_item(medicine)
+            for medicine in history_rows:
+                self.update_history_items(medicine)
+        if upcoming_people:
+            self.refresh_upcoming_doses(upcoming_people)
+    
     def load_current_person_info(self):
         """Memuat informasi lansia yang sedang aktif ke form"""
         if self.manager.current_person:
@@ -771,6 +6425,9 @@ class MedicineGUI:
             self.age_entry.delete(0, tk.END)
             self.age_entry.insert(0, str(person.age) if person.age else "")
             self.condition_var.set(person.condition)
+            self.volume_var.set(str(int(round(SoundManager.resident_volume(person) * 100))))
+            self.language_var.set(person.language or VoicePromptEngine.LANGUAGES[0])
+            self.ward_var.set(person.ward)
     
     def update_current_person_display(self):
         """Update label lansia aktif"""
@@ -798,8 +6455,20 @@ class MedicineGUI:
     
     def refresh_elderly_names(self):
         """Refresh daftar nama lansia untuk combobox"""
-        elderly_names = self.manager.get_elderly_names()
-        self.name_combo['values'] = elderly_names
+        self.elderly_names = self.manager.get_elderly_names()
+        self.name_combo['values'] = self.elderly_names
+    
+    def patch_elderly_names(self, added, removed):
+        """Sisipkan/hapus nama lansia di daftar combobox yang sudah terurut tanpa memindai semua lansia"""
+        for name in removed - added:
+            position = bisect.bisect_left(self.elderly_names, name)
+            if position < len(self.elderly_names) and self.elderly_names[position] == name:
+                del self.elderly_names[position]
+        for name in added:
+            position = bisect.bisect_left(self.elderly_names, name)
+            if name and (position == len(self.elderly_names) or self.elderly_names[position] != name):
+                self.elderly_names.insert(position, name)
+        self.name_combo['values'] = self.elderly_names
     
     def on_person_name_selected(self, event):
         """Ketika nama lansia dipilih dari dropdown"""
@@ -815,11 +6484,8 @@ class MedicineGUI:
                     person_info['condition']
                 )
                 
-                # Load informasi ke form
+                # Load informasi ke form; daftar obat & riwayat diperbarui lewat event PERSON_SELECTED
                 self.load_current_person_info()
-                self.update_current_person_display()
-                self.refresh_medicines_list()
-                self.refresh_history()
     
     def on_person_name_changed(self, event):
         """Ketika teks di combobox nama lansia berubah"""
@@ -884,17 +6550,12 @@ class MedicineGUI:
                 
                 if messagebox.askyesno("Konfirmasi", f"Hapus data {selected_name}?"):
                     # Hapus dari daftar
-                    self.manager.elderly_people = [
-                        p for p in self.manager.elderly_people 
-                        if p.name != selected_name
-                    ]
-                    self.manager.save_data()
+                    self.manager.remove_person(selected_name)
                     
-                    # Refresh daftar
+                    # Refresh daftar (widget utama diperbarui lewat event)
                     person_listbox.delete(selection[0])
-                    self.refresh_elderly_names()
                     
-                    messagebox.showinfo("Sukses", f"Data {selected_name} berhasil dihapus!")
+                    messagebox.showinfo("Sukses", f"Data {selected_name} berhasil dihapus! (Ctrl+Z untuk membatalkan)")
         
         # Tombol pilih
         btn_frame = ttk.Frame(list_dialog)
@@ -1022,8 +6683,14 @@ class MedicineGUI:
         if not file_path:
             return  # User membatalkan
         
-        # Tambahkan suara
-        success = self.manager.add_custom_sound(file_path, sound_name)
+        # Tambahkan suara (decode dan normalisasi berjalan di latar belakang)
+        def on_imported(name, success):
+            self.root.after(0, lambda: self.on_custom_sound_imported(name, success))
+        
+        if not self.manager.add_custom_sound(file_path, sound_name, on_imported):
+            messagebox.showerror("Error", "Gagal menambahkan suara. Pastikan format file didukung.")
+    
+    def on_custom_sound_imported(self, sound_name, success):
         if success:
             messagebox.showinfo("Sukses", f"Suara '{sound_name}' berhasil ditambahkan!")
             self.refresh_sound_list()
@@ -1033,7 +6700,7 @@ class MedicineGUI:
     def test_selected_sound(self):
         sound_name = self.sounds_combobox.get()
         if sound_name:
-            success = self.manager.sound_manager.play_sound(sound_name)
+            success = self.manager.sound_manager.play_sound(sound_name, category=AudioMixer.EFFECT)
             if success:
                 messagebox.showinfo("Test Suara", f"Memainkan suara: {sound_name}")
             else:
@@ -1042,9 +6709,126 @@ class MedicineGUI:
             messagebox.showwarning("Peringatan", "Pilih suara terlebih dahulu!")
     
     def test_sound(self):
-        self.manager.sound_manager.play_sound("reminder")
+        self.manager.sound_manager.play_sound("reminder", person=self.manager.current_person,
+                                              category=AudioMixer.EFFECT)
         messagebox.showinfo("Test Suara", "Suara notifikasi di-test!")
     
+    def show_latency_report(self):
+        """Menampilkan percentile latensi pengingat (p50/p95/p99) untuk audit"""
+        report_dialog = tk.Toplevel(self.root)
+        report_dialog.title("📈 Latensi Pengingat")
+        report_dialog.geometry("620x450")
+        report_dialog.configure(bg=COLORS['bg'])
+        report_dialog.transient(self.root)
+        
+        text = tk.Text(report_dialog, font=('Courier', 9), bg=COLORS['card_bg'])
+        text.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        text.insert(tk.END, self.manager.latency_log.format_report() or "Belum ada data.")
+        text.config(state=tk.DISABLED)
+        
+        ttk.Button(report_dialog, text="Tutup", command=report_dialog.destroy).pack(pady=5)
+    
+    def show_stock_dialog(self):
+        """Isi ulang stok obat terpilih dan daftar obat yang segera habis di seluruh fasilitas"""
+        dialog = tk.Toplevel(self.root)
+        dialog.title("💊 Stok Obat")
+        dialog.geometry("520x420")
+        dialog.configure(bg=COLORS['bg'])
+        dialog.transient(self.root)
+        
+        selection = self.medicines_tree.selection()
+        if selection and self.manager.current_person:
+            medicine_name = self.medicines_tree.item(selection[0])['values'][0]
+            _, medicine = self.manager.find_medicine(self.manager.current_person.name, medicine_name)
+            
+            form = ttk.Frame(dialog, padding="10")
+            form.pack(fill=tk.X)
+            current = "-" if medicine.stock is None else medicine.stock
+            ttk.Label(form, text=f"{medicine_name} (stok: {current})", style='Header.TLabel').grid(
+                row=0, column=0, columnspan=3, sticky=tk.W, pady=(0, 5))
+            ttk.Label(form, text="Jumlah:").grid(row=1, column=0, sticky=tk.W)
+            quantity_entry = ttk.Entry(form, width=8)
+            quantity_entry.grid(row=1, column=1, sticky=tk.W, padx=5)
+            ttk.Label(form, text="Per minum:").grid(row=2, column=0, sticky=tk.W)
+            dose_entry = ttk.Entry(form, width=8)
+            dose_entry.insert(0, str(medicine.dose_amount))
+            dose_entry.grid(row=2, column=1, sticky=tk.W, padx=5)
+            
+            def apply_stock(replace):
+                try:
+                    quantity = int(quantity_entry.get().strip())
+                    dose_amount = int(dose_entry.get().strip())
+                    if quantity < 0 or dose_amount <= 0:
+                        raise ValueError
+                except ValueError:
+                    messagebox.showerror("Error", "Jumlah dan takaran harus berupa angka positif!")
+                    return
+                self.manager.refill_medicine(medicine_name, quantity, replace=replace, dose_amount=dose_amount)
+                dialog.destroy()
+                messagebox.showinfo("Sukses", f"Stok {medicine_name} diperbarui!")
+            
+            ttk.Button(form, text="Tambah Stok", command=lambda: apply_stock(False),
+                       style='Success.TButton').grid(row=1, column=2, padx=5)
+            ttk.Button(form, text="Atur Stok", command=lambda: apply_stock(True),
+                       style='Primary.TButton').grid(row=2, column=2, padx=5)
+        
+        ttk.Label(dialog, text=f"Segera habis (≤ {self.LOW_STOCK_DAYS} hari, semua lansia):",
+                  style='Header.TLabel').pack(pady=(10, 5))
+        columns = ('Habis', 'Lansia', 'Obat')
+        tree = ttk.Treeview(dialog, columns=columns, show='headings', height=8)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=150)
+        for runout, person_name, medicine_name in self.manager.runs_out_within(self.LOW_STOCK_DAYS):
+            tree.insert('', tk.END, values=(runout.strftime("%Y-%m-%d %H:%M"), person_name, medicine_name))
+        tree.pack(fill=tk.BOTH, expand=True, padx=10)
+        ttk.Button(dialog, text="Tutup", command=dialog.destroy).pack(pady=5)
+    
+    def show_schedule_optimizer(self):
+        """Pratinjau penggabungan jam minum obat sebelum diterapkan"""
+        if not self.manager.current_person or not self.manager.current_person.name:
+            messagebox.showerror("Error", "Pilih atau buat lansia terlebih dahulu!")
+            return
+        
+        proposal = self.manager.propose_schedule()
+        if not proposal.changes():
+            messagebox.showinfo("Gabungkan Jadwal", 
+                              f"Jadwal sudah optimal ({proposal.events_before} pengingat per hari).")
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("🧮 Gabungkan Jadwal")
+        dialog.geometry("520x360")
+        dialog.configure(bg=COLORS['bg'])
+        dialog.transient(self.root)
+        dialog.grab_set()
+        
+        ttk.Label(dialog, text=f"Pengingat per hari: {proposal.events_before} → {proposal.events_after}",
+                  style='Header.TLabel').pack(pady=10)
+        
+        columns = ('Obat', 'Jadwal Lama', 'Jadwal Baru')
+        tree = ttk.Treeview(dialog, columns=columns, show='headings', height=10)
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=160)
+        tree.tag_configure('changed', background=COLORS['primary_light'])
+        for name, old in proposal.current.items():
+            new = proposal.proposed[name]
+            note = " (tetap)" if name in proposal.fixed else ""
+            tree.insert('', tk.END, values=(name + note, ", ".join(old), ", ".join(new)),
+                        tags=('changed',) if old != new else ())
+        tree.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        def apply_proposal():
+            self.manager.apply_schedule_proposal(proposal)
+            dialog.destroy()
+            messagebox.showinfo("Sukses", "Jadwal baru berhasil diterapkan!")
+        
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(pady=10)
+        ttk.Button(btn_frame, text="Terapkan", command=apply_proposal, style='Success.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="Batal", command=dialog.destroy).pack(side=tk.LEFT, padx=5)
+    
     def toggle_sound(self):
         current_state = self.manager.sound_manager.sound_enabled
         new_state = not current_state
@@ -1088,13 +6872,8 @@ class MedicineGUI:
             new_sound = sound_var.get()
             if new_sound:
                 if self.manager.current_person:
-                    for medicine in self.manager.current_person.medicines:
-                        if medicine.name == medicine_name:
-                            medicine.custom_sound = new_sound
-                            self.manager.save_data()
-                            self.refresh_medicines_list()
-                            messagebox.showinfo("Sukses", f"Suara untuk {medicine_name} diubah menjadi: {new_sound}")
-                            break
+                    self.manager.update_medicine(medicine_name, custom_sound=new_sound)
+                    messagebox.showinfo("Sukses", f"Suara untuk {medicine_name} diubah menjadi: {new_sound}")
                 sound_dialog.destroy()
         
         ttk.Button(sound_dialog, text="Terapkan", command=apply_sound, style='Primary.TButton').pack(pady=10)
@@ -1117,15 +6896,20 @@ class MedicineGUI:
                     messagebox.showerror("Error", "Usia harus berupa angka!")
                     return
             
-            # Set atau update lansia
-            self.manager.set_current_person(name, age, condition)
+            try:
+                volume = int(self.volume_var.get().strip() or "100")
+            except ValueError:
+                messagebox.showerror("Error", "Volume harus berupa angka 0-100!")
+                return
+            if not 0 <= volume <= 100:
+                messagebox.showerror("Error", "Volume harus berupa angka 0-100!")
+                return
             
-            self.update_current_person_display()
+            # Set atau update lansia
+            self.manager.set_current_person(name, age, condition, volume / 100.0, self.language_var.get(),
+                                            self.ward_var.get().strip())
             messagebox.showinfo("Sukses", "Informasi lansia berhasil disimpan!")
             
-            # Refresh daftar nama
-            self.refresh_elderly_names()
-            
         except Exception as e:
             messagebox.showerror("Error", f"Terjadi kesalahan: {str(e)}")
     
@@ -1142,6 +6926,7 @@ class MedicineGUI:
         with_food = self.with_food_var.get()
         sound_enabled = self.sound_enabled_var.get()
         custom_sound = self.sound_combobox.get()
+        recurrence_str = self.recurrence_entry.get().strip()
         
         if not name or not dosage or not schedule_str:
             messagebox.showerror("Error", "Nama obat, dosis, dan jadwal harus diisi!")
@@ -1155,19 +6940,70 @@ class MedicineGUI:
             messagebox.showerror("Error", "Format jadwal tidak valid! Gunakan format HH:MM")
             return
         
-        medicine = Medicine(name, dosage, schedule, description, with_food, sound_enabled, custom_sound)
+        recurrence = None
+        if recurrence_str:
+            try:
+                recurrence = RecurrenceRule.parse_text(recurrence_str, self.manager.clock.now().date())
+                RecurrenceRule.from_medicine(schedule, recurrence)
+            except (ValueError, KeyError) as e:
+                messagebox.showerror("Error", f"Format pengulangan tidak valid: {e}")
+                return
+        
+        medicine = Medicine(name, dosage, schedule, description, with_food, sound_enabled,
+                            custom_sound, recurrence)
+        findings = self.manager.interactions.check_new(self.manager.current_person, medicine,
+                                                       self.manager.clock.now())
+        if findings and not messagebox.askyesno(
+                "Peringatan Interaksi Obat",
+                "\n\n".join(format_interaction(finding) for finding in findings) +
+                "\n\nTetap tambahkan obat ini?", icon='warning'):
+            return
         self.manager.add_medicine(medicine)
         
         # Clear form kecuali nama obat
         self.dosage_entry.delete(0, tk.END)
         self.schedule_entry.delete(0, tk.END)
         self.desc_entry.delete(0, tk.END)
-        
-        # Refresh daftar nama obat
-        self.refresh_medicine_names()
-        self.refresh_medicines_list()
+        self.recurrence_entry.delete(0, tk.END)
         messagebox.showinfo("Sukses", "Obat berhasil ditambahkan!")
     
+    def show_interaction_audit(self):
+        """Audit interaksi dan jarak minum obat seluruh lansia"""
+        audit = self.manager.interactions.audit(self.manager.elderly_people, self.manager.clock.now())
+        if not audit:
+            messagebox.showinfo("Interaksi Obat", "Tidak ditemukan interaksi atau jadwal yang terlalu berdekatan.")
+            return
+        
+        dialog = tk.Toplevel(self.root)
+        dialog.title("⚠ Interaksi & Jarak Minum Obat")
+        dialog.geometry("820x420")
+        dialog.configure(bg=COLORS['bg'])
+        dialog.transient(self.root)
+        
+        count = sum(len(findings) for findings in audit.values())
+        ttk.Label(dialog, text=f"{count} temuan pada {len(audit)} lansia:",
+                  font=('Arial', 11, 'bold')).pack(pady=10)
+        
+        columns = ('Lansia', 'Tingkat', 'Obat', 'Keterangan')
+        tree = ttk.Treeview(dialog, columns=columns, show='headings', height=14)
+        for col, width in zip(columns, (140, 70, 200, 400)):
+            tree.heading(col, text=col)
+            tree.column(col, width=width)
+        tree.tag_configure('berat', foreground=COLORS['danger'])
+        tree.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        for person_name, findings in audit.items():
+            for finding in findings:
+                note = finding['note']
+                if finding['kind'] == 'jarak':
+                    first, second = finding['slots']
+                    note += f" (jadwal {first:%H:%M} & {second:%H:%M})"
+                tree.insert('', tk.END, values=(person_name, finding['severity'],
+                                                f"{finding['medicine']} + {finding['other']}", note),
+                            tags=(finding['severity'],))
+        
+        ttk.Button(dialog, text="Tutup", command=dialog.destroy, style='Primary.TButton').pack(pady=10)
+    
     def remove_medicine(self):
         selection = self.medicines_tree.selection()
         if not selection:
@@ -1179,8 +7015,29 @@ class MedicineGUI:
         
         if messagebox.askyesno("Konfirmasi", f"Hapus {medicine_name}?"):
             self.manager.remove_medicine(medicine_name)
-            self.refresh_medicines_list()
-            self.refresh_medicine_names()
+    
+    def export_calendars(self):
+        """Ekspor jadwal obat semua lansia ke file .ics untuk kalender keluarga"""
+        output_dir = filedialog.askdirectory(title="Pilih folder ekspor kalender")
+        if not output_dir:
+            return
+        try:
+            result = ICalendarExporter(output_dir).export(self.manager.elderly_people, facility=True)
+        except Exception as e:
+            messagebox.showerror("Error", f"Gagal ekspor kalender: {e}")
+            return
+        messagebox.showinfo("Sukses", f"Kalender diekspor ke {output_dir}:\n"
+                                      f"{result['written']} lansia ditulis, {result['skipped']} tidak berubah, "
+                                      f"{result['removed']} dihapus")
+    
+    def undo(self):
+        """Membatalkan perubahan data terakhir (hapus/tambah/ubah lansia atau obat)"""
+        if self.manager.commands.undo() is None:
+            messagebox.showinfo("Urungkan", "Tidak ada perubahan yang dapat dibatalkan")
+    
+    def redo(self):
+        if self.manager.commands.redo() is None:
+            messagebox.showinfo("Ulangi", "Tidak ada perubahan yang dapat diulang")
     
     def mark_as_taken(self):
         selection = self.medicines_tree.selection()
@@ -1190,117 +7047,816 @@ class MedicineGUI:
         
         item = selection[0]
         medicine_name = self.medicines_tree.item(item)['values'][0]
-        current_time = datetime.datetime.now().strftime("%H:%M")
+        current_time = self.manager.clock.now().strftime("%H:%M")
         
         self.manager.record_medicine_taken(medicine_name, current_time)
-        self.refresh_history()
         messagebox.showinfo("Sukses", f"{medicine_name} ditandai sudah diminum!")
     
+    def medicine_row(self, medicine, now):
+        """(values, tags) baris obat di medicines_tree"""
+        schedule_str = ", ".join(medicine.schedule)
+        if medicine.recurrence:
+            try:
+                schedule_str += f" ({medicine.get_rule().describe()})"
+            except ValueError as e:
+                schedule_str += f" (aturan tidak valid: {e})"
+        sound_status = "🔊" if medicine.sound_enabled else "🔇"
+        stock_str = "-"
+        tags = ()
+        if medicine.stock is not None:
+            stock_str = str(medicine.stock)
+            runout = medicine.forecast_runout(now)
+            if runout is not None:
+                days_left = (runout - now).total_seconds() / 86400
+                stock_str += f" (~{days_left:.0f} hari)"
+                if days_left <= self.LOW_STOCK_DAYS:
+                    tags = ('low_stock',)
+        return (
+            medicine.name,
+            medicine.dosage,
+            schedule_str,
+            medicine.custom_sound,
+            sound_status,
+            stock_str
+        ), tags
+    
     def refresh_medicines_list(self):
-        for item in self.medicines_tree.get_children():
-            self.medicines_tree.delete(item)
+        self.medicines_tree.delete(*self.medicines_tree.get_children())
+        self.medicine_items = {}
         
         if self.manager.current_person:
+            now = self.manager.clock.now()
             for medicine in self.manager.current_person.medicines:
-                schedule_str = ", ".join(medicine.schedule)
-                sound_status = "🔊" if medicine.sound_enabled else "🔇"
-                self.medicines_tree.insert('', tk.END, values=(
-                    medicine.name,
-                    medicine.dosage,
-                    schedule_str,
-                    medicine.custom_sound,
-                    sound_status
-                ))
+                values, tags = self.medicine_row(medicine, now)
+                self.medicine_items[medicine] = self.medicines_tree.insert('', tk.END, values=values, tags=tags)
+    
+    def update_medicine_item(self, medicine):
+        """Perbarui (atau sisipkan) satu baris obat lansia aktif"""
+        person = self.manager.current_person
+        if person is None or medicine not in person.medicines:
+            return
+        values, tags = self.medicine_row(medicine, self.manager.clock.now())
+        item = self.medicine_items.get(medicine)
+        if item is None:
+            self.medicine_items[medicine] = self.medicines_tree.insert(
+                '', person.medicines.index(medicine), values=values, tags=tags)
+        else:
+            self.medicines_tree.item(item, values=values, tags=tags)
+    
+    def remove_medicine_items(self):
+        """Hapus baris obat dan riwayat milik obat yang sudah tidak dimiliki lansia aktif"""
+        person = self.manager.current_person
+        remaining = set(person.medicines) if person else set()
+        for medicine in [medicine for medicine in self.medicine_items if medicine not in remaining]:
+            self.medicines_tree.delete(self.medicine_items.pop(medicine))
+        for medicine in [medicine for medicine in self.history_items if medicine not in remaining]:
+            items = self.history_items.pop(medicine)
+            if items:
+                self.history_tree.delete(*items)
+    
+    @staticmethod
+    def history_rows(medicine):
+        """Values baris riwayat untuk 10 catatan terakhir sebuah obat"""
+        rows = []
+        for record in medicine.history[-10:]:
+            timestamp = datetime.datetime.fromisoformat(record['timestamp'])
+            time_str = timestamp.strftime("%Y-%m-%d %H:%M")
+            status = "✗ Terlewat" if record.get('status') == 'missed' else "✓ Sudah diminum"
+            rows.append((
+                time_str,
+                medicine.name,
+                medicine.dosage,
+                status
+            ))
+        return rows
     
     def refresh_history(self):
-        for item in self.history_tree.get_children():
-            self.history_tree.delete(item)
+        self.history_tree.delete(*self.history_tree.get_children())
+        self.history_items = {}
         
         if self.manager.current_person:
             for medicine in self.manager.current_person.medicines:
-                for record in medicine.history[-10:]:
-                    timestamp = datetime.datetime.fromisoformat(record['timestamp'])
-                    time_str = timestamp.strftime("%Y-%m-%d %H:%M")
-                    self.history_tree.insert('', tk.END, values=(
-                        time_str,
-                        medicine.name,
-                        medicine.dosage,
-                        "✓ Sudah diminum"
-                    ))
-    
-    def show_reminder(self, medicine, current_time):
-        def create_reminder_window():
-            reminder_win = tk.Toplevel(self.root)
-            reminder_win.title("⏰ PENGINGAT OBAT! 🔊")
-            reminder_win.geometry("400x250")
-            reminder_win.configure(bg=COLORS['warning'])
-            reminder_win.attributes('-topmost', True)
-            
-            reminder_win.transient(self.root)
-            reminder_win.grab_set()
-            
-            # Tambahkan informasi lansia
-            person_info = ""
-            if self.manager.current_person:
-                person_info = f"Untuk: {self.manager.current_person.name}"
-            
-            def play_repeating_sound():
-                if hasattr(reminder_win, 'sound_active') and reminder_win.sound_active:
-                    if medicine.sound_enabled and self.manager.sound_manager.sound_enabled:
-                        self.manager.sound_manager.play_sound(medicine.custom_sound)
-                    reminder_win.after(5000, play_repeating_sound)
-            
-            reminder_win.sound_active = True
-            
-            ttk.Label(reminder_win, text="⏰ WAKTU MINUM OBAT! 🔊", 
-                     font=('Arial', 14, 'bold'), background=COLORS['warning']).pack(pady=5)
-            
-            if person_info:
-                ttk.Label(reminder_win, text=person_info, 
-                         font=('Arial', 11, 'italic'), background=COLORS['warning']).pack(pady=2)
-            
-            info_text = f"""
-Nama Obat: {medicine.name}
-Dosis: {medicine.dosage}
-Waktu: {current_time}
-{'✓ Diminum setelah makan' if medicine.with_food else ''}
-            """
-            
-            ttk.Label(reminder_win, text=info_text, background=COLORS['warning'], 
-                     font=('Arial', 11)).pack(pady=5)
-            
-            def mark_and_close():
-                reminder_win.sound_active = False
-                self.manager.record_medicine_taken(medicine.name, current_time)
-                self.refresh_history()
-                reminder_win.destroy()
-            
-            def snooze():
-                reminder_win.sound_active = False
-                reminder_win.destroy()
-                self.root.after(300000, lambda: self.show_reminder(medicine, current_time))
-            
-            btn_frame = ttk.Frame(reminder_win)
-            btn_frame.pack(pady=15)
-            
-            ttk.Button(btn_frame, text="✓ Sudah Diminum", 
-                      command=mark_and_close, style='Success.TButton').pack(side=tk.LEFT, padx=5)
-            
-            ttk.Button(btn_frame, text="⏰ Tunda 5 menit", 
-                      command=snooze, style='Primary.TButton').pack(side=tk.LEFT, padx=5)
-            
-            play_repeating_sound()
+                self.history_items[medicine] = [self.history_tree.insert('', tk.END, values=values)
+                                                for values in self.history_rows(medicine)]
+    
+    def update_history_items(self, medicine):
+        """Ganti hanya blok riwayat satu obat; blok obat lain tidak disentuh"""
+        person = self.manager.current_person
+        if person is None or medicine not in person.medicines:
+            return
+        items = self.history_items.pop(medicine, None)
+        if items:
+            position = self.history_tree.index(items[0])
+            self.history_tree.delete(*items)
+        else:
+            # Blok disusun sesuai urutan obat lansia
+            position = 0
+            for other in person.medicines:
+                if other is medicine:
+                    break
+                position += len(self.history_items.get(other, ()))
+        self.history_items[medicine] = [self.history_tree.insert('', position + offset, values=values)
+                                        for offset, values in enumerate(self.history_rows(medicine))]
+    
+    def get_reminder_window(self, person):
+        """Jendela pengingat gabungan milik seorang lansia (dipinjam dari pool)"""
+        return self.reminder_pool.window_for(person)
+    
+    def show_reminder(self, medicine, slot_dt, person=None):
+        person = person or self.manager.current_person
+        self.root.after(0, lambda: self.get_reminder_window(person).add_dose(medicine, slot_dt))
+    
+    def show_missed_doses(self, missed):
+        """Dipanggil saat startup: tampilkan semua dosis terlewat dalam satu dialog"""
+        self.root.after(0, lambda: self.create_missed_doses_dialog(missed))
+    
+    def create_missed_doses_dialog(self, missed):
+        dialog = tk.Toplevel(self.root)
+        dialog.title("⏰ Dosis Terlewat Saat Aplikasi Tertutup")
+        dialog.geometry("520x360")
+        dialog.configure(bg=COLORS['bg'])
+        dialog.transient(self.root)
+        
+        ttk.Label(dialog, text=f"{len(missed)} jadwal belum tercatat:",
+                  font=('Arial', 11, 'bold')).pack(pady=10)
+        
+        columns = ('Lansia', 'Obat', 'Jadwal')
+        tree = ttk.Treeview(dialog, columns=columns, show='headings', height=10, selectmode='extended')
+        for col in columns:
+            tree.heading(col, text=col)
+            tree.column(col, width=160)
+        tree.pack(fill=tk.BOTH, expand=True, padx=10)
+        
+        doses_by_item = {}
+        for dose in missed:
+            item = tree.insert('', tk.END, values=(
+                dose['person'].name,
+                dose['medicine'].name,
+                dose['slot_dt'].strftime("%Y-%m-%d %H:%M")
+            ))
+            doses_by_item[item] = dose
+        
+        def record(items, taken):
+            now = self.manager.clock.now()
+            doses = [doses_by_item.pop(item) for item in items]
+            by_person = defaultdict(list)
+            for dose in doses:
+                by_person[dose['person'].name].append(dose)
+            for person_doses in by_person.values():
+                person = person_doses[0]['person']
+                if taken:
+                    self.manager.record_medicines_taken(
+                        [(d['medicine'].name, d['slot_dt'].strftime("%H:%M"), d['slot_dt']) for d in person_doses],
+                        person)
+                else:
+                    for dose in person_doses:
+                        self.manager.record_missed_dose(person, dose['medicine'].name, dose['slot_dt'], now)
+            for item in items:
+                tree.delete(item)
+        
+        def mark_selected_taken():
+            record(list(tree.selection()), True)
+        
+        def close_as_missed():
+            record(list(tree.get_children()), False)
+            dialog.destroy()
+        
+        dialog.protocol("WM_DELETE_WINDOW", close_as_missed)
+        
+        btn_frame = ttk.Frame(dialog)
+        btn_frame.pack(pady=10)
+        ttk.Button(btn_frame, text="✓ Yang Dipilih Sudah Diminum",
+                   command=mark_selected_taken, style='Success.TButton').pack(side=tk.LEFT, padx=5)
+        ttk.Button(btn_frame, text="✗ Sisanya Terlewat",
+                   command=close_as_missed, style='Danger.TButton').pack(side=tk.LEFT, padx=5)
+    
+    def on_reminder_escalated(self, event):
+        """Dipanggil dari thread pengingat saat eskalasi berjalan"""
+        self.root.after(0, lambda: self.apply_reminder_escalation(event))
+    
+    def apply_reminder_escalation(self, event):
+        batch_window = self.reminder_pool.get(event['person'])
+        if batch_window is not None and batch_window.is_open():
+            batch_window.apply_escalation(event)
+
+class ICalendarExporter:
+    """Ekspor jadwal obat ke iCalendar (.ics): satu VEVENT berulang (RRULE) per jam minum, dengan VALARM.
+    File ditulis baris per baris (memori tetap), dan hanya lansia yang obatnya berubah sejak ekspor terakhir
+    yang ditulis ulang (dilacak dengan sidik isi di sidik_ekspor.json). UID event hanya dari lansia, obat,
+    tahap, dan jam minum sehingga tetap sama di setiap ekspor walaupun tanggal mulai bergeser."""
+    FORMAT_VERSION = 2
+    PRODID = "-//Kelompok 15//Manajemen Minum Obat Lansia//ID"
+    STATE_FILE = "sidik_ekspor.json"
+    FACILITY_FILE = "semua_lansia.ics"
+    BYDAY = ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU']
+    EVENT_MINUTES = 15
+    
+    def __init__(self, output_dir="kalender", alarm_minutes=10, today=None):
+        self.output_dir = Path(output_dir)
+        self.alarm_minutes = alarm_minutes
+        self.today = today or datetime.date.today()
+        self.stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    
+    @staticmethod
+    def escape(text):
+        return (str(text).replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+                .replace("\r\n", "\\n").replace("\n", "\\n"))
+    
+    @staticmethod
+    def fold(line):
+        """Lipat baris > 75 oktet (RFC 5545) tanpa memotong karakter UTF-8"""
+        encoded = line.encode('utf-8')
+        if len(encoded) <= 75:
+            return line + "\r\n"
+        parts = []
+        current, size, limit = [], 0, 75
+        for ch in line:
+            width = len(ch.encode('utf-8'))
+            if size + width > limit:
+                parts.append("".join(current))
+                current, size, limit = [], 0, 74  # baris lanjutan diawali satu spasi
+            current.append(ch)
+            size += width
+        parts.append("".join(current))
+        return "\r\n ".join(parts) + "\r\n"
+    
+    def fingerprint(self, person):
+        content = [self.FORMAT_VERSION, self.alarm_minutes, person.name, [
+            [medicine.name, medicine.dosage, medicine.schedule, medicine.recurrence, medicine.with_food,
+             medicine.description] for medicine in person.medicines]]
+        return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    
+    def file_name(self, person):
+        return f"{VoicePromptEngine.slug(person.name) or 'tanpa_nama'}.ics"
+    
+    def recurrence_blocks(self, medicine):
+        """[(mulai, RRULE, kunci tetap)] untuk satu obat; tapering menjadi satu blok per tahap"""
+        rule = medicine.get_rule()
+        freq = f"FREQ=HOURLY;INTERVAL={rule.interval_hours}" if rule.interval_hours \
+            else f"FREQ=DAILY;INTERVAL={rule.interval_days}"
+        if rule.weekdays is not None:
+            freq += ";BYDAY=" + ",".join(self.BYDAY[day] for day in sorted(rule.weekdays))
+        
+        if rule.phases:
+            spans = []
+            for index, (phase, offset) in enumerate(zip(rule.phases, rule.phase_offsets)):
+                start = rule.start_date + datetime.timedelta(days=offset)
+                end = min(start + datetime.timedelta(days=phase['days'] - 1), rule.end_date)
+                spans.append((start, end, phase['times'], f"tahap{index + 1}-"))
+        else:
+            spans = [(rule.start_date or self.today, rule.end_date, rule.times, "")]
+        
+        blocks = []
+        for start, end, times, label in spans:
+            if not times:
+                continue  # tahap jeda
+            # Hari aktif pertama (sesuai interval/hari dalam minggu) menjadi DTSTART
+            first = rule.next_occurrence(datetime.datetime.combine(start, datetime.time(0, 0))
+                                         - datetime.timedelta(minutes=1))
+            if first is None or (end and first.date() > end):
+                continue
+            rrule = freq + (f";UNTIL={end.strftime('%Y%m%d')}T235959" if end else "")
+            if rule.interval_hours:
+                blocks.append((first, rrule, f"{label}{first:%H:%M}"))  # satu rangkaian per jam-jaman
+            else:
+                for minute in times:
+                    blocks.append((datetime.datetime.combine(first.date(), datetime.time(minute // 60, minute % 60)),
+                                   rrule, f"{label}{minute // 60:02d}:{minute % 60:02d}"))
+        return blocks
+    
+    def event_lines(self, person, medicine):
+        try:
+            blocks = self.recurrence_blocks(medicine)
+        except Exception as e:
+            print(f"Error jadwal {person.name}/{medicine.name}: {e}")
+            return
+        summary = f"{medicine.name} {medicine.dosage} - {person.name}"
+        description = medicine.description or ""
+        if medicine.with_food:
+            description = (description + "\n" if description else "") + "Diminum setelah makan"
+        for start, rrule, key in blocks:
+            uid = hashlib.sha1(f"{person.name}|{medicine.name}|{key}".encode('utf-8')).hexdigest()
+            yield "BEGIN:VEVENT"
+            yield f"UID:{uid}@manajemen-obat-lansia"
+            yield f"DTSTAMP:{self.stamp}"
+            yield f"DTSTART:{start.strftime('%Y%m%dT%H%M%S')}"
+            yield f"DURATION:PT{self.EVENT_MINUTES}M"
+            yield f"RRULE:{rrule}"
+            yield f"SUMMARY:{self.escape(summary)}"
+            if description:
+                yield f"DESCRIPTION:{self.escape(description)}"
+            yield "CATEGORIES:Obat"
+            yield "BEGIN:VALARM"
+            yield "ACTION:DISPLAY"
+            yield f"TRIGGER:-PT{self.alarm_minutes}M"
+            yield f"DESCRIPTION:{self.escape('Waktunya minum ' + summary)}"
+            yield "END:VALARM"
+            yield "END:VEVENT"
+    
+    def calendar_lines(self, name, people):
+        yield "BEGIN:VCALENDAR"
+        yield "VERSION:2.0"
+        yield f"PRODID:{self.PRODID}"
+        yield "CALSCALE:GREGORIAN"
+        yield f"X-WR-CALNAME:{self.escape(name)}"
+        for person in people:
+            for medicine in person.medicines:
+                yield from self.event_lines(person, medicine)
+        yield "END:VCALENDAR"
+    
+    def write_calendar(self, path, lines):
+        temp_file = str(path) + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8', newline='') as f:
+            for line in lines:
+                f.write(self.fold(line))
+        os.replace(temp_file, path)
+    
+    def export(self, people, per_resident=True, facility=False):
+        """Menulis file .ics per lansia dan/atau satu file fasilitas; mengembalikan jumlah ditulis/dilewati/dihapus"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        state_path = self.output_dir / self.STATE_FILE
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            state = {'people': {}, 'facility': None}
+        
+        result = {'written': 0, 'skipped': 0, 'removed': 0, 'facility': False}
+        previous = state.get('people', {})
+        current = {}
+        for person in people:
+            if not person.name:
+                continue
+            fingerprint = self.fingerprint(person)
+            file_name = self.file_name(person)
+            current[person.name] = {'fingerprint': fingerprint, 'file': file_name}
+            old = previous.get(person.name)
+            if not per_resident:
+                continue
+            if old and old['fingerprint'] == fingerprint and (self.output_dir / file_name).exists():
+                result['skipped'] += 1
+                continue
+            self.write_calendar(self.output_dir / file_name, self.calendar_lines(f"Jadwal Obat {person.name}", [person]))
+            result['written'] += 1
+        
+        # Lansia yang sudah dihapus: file kalendernya ikut dihapus
+        if per_resident:
+            for name, old in previous.items():
+                if name not in current and (self.output_dir / old['file']).exists():
+                    os.remove(self.output_dir / old['file'])
+                    result['removed'] += 1
+        
+        if facility:
+            facility_fingerprint = hashlib.sha256(json.dumps(
+                sorted((name, entry['fingerprint']) for name, entry in current.items())).encode('utf-8')).hexdigest()
+            facility_path = self.output_dir / self.FACILITY_FILE
+            if state.get('facility') != facility_fingerprint or not facility_path.exists():
+                self.write_calendar(facility_path, self.calendar_lines("Jadwal Obat Semua Lansia",
+                                                                       (person for person in people if person.name)))
+                result['facility'] = True
+            state['facility'] = facility_fingerprint
+        
+        state['people'] = current
+        temp_file = str(state_path) + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(state, f, indent=2, ensure_ascii=False)
+        os.replace(temp_file, state_path)
+        return result
+
+def read_people_file(path):
+    """Membaca daftar data lansia (dict) dari file JSON atau snapshot biner"""
+    return read_data_store(path)[0]
+
+def iter_people_file(path):
+    """Data lansia (dict) satu per satu tanpa membangun seluruh daftar: JSON dibaca bertahap per lansia,
+    snapshot didekode per lansia. Lansia yang tidak bisa di-parse dilewati."""
+    if SnapshotCodec.is_snapshot(path):
+        with open(path, 'rb') as f:
+            yield from SnapshotCodec.iter_decode(f.read())[1]
+        return
+    with open(path, 'r', encoding='utf-8') as f:
+        for person, problem in DataFileSalvager(path).iter_elements(f):
+            if person is None:
+                print(f"Lansia dilewati ({problem[1]})")
+            elif isinstance(person.get('people'), list):
+                yield from person['people']  # pembungkus dengan urutan kunci berbeda
+            else:
+                yield person
+
+def migrate_data_file(source, destination, to_format='snapshot', compress=True):
+    """Konversi file data JSON <-> snapshot biner (isi dan generasi tidak berubah)"""
+    data, generation, _ = read_data_store(source)
+    return write_data_store(destination, data, to_format, generation, compress)
+
+def benchmark_snapshot(num_residents=200, history_days=180, repeat=3, directory=None):
+    """Membandingkan waktu load/save dan ukuran file JSON vs snapshot untuk data panti sintetis"""
+    import tempfile
+    directory = directory or tempfile.mkdtemp(prefix="mmol_bench_")
+    people = generate_synthetic_facility(num_residents, history_days=history_days)
+    data = [person.to_dict() for person in people]
+    
+    def json_save(path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+    
+    def json_load(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return [ElderlyPerson.from_dict(p) for p in json.load(f)]
+    
+    def snapshot_load(path):
+        return [ElderlyPerson.from_dict(p) for p in SnapshotCodec.read_file(path)[0]]
+    
+    variants = [
+        ("json (indent=4)", "data.json", json_save, json_load),
+        ("snapshot", "data.mmol", lambda path: SnapshotCodec.write_file(path, data, False), snapshot_load),
+        ("snapshot+zlib", "data_z.mmol", lambda path: SnapshotCodec.write_file(path, data, True), snapshot_load),
+    ]
+    
+    results = {}
+    for label, filename, save, load in variants:
+        path = os.path.join(directory, filename)
+        save_times = []
+        load_times = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            save(path)
+            save_times.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            load(path)
+            load_times.append(time.perf_counter() - started)
+        results[label] = {
+            'size_kb': os.path.getsize(path) / 1024,
+            'save_ms': min(save_times) * 1000,
+            'load_ms': min(load_times) * 1000
+        }
+    records = sum(len(m['history']) for p in data for m in p['medicines'])
+    return {'residents': num_residents, 'history_records': records, 'results': results}
+
+# --- Laporan kepatuhan bulanan ---
+
+REPORT_LATE_MINUTES = 60  # diminum lebih dari ini setelah jadwal dihitung terlambat
+REPORT_STATUS_LABELS = {'taken': "Diminum", 'late': "Terlambat", 'missed': "Terlewat", 'unrecorded': "Tidak tercatat"}
+
+def month_bounds(month):
+    """"YYYY-MM" -> (awal bulan, awal bulan berikutnya)"""
+    start = datetime.datetime.strptime(month, "%Y-%m")
+    following = datetime.datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    return start, following
+
+def adherence_slots(medicine, start, end, late_minutes=REPORT_LATE_MINUTES):
+    """Menghasilkan (jadwal, status, waktu diminum) untuk setiap jadwal obat dalam [start, end)"""
+    taken = {}
+    missed = set()
+    for record in medicine.history:
+        key = history_slot_key(record)
+        if record.get('status') == 'missed':
+            missed.add(key)
+        else:
+            taken.setdefault(key, record['timestamp'])
+    
+    late = datetime.timedelta(minutes=late_minutes)
+    epsilon = datetime.timedelta(microseconds=1)
+    for slot in medicine.get_rule().occurrences_between(start - epsilon, end - epsilon):
+        key = (slot.date().isoformat(), slot.strftime("%H:%M"))
+        if key in taken:
+            taken_at = datetime.datetime.fromisoformat(taken[key])
+            yield slot, 'late' if taken_at - slot > late else 'taken', taken_at
+        elif key in missed:
+            yield slot, 'missed', None
+        else:
+            yield slot, 'unrecorded', None
+
+def _build_resident_report(task):
+    """Worker: tulis laporan HTML dan CSV satu lansia langsung ke disk, kembalikan ringkasannya"""
+    index, person_data, month, output_dir, now = task
+    person = ElderlyPerson.from_dict(person_data)
+    start, end = month_bounds(month)
+    end = min(end, now)  # jadwal yang belum lewat tidak dihitung
+    base_name = f"{index:04d}_{VoicePromptEngine.slug(person.name) or 'lansia'}"
+    totals = dict.fromkeys(REPORT_STATUS_LABELS, 0)
+    
+    with open(os.path.join(output_dir, base_name + ".csv"), 'w', newline='', encoding='utf-8') as csv_file, \
+         open(os.path.join(output_dir, base_name + ".html"), 'w', encoding='utf-8') as html_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['tanggal', 'jam', 'obat', 'dosis', 'status', 'diminum_pada'])
+        html_file.write(f"<!DOCTYPE html><html><head><meta charset='utf-8'>"
+                        f"<title>Kepatuhan {html.escape(person.name)} {month}</title></head><body>\n"
+                        f"<h1>Laporan Kepatuhan Minum Obat</h1>\n"
+                        f"<p>{html.escape(person.name)} ({person.age} tahun) &mdash; {month}</p>\n"
+                        f"<table border='1' cellpadding='4'><tr><th>Tanggal</th><th>Jam</th><th>Obat</th>"
+                        f"<th>Status</th><th>Diminum pada</th></tr>\n")
+        medicine_rows = []
+        for medicine in person.medicines:
+            counts = dict.fromkeys(REPORT_STATUS_LABELS, 0)
+            for slot, status, taken_at in adherence_slots(medicine, start, end):
+                counts[status] += 1
+                taken_str = taken_at.strftime("%Y-%m-%d %H:%M") if taken_at else ""
+                writer.writerow([slot.date().isoformat(), slot.strftime("%H:%M"), medicine.name,
+                                 medicine.dosage, status, taken_str])
+                if status != 'taken':
+                    html_file.write(f"<tr><td>{slot.date().isoformat()}</td><td>{slot.strftime('%H:%M')}</td>"
+                                    f"<td>{html.escape(medicine.name)}</td><td>{REPORT_STATUS_LABELS[status]}</td>"
+                                    f"<td>{taken_str}</td></tr>\n")
+            for status, count in counts.items():
+                totals[status] += count
+            medicine_rows.append((medicine.name, counts))
+        
+        html_file.write("</table>\n<h2>Ringkasan per Obat</h2>\n<table border='1' cellpadding='4'><tr><th>Obat</th>"
+                        "<th>Jadwal</th>" + "".join(f"<th>{label}</th>" for label in REPORT_STATUS_LABELS.values()) +
+                        "<th>Kepatuhan</th></tr>\n")
+        for name, counts in medicine_rows:
+            scheduled = sum(counts.values())
+            rate = (counts['taken'] + counts['late']) / scheduled if scheduled else 1.0
+            html_file.write(f"<tr><td>{html.escape(name)}</td><td>{scheduled}</td>" +
+                            "".join(f"<td>{counts[status]}</td>" for status in REPORT_STATUS_LABELS) +
+                            f"<td>{rate:.0%}</td></tr>\n")
+        html_file.write("</table></body></html>\n")
+    
+    scheduled = sum(totals.values())
+    return {
+        'name': person.name,
+        'file': base_name,
+        'scheduled': scheduled,
+        **totals,
+        'adherence': (totals['taken'] + totals['late']) / scheduled if scheduled else 1.0
+    }
+
+def generate_adherence_reports(data_file, month, output_dir="laporan", workers=None, now=None):
+    """Laporan kepatuhan semua lansia secara paralel (satu proses per core), ringkasan fasilitas di akhir"""
+    now = now or datetime.datetime.now()
+    workers = max(1, workers or os.cpu_count() or 1)
+    os.makedirs(output_dir, exist_ok=True)
+    # Data lansia dibaca bertahap dan dikirim satu per satu ke worker dalam kelompok terbatas,
+    # sehingga tidak ada proses yang memuat seluruh file
+    tasks = ((index, person_data, month, output_dir, now)
+             for index, person_data in enumerate(iter_people_file(data_file)))
+    batch_size = workers * 16
+    started = time.perf_counter()
+    
+    summary_fields = ['name', 'file', 'scheduled'] + list(REPORT_STATUS_LABELS) + ['adherence']
+    summaries = []
+    with open(os.path.join(output_dir, "ringkasan.csv"), 'w', newline='', encoding='utf-8') as summary_file:
+        writer = csv.DictWriter(summary_file, fieldnames=summary_fields)
+        writer.writeheader()
         
-        self.root.after(0, create_reminder_window)
+        pool = multiprocessing.Pool(workers) if workers > 1 else None
+        try:
+            for batch in iter(lambda: list(itertools.islice(tasks, batch_size)), []):
+                if pool is None:
+                    results = map(_build_resident_report, batch)
+                else:
+                    results = pool.imap_unordered(_build_resident_report, batch, chunksize=2)
+                for result in results:
+                    writer.writerow(dict(result, adherence=f"{result['adherence']:.4f}"))
+                    summaries.append(result)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+    
+    summaries.sort(key=lambda result: (result['adherence'], result['name']))
+    totals = {status: sum(result[status] for result in summaries) for status in REPORT_STATUS_LABELS}
+    scheduled = sum(totals.values())
+    facility_rate = (totals['taken'] + totals['late']) / scheduled if scheduled else 1.0
+    with open(os.path.join(output_dir, "index.html"), 'w', encoding='utf-8') as f:
+        f.write(f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Kepatuhan Fasilitas {month}</title>"
+                f"</head><body>\n<h1>Ringkasan Kepatuhan Fasilitas &mdash; {month}</h1>\n"
+                f"<p>{len(summaries)} lansia, {scheduled} jadwal, kepatuhan {facility_rate:.1%}</p>\n"
+                "<table border='1' cellpadding='4'><tr><th>Lansia</th><th>Jadwal</th>" +
+                "".join(f"<th>{label}</th>" for label in REPORT_STATUS_LABELS.values()) +
+                "<th>Kepatuhan</th></tr>\n")
+        for result in summaries:
+            f.write(f"<tr><td><a href='{result['file']}.html'>{html.escape(result['name'])}</a></td>"
+                    f"<td>{result['scheduled']}</td>" +
+                    "".join(f"<td>{result[status]}</td>" for status in REPORT_STATUS_LABELS) +
+                    f"<td>{result['adherence']:.0%}</td></tr>\n")
+        f.write("</table></body></html>\n")
+    
+    return {
+        'residents': len(summaries),
+        'scheduled': scheduled,
+        'adherence': facility_rate,
+        'workers': workers,
+        'seconds': time.perf_counter() - started,
+        'output_dir': output_dir
+    }
 
-def main():
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manajemen Minum Obat Lansia")
+    parser.add_argument('--simulate', action='store_true',
+                        help="jalankan simulasi pengingat dengan jam virtual (tanpa GUI)")
+    parser.add_argument('--residents', type=int, default=200, help="jumlah lansia sintetis")
+    parser.add_argument('--days', type=int, default=30, help="lama simulasi (hari)")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--suspend-every-days', type=int, default=None,
+                        help="simulasikan PC tidur tiap N hari")
+    parser.add_argument('--latency-report', action='store_true',
+                        help="cetak percentile latensi pengingat dari reminder_latency.json")
+    parser.add_argument('--late-threshold', type=int, default=60,
+                        help="ambang detik untuk menandai pengingat terlambat")
+    parser.add_argument('--migrate', nargs=2, metavar=('SUMBER', 'TUJUAN'),
+                        help="konversi file data antara JSON dan snapshot biner (snapshot lebih kecil, tetapi lebih lambat dimuat)")
+    parser.add_argument('--to', choices=['snapshot', 'json'], default='snapshot',
+                        help="format tujuan untuk --migrate")
+    parser.add_argument('--benchmark-snapshot', action='store_true',
+                        help="bandingkan load/save JSON vs snapshot untuk data sintetis")
+    parser.add_argument('--history-days', type=int, default=180,
+                        help="lama riwayat sintetis untuk benchmark (hari)")
+    parser.add_argument('--report', metavar='YYYY-MM',
+                        help="buat laporan kepatuhan bulanan (HTML dan CSV) untuk semua lansia")
+    parser.add_argument('--report-dir', default="laporan", help="folder hasil laporan")
+    parser.add_argument('--workers', type=int, default=None, help="jumlah proses (default: jumlah core)")
+    parser.add_argument('--data-file', default="elderly_data.json", help="file data lansia")
+    parser.add_argument('--station', help="nama stasiun perawat untuk sinkronisasi")
+    parser.add_argument('--sync-dir', help="folder bersama untuk sinkronisasi antar stasiun")
+    parser.add_argument('--sync-peer', action='append', default=[], metavar='HOST:PORT',
+                        help="stasiun lain yang dihubungi langsung (boleh lebih dari satu)")
+    parser.add_argument('--sync-port', type=int, help="port untuk menerima sinkronisasi dari stasiun lain")
+    parser.add_argument('--sync-host', default="127.0.0.1",
+                        help="alamat yang didengarkan --sync-port (default hanya PC ini; 0.0.0.0 = semua jaringan)")
+    parser.add_argument('--sync-secret', default=os.environ.get('OBAT_SYNC_SECRET'),
+                        help="kunci rahasia bersama untuk sinkronisasi peer (default: variabel OBAT_SYNC_SECRET)")
+    parser.add_argument('--sync-once', action='store_true', help="sinkronisasi sekali lalu keluar (tanpa GUI)")
+    parser.add_argument('--check-data', action='store_true',
+                        help="periksa file data per lansia/obat/riwayat; yang rusak ditulis ke file karantina")
+    parser.add_argument('--salvage', metavar='TUJUAN', help="simpan bagian file data yang valid ke file TUJUAN")
+    parser.add_argument('--export-ics', metavar='FOLDER', help="ekspor jadwal obat ke file .ics per lansia")
+    parser.add_argument('--ics-facility', action='store_true',
+                        help="dengan --export-ics, tulis juga satu file kalender untuk semua lansia")
+    parser.add_argument('--reminder-workers', type=int, metavar='N',
+                        help="jalankan pengingat di N proses yang dibagi per bangsal")
+    parser.add_argument('--reminder-service', action='store_true',
+                        help="jalankan pengingat multi-proses tanpa GUI (pengingat dicetak ke konsol)")
+    parser.add_argument('--soak-test', type=int, metavar='HARI',
+                        help="uji ketahanan jendela pengingat selama HARI hari virtual (butuh tampilan)")
+    parser.add_argument('--check-interactions', action='store_true',
+                        help="audit interaksi dan jarak minum obat semua lansia")
+    parser.add_argument('--interaction-file', default="interaksi_obat.json", help="file aturan interaksi obat")
+    parser.add_argument('--backup-dir', default="backup", help="folder backup file data")
+    parser.add_argument('--backup', action='store_true', help="buat backup file data sekarang")
+    parser.add_argument('--list-backups', action='store_true', help="tampilkan daftar backup")
+    parser.add_argument('--verify-backups', action='store_true', help="periksa keutuhan semua backup")
+    parser.add_argument('--restore', nargs='?', const='terbaru', metavar='ID',
+                        help="kembalikan file data dari backup (default: terbaru)")
+    args = parser.parse_args(argv)
+    
+    peers = []
+    for peer in args.sync_peer:
+        host, _, port = peer.rpartition(":")
+        peers.append((host or "localhost", int(port)))
+    if (peers or args.sync_port) and not args.sync_secret:
+        parser.error("--sync-peer/--sync-port membutuhkan --sync-secret (atau variabel OBAT_SYNC_SECRET)")
+    sync_options = {}
+    if args.sync_dir or peers or args.sync_port:
+        sync_options = {'station': args.station, 'shared_dir': args.sync_dir, 'peers': peers, 'port': args.sync_port,
+                        'host': args.sync_host, 'secret': args.sync_secret}
+    
+    if args.sync_once:
+        manager = ElderlyManager(args.data_file, sound_manager=SimulatedSoundManager())
+        sync = StationSync(manager, station_id=args.station, shared_dir=args.sync_dir, secret=args.sync_secret)
+        applied = sync.sync_directory()
+        for host, port in peers:
+            applied += sync.sync_peer(host, port)
+        print(f"Stasiun {sync.station}: {applied} operasi baru diterapkan, vektor {sync.vector}")
+        return
+    
+    if args.export_ics:
+        people = [ElderlyPerson.from_dict(data) for data in read_people_file(args.data_file)]
+        result = ICalendarExporter(args.export_ics).export(people, facility=args.ics_facility)
+        print(f"Kalender di {args.export_ics}: {result['written']} ditulis, {result['skipped']} tidak berubah, "
+              f"{result['removed']} dihapus" + (", file fasilitas diperbarui" if result['facility'] else ""))
+        return
+    
+    if args.check_interactions:
+        people = [ElderlyPerson.from_dict(data) for data in read_people_file(args.data_file)]
+        audit = InteractionChecker(args.interaction_file).audit(people)
+        for person_name, findings in audit.items():
+            print(person_name)
+            for finding in findings:
+                print(f"  {format_interaction(finding)}")
+        print(f"{sum(len(f) for f in audit.values())} temuan pada {len(audit)} dari {len(people)} lansia")
+        return
+    
+    if args.check_data or args.salvage:
+        salvager = DataFileSalvager(args.data_file)
+        people = salvager.load()
+        print(f"{args.data_file}: {format_salvage_report(salvager.report())}")
+        if args.salvage:
+            write_data_store(args.salvage, [person.to_dict() for person in people], 'json', salvager.generation)
+            print(f"Data valid disimpan ke {args.salvage}")
+        return
+    
+    if args.backup or args.list_backups or args.verify_backups or args.restore:
+        backups = BackupStore(args.backup_dir)
+        if args.backup:
+            with DataFileLock(args.data_file):
+                manifest = backups.backup(args.data_file)
+            if manifest:
+                removed, removed_chunks = backups.prune()
+                print(f"Backup {manifest['id']}: {len(manifest['chunks'])} potongan, {manifest['new_chunks']} baru "
+                      f"({manifest['new_bytes'] / 1024:.1f} KB); retensi menghapus {removed} backup")
+            else:
+                print("File data tidak berubah sejak backup terakhir")
+        if args.list_backups:
+            for manifest in backups.list_backups():
+                print(f"{manifest['id']}  {manifest['size'] / 1024:>10.1f} KB  {len(manifest['chunks']):>5} potongan  "
+                      f"+{manifest['new_bytes'] / 1024:.1f} KB")
+        if args.verify_backups:
+            problems = backups.verify()
+            for backup_id, errors in problems.items():
+                print(f"{backup_id}: RUSAK - {'; '.join(errors)}")
+            print(f"{len(backups.list_backups()) - len(problems)} backup utuh, {len(problems)} rusak")
+        if args.restore:
+            with DataFileLock(args.data_file):
+                manifest = backups.restore(args.data_file, None if args.restore == 'terbaru' else args.restore,
+                                           args.data_file + ".sebelum-restore")
+            print(f"{args.data_file} dikembalikan dari backup {manifest['id']}")
+        return
+    
+    if args.report:
+        result = generate_adherence_reports(args.data_file, args.report, args.report_dir, args.workers)
+        print(f"Laporan {args.report}: {result['residents']} lansia, {result['scheduled']} jadwal, "
+              f"kepatuhan {result['adherence']:.1%} ({result['seconds']:.1f} detik, "
+              f"{result['workers']} proses) -> {result['output_dir']}")
+        return
+    
+    if args.migrate:
+        size = migrate_data_file(args.migrate[0], args.migrate[1], args.to)
+        print(f"Data dikonversi ke {args.migrate[1]} ({size / 1024:.1f} KB)")
+        return
+    
+    if args.benchmark_snapshot:
+        benchmark = benchmark_snapshot(args.residents, args.history_days)
+        print(f"Benchmark {benchmark['residents']} lansia, {benchmark['history_records']} catatan riwayat:")
+        for label, result in benchmark['results'].items():
+            print(f"  {label:<18} {result['size_kb']:>10.1f} KB  save {result['save_ms']:>8.1f} ms  "
+                  f"load {result['load_ms']:>8.1f} ms")
+        return
+    
+    if args.latency_report:
+        print(ReminderLatencyLog().format_report(args.late_threshold))
+        return
+    
+    if args.soak_test:
+        samples = ReminderWindowSoakTest(args.soak_test, args.residents, args.seed).run()
+        print(f"{'hari':>4} {'memori KB':>10} {'widget':>7} {'yatim':>6} {'after':>6} {'aktif':>6} {'siaga':>6} "
+              f"{'jendela baru':>13} {'baris baru':>11}")
+        for sample in samples:
+            print(f"{sample['day']:>4} {sample['memory_kb']:>10.1f} {sample['widgets']:>7} "
+                  f"{sample['orphan_widgets']:>6} {sample['tk_after']:>6} {sample['active']:>6} {sample['idle']:>6} "
+                  f"{sample['windows_created']:>13} {sample['rows_created']:>11}")
+        print("Memori datar" if ReminderWindowSoakTest.is_flat(samples) else "PERINGATAN: memori terus bertambah")
+        return
+    
+    if args.simulate:
+        simulation = ReminderSimulation(args.residents, args.days, args.seed,
+                                        suspend_every_days=args.suspend_every_days)
+        report = simulation.run()
+        print_report("Hasil simulasi pengingat:", report)
+        if report['suspend_failures']:
+            print(f"PERINGATAN: {report['suspend_failures']} jadwal saat tidur tidak ditembakkan tepat sekali "
+                  "setelah bangun")
+            sys.exit(1)
+        return
+    
+    if args.reminder_service:
+        manager = ElderlyManager(args.data_file)
+        
+        def print_reminder(medicine, slot_dt, person):
+            print(f"{manager.clock.now():%Y-%m-%d %H:%M}  [{person.ward or '-'}] {person.name}: "
+                  f"{medicine.name} {medicine.dosage} ({slot_dt:%Y-%m-%d %H:%M})")
+        
+        reminder = ShardedMedicineReminder(manager, print_reminder, workers=args.reminder_workers)
+        reminder.start()
+        try:
+            while True:
+                time.sleep(60)
+                manager.check_external_changes()
+                for shard in reminder.status():
+                    age = shard['heartbeat_age']
+                    print(f"  proses {shard['pid']} [{shard['wards']}]: {shard['residents']} lansia, "
+                          f"heartbeat {age:.0f} detik lalu, {shard['restarts']} kali dijalankan ulang"
+                          if age is not None else f"  proses {shard['pid']} [{shard['wards']}]: belum aktif")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            reminder.stop()
+            manager.latency_log.save()
+        return
+    
     root = tk.Tk()
-    app = MedicineGUI(root)
+    try:
+        app = MedicineGUI(root, sync_options, args.reminder_workers)
+    except TimeoutError as e:
+        messagebox.showerror("File Data Sibuk", f"{e}\n\nTutup aplikasi lain yang memakai file data lalu coba lagi.")
+        root.destroy()
+        return
     
     try:
         root.mainloop()
     finally:
         app.reminder.stop()
+        app.manager.latency_log.save()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file